@@ -17,15 +17,72 @@ def create_app(config_name=None):
     # Initialize extensions
     CORS(app)
     
+    # Use the fast JSON provider for jsonify/format_response
+    from utils.json_provider import init_json_provider
+    init_json_provider(app)
+    
     # Register blueprints
     from controllers.user_controller import user_bp
     from controllers.health_controller import health_bp
+    from controllers.batch_controller import batch_bp
     
     app.register_blueprint(health_bp)
     app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    
+    # Batch sub-requests are dispatched straight into this app
+    from utils.batch import init_batch
+    from database import db
+    
+    init_batch(app, db)
+    
+    # Register request instrumentation
+    if app.config['METRICS_ENABLED']:
+        from controllers.metrics_controller import metrics_bp
+        from utils.metrics import init_metrics
+        
+        init_metrics(app, db)
+        app.register_blueprint(metrics_bp)
+    
+    # Register response compression
+    if app.config['COMPRESSION_ENABLED']:
+        from utils.compression import init_compression
+        
+        init_compression(app)
+    
+    # Register per-request query profiling
+    if app.config['DB_PROFILE_ENABLED']:
+        from query_profiler import init_query_profiler
+        
+        init_query_profiler(app, db)
     
     # Register error handlers
     from controllers.error_controller import register_error_handlers
     register_error_handlers(app)
     
-    return app
\ No newline at end of file
+    # Register admission control last: it wraps the WSGI callable, so shed
+    # requests are answered before Flask does any work
+    if app.config['RATE_LIMIT_ENABLED'] or app.config['ADMISSION_MAX_IN_FLIGHT']:
+        from utils.rate_limit import init_admission_control
+        
+        init_admission_control(app)
+    
+    return app
+
+def init_worker(config_name=None):
+    """Rebuild per-process state in a freshly forked worker
+    
+    Called from the gunicorn post_fork hook: pooled DB connections, the
+    async logging thread and metric shards inherited from the master are
+    not safe to use in the child.
+    """
+    if config_name is None:
+        config_name = os.environ.get('FLASK_ENV', 'development')
+    
+    from database import db
+    from utils.logging_utils import reinit_logging_after_fork
+    from utils.metrics import metrics
+    
+    reinit_logging_after_fork(config[config_name])
+    db.after_fork()
+    metrics.reset()
\ No newline at end of file
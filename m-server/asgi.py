@@ -0,0 +1,29 @@
+"""
+ASGI entry point: the same app behind an event loop
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+    GUNICORN_MODE=asgi gunicorn -c gunicorn.conf.py asgi:app
+
+Connections are handled by the event loop; requests run on a bounded
+executor (ASGI_MAX_WORKERS threads, ASGI_MAX_QUEUE waiting) and get 503
+when it is full. Requires an ASGI server such as uvicorn.
+"""
+import os
+from app import create_app
+from config import config
+from utils.asgi_adapter import AsgiAdapter
+from utils.logging_utils import setup_logging
+
+config_name = os.environ.get('FLASK_ENV', 'production')
+
+# Setup logging
+setup_logging(config[config_name])
+
+# Create Flask application and serve it through the bounded executor
+flask_app = create_app(config_name)
+app = AsgiAdapter(
+    flask_app,
+    max_workers=flask_app.config['ASGI_MAX_WORKERS'],
+    max_queue=flask_app.config['ASGI_MAX_QUEUE'],
+    retry_after=flask_app.config['ASGI_RETRY_AFTER'],
+)
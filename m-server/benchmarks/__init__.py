@@ -0,0 +1,12 @@
+"""
+Benchmarks and load tests
+
+Standalone scripts, run from the m-server directory:
+
+- dataset.py: synthetic users databases (10k, 1M, 10M users)
+- micro.py: Database / repository / model / response micro-benchmarks
+- load.py: HTTP load harness with a configurable request mix
+- compare.py: diff two result files and flag regressions
+
+micro.py and load.py write their results as JSON (see results.py).
+"""
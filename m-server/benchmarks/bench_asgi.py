@@ -0,0 +1,159 @@
+"""
+Benchmark: serving modes under many slow clients
+
+For each gunicorn mode (sync processes, gthread, asgi), opens N client
+connections that send an incomplete request and then stall, the way a
+slow mobile client or a trickling upload does. Reports the server's
+resident memory per open connection, whether a fast client is still
+served while they are connected (probe latency and timeouts), and how
+many of the slow clients are answered (or shed with 503) once they all
+finish their requests at the same moment.
+
+Usage:
+    python benchmarks/bench_asgi.py [--connections 200] [--modes process,threaded,asgi]
+                                    [--users 10k] [--probe-timeout 5]
+"""
+import argparse
+import http.client
+import os
+import socket
+import sys
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.dataset import default_path, generate, parse_size  # noqa: E402
+from benchmarks.load import LocalServer  # noqa: E402
+from benchmarks.results import percentile  # noqa: E402
+
+PARTIAL_REQUEST = b"GET /api/users?limit=50 HTTP/1.1\r\nHost: localhost\r\n"
+
+def tree_rss_kb(root_pid: int) -> int:
+    """Resident memory of a process and all its descendants, in KiB"""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    pids = {root_pid}
+    while True:
+        children = {pid for pid, parent in parents.items() if parent in pids} - pids
+        if not children:
+            break
+        pids |= children
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            continue
+    return total
+
+def probe(host: str, port: int, count: int, timeout: float) -> Dict:
+    """Time fast requests on fresh connections while the slow clients hang"""
+    latencies = []
+    timeouts = 0
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+            conn.request('GET', '/api/users/1')
+            conn.getresponse().read()
+            conn.close()
+            latencies.append(time.perf_counter() - start)
+        except OSError:
+            timeouts += 1
+    latencies.sort()
+    return {
+        'probe_p50_ms': round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        'probe_max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+        'probe_timeouts': timeouts,
+    }
+
+def finish(clients: List[socket.socket], timeout: float) -> Tuple[int, int]:
+    """Complete every stalled request; count the clients answered with 200 and 503"""
+    for sock in clients:
+        try:
+            sock.sendall(b"\r\n")
+        except OSError:
+            pass
+    served = shed = 0
+    deadline = time.monotonic() + timeout
+    for sock in clients:
+        sock.settimeout(max(0.01, deadline - time.monotonic()))
+        try:
+            status_line = sock.recv(64)
+            if status_line.startswith(b'HTTP/1.1 200'):
+                served += 1
+            elif status_line.startswith(b'HTTP/1.1 503'):
+                shed += 1
+        except OSError:
+            pass
+        sock.close()
+    return served, shed
+
+def run(mode: str, db_path: str, connections: int, probe_timeout: float) -> Dict:
+    """Measure one serving mode"""
+    server = LocalServer(db_path, 'gunicorn', env={'GUNICORN_MODE': mode})
+    with server as url:
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port
+        probe(host, port, 20, probe_timeout)
+        # Let every worker start and settle before the baseline
+        time.sleep(1)
+        base_kb = tree_rss_kb(server.process.pid)
+        idle = probe(host, port, 10, probe_timeout)
+
+        clients = []
+        for _ in range(connections):
+            sock = socket.create_connection((host, port))
+            sock.sendall(PARTIAL_REQUEST)
+            clients.append(sock)
+        time.sleep(1)
+        loaded_kb = tree_rss_kb(server.process.pid)
+        busy = probe(host, port, 10, probe_timeout)
+        served, shed = finish(clients, probe_timeout * 2)
+
+    return {
+        'rss_base_kb': base_kb,
+        'rss_per_conn_kb': round((loaded_kb - base_kb) / connections, 2),
+        'idle_probe_p50_ms': idle['probe_p50_ms'],
+        **busy,
+        'slow_served': served,
+        'slow_shed': shed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--connections', type=int, default=200)
+    parser.add_argument('--modes', default='process,threaded,asgi')
+    parser.add_argument('--users', type=parse_size, default='10k', help="dataset size (default: 10k)")
+    parser.add_argument('--db', help="dataset file (default: benchmarks/data/users-<size>.db)")
+    parser.add_argument('--probe-timeout', type=float, default=5.0, help="seconds before a probe gives up")
+    args = parser.parse_args()
+
+    db_path = args.db or default_path(args.users)
+    generate(db_path, args.users, verbose=True)
+
+    print(f"{args.connections} stalled connections, {os.cpu_count()} CPUs\n")
+    print(f"{'mode':<10} {'base RSS':>10} {'KiB/conn':>9} {'idle p50':>9} {'busy p50':>9} "
+          f"{'busy max':>9} {'timeouts':>9} {'served':>9} {'shed':>5}")
+    for mode in args.modes.split(','):
+        result = run(mode, db_path, args.connections, args.probe_timeout)
+        print(f"{mode:<10} {result['rss_base_kb'] / 1024:>8.1f}Mi {result['rss_per_conn_kb']:>9.1f} "
+              f"{_ms(result['idle_probe_p50_ms'])} {_ms(result['probe_p50_ms'])} "
+              f"{_ms(result['probe_max_ms'])} {result['probe_timeouts']:>9} "
+              f"{result['slow_served']:>5}/{args.connections} {result['slow_shed']:>5}")
+
+def _ms(value) -> str:
+    return f"{value:>7.1f}ms" if value is not None else f"{'-':>9}"
+
+if __name__ == '__main__':
+    main()
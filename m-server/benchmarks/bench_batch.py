@@ -0,0 +1,91 @@
+"""
+Benchmark: an app startup sequence as separate requests vs one batch
+
+Replays what the mobile apps do on launch (/health, the first page of
+users, then N user lookups) against a local gunicorn server, once as
+sequential HTTP requests and once as a single POST /api/batch. A simulated
+network round-trip time is added per request, since on mobile networks
+round trips rather than server time dominate.
+
+Usage:
+    python benchmarks/bench_batch.py [--lookups 10] [--rtt-ms 0,50,150] [--repeat 20] [--users 10k]
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.dataset import default_path, generate, parse_size  # noqa: E402
+from benchmarks.load import LocalServer  # noqa: E402
+from benchmarks.results import percentile  # noqa: E402
+
+def startup_paths(lookups: int) -> List[str]:
+    """The GETs an app makes on launch"""
+    return ['/health', '/api/users?limit=50'] + [f'/api/users/{n}' for n in range(1, lookups + 1)]
+
+def sequential(conn: http.client.HTTPConnection, paths: List[str], rtt: float) -> int:
+    """One request per path; returns the bytes received"""
+    received = 0
+    for path in paths:
+        time.sleep(rtt)
+        conn.request('GET', path)
+        received += len(conn.getresponse().read())
+    return received
+
+def batched(conn: http.client.HTTPConnection, paths: List[str], rtt: float) -> int:
+    """All paths in one batch; returns the bytes received"""
+    body = json.dumps({'requests': [{'path': path} for path in paths]})
+    time.sleep(rtt)
+    conn.request('POST', '/api/batch', body, {'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"Batch failed with {response.status}: {data[:200]!r}")
+    return len(data)
+
+def measure(url: str, fn, paths: List[str], rtt: float, repeat: int) -> Dict:
+    """Time `repeat` runs of one strategy on a keep-alive connection"""
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port)
+    fn(conn, paths, 0)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        received = fn(conn, paths, rtt)
+        timings.append(time.perf_counter() - start)
+    conn.close()
+    timings.sort()
+    return {'p50_ms': percentile(timings, 0.5) * 1000, 'p95_ms': percentile(timings, 0.95) * 1000,
+            'bytes': received}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lookups', type=int, default=10, help="user lookups after the first page")
+    parser.add_argument('--rtt-ms', default='0,50,150', help="simulated round-trip times")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--users', type=parse_size, default='10k', help="dataset size (default: 10k)")
+    parser.add_argument('--db', help="dataset file (default: benchmarks/data/users-<size>.db)")
+    args = parser.parse_args()
+
+    db_path = args.db or default_path(args.users)
+    generate(db_path, args.users, verbose=True)
+    paths = startup_paths(args.lookups)
+
+    print(f"{len(paths)} startup requests, {os.cpu_count()} CPUs\n")
+    print(f"{'rtt':>6} {'strategy':<11} {'p50':>10} {'p95':>10} {'bytes':>8}")
+    with LocalServer(db_path) as url:
+        for rtt_ms in (float(value) for value in args.rtt_ms.split(',')):
+            for name, fn in (('sequential', sequential), ('batch', batched)):
+                result = measure(url, fn, paths, rtt_ms / 1000, args.repeat)
+                print(f"{rtt_ms:>4.0f}ms {name:<11} {result['p50_ms']:>8.1f}ms "
+                      f"{result['p95_ms']:>8.1f}ms {result['bytes']:>8}")
+
+if __name__ == '__main__':
+    main()
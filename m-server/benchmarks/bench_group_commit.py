@@ -0,0 +1,100 @@
+"""
+Benchmark: per-statement commits vs group commit under concurrent writers
+
+Starts N threads that each insert M users through Database.execute_insert
+and reports writes/sec, p50/p99 latency and failed writes, first with the
+default per-statement commit and then with the group-commit writer.
+
+Usage:
+    python benchmarks/bench_group_commit.py [--threads 16] [--writes 200] [--window-ms 1]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config  # noqa: E402
+from database import Database  # noqa: E402
+
+def run(batching: bool, threads: int, writes: int, pool_size: int):
+    """Run one mode against a fresh database and return its measurements"""
+    tmp_dir = tempfile.mkdtemp()
+    db = Database(os.path.join(tmp_dir, 'bench.db'), pool_size=pool_size, write_batching=batching)
+    db.init_database()
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(n):
+        local = []
+        barrier.wait()
+        for i in range(writes):
+            start = time.perf_counter()
+            try:
+                db.execute_insert("INSERT INTO users (name, email) VALUES (?, ?)",
+                                  (f"Writer {n}", f"w{n}-{i}@example.com"))
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = db.writer_stats()
+    db.close()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    latencies.sort()
+    return {
+        'writes_per_sec': len(latencies) / elapsed,
+        'p50_ms': _percentile(latencies, 0.50) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'errors': len(errors),
+        'avg_batch': stats['avg_batch'] if stats else 1,
+    }
+
+def _percentile(values, q):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--writes', type=int, default=200, help='writes per thread')
+    parser.add_argument('--window-ms', type=float, default=Config.DB_WRITE_BATCH_WINDOW_MS)
+    parser.add_argument('--batch-max', type=int, default=Config.DB_WRITE_BATCH_MAX)
+    args = parser.parse_args()
+
+    Config.DB_WRITE_BATCH_WINDOW_MS = args.window_ms
+    Config.DB_WRITE_BATCH_MAX = args.batch_max
+    # One connection per writer thread, as under a threaded server
+    pool_size = args.threads + 1
+
+    print(f"{args.threads} threads x {args.writes} inserts")
+    print(f"{'mode':<16} {'writes/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7} {'avg batch':>10}")
+    for name, batching in (('per_statement', False), ('group_commit', True)):
+        result = run(batching, args.threads, args.writes, pool_size)
+        print(f"{name:<16} {result['writes_per_sec']:>10.0f} {result['p50_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result['errors']:>7} {result['avg_batch']:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: JSON encoders on list-users payloads
+
+Encodes {"success": true, "data": [...], "count": n} for 1k, 10k and 100k
+users with Flask's default provider (what jsonify used before), and with
+FastJSONProvider on the stdlib and orjson backends. Each provider is fed
+dicts (what the service returns today) and, for FastJSONProvider, User
+objects directly.
+
+Usage:
+    python benchmarks/bench_json.py [--sizes 1000,10000,100000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from models.user_model import User  # noqa: E402
+from utils.json_provider import FastJSONProvider, orjson  # noqa: E402
+
+def build_users(n: int):
+    """Users shaped like rows loaded from the database"""
+    return [User(i, f"User {i}", f"user{i}@example.com", "2024-05-06 07:08:09") for i in range(1, n + 1)]
+
+def measure(fn, repeat: int) -> float:
+    """Best wall time over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['DEBUG'] = False
+    default = DefaultJSONProvider(app)
+    stdlib = FastJSONProvider(app, encoder='stdlib')
+    candidates = [
+        ('flask_default/dicts', lambda users: default.dumps(_payload([u.to_dict() for u in users]))),
+        ('stdlib/dicts', lambda users: stdlib.dumps_bytes(_payload([u.to_dict() for u in users]))),
+        ('stdlib/users', lambda users: stdlib.dumps_bytes(_payload(users))),
+    ]
+    if orjson is not None:
+        fast = FastJSONProvider(app, encoder='orjson')
+        candidates += [
+            ('orjson/dicts', lambda users: fast.dumps_bytes(_payload([u.to_dict() for u in users]))),
+            ('orjson/users', lambda users: fast.dumps_bytes(_payload(users))),
+        ]
+    else:
+        print("orjson is not installed; only stdlib backends are measured\n")
+
+    print(f"{'users':>7}  {'encoder/input':<20} {'total (ms)':>11} {'per user (us)':>14} {'speedup':>8}")
+    for size in (int(part) for part in args.sizes.split(',')):
+        users = build_users(size)
+        baseline = None
+        for name, encode in candidates:
+            elapsed = measure(lambda: encode(users), args.repeat)
+            baseline = baseline or elapsed
+            print(f"{size:>7}  {name:<20} {elapsed * 1000:>11.2f} {elapsed / size * 1e6:>14.2f} "
+                  f"{baseline / elapsed:>7.2f}x")
+        print()
+
+def _payload(data):
+    """Wrap data the way format_response does"""
+    return {"success": True, "data": data, "count": len(data)}
+
+if __name__ == '__main__':
+    main()
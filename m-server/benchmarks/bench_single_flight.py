@@ -0,0 +1,112 @@
+"""
+Benchmark: database load of concurrent identical reads, with and without coalescing
+
+Starts N threads that all ask the user service for the full user list at
+the same moment, for several rounds, once with single-flight coalescing
+and once without. Reports how many list queries reached the database and
+the callers' wall time and latency percentiles: with coalescing the query
+count stays at about one per round however many callers pile on.
+
+Usage:
+    python benchmarks/bench_single_flight.py [--concurrency 1,8,32,64] [--rounds 5] [--users 10k]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.dataset import default_path, generate, parse_size  # noqa: E402
+from benchmarks.results import percentile  # noqa: E402
+
+def encode(users) -> bytes:
+    """Encode the list the way the API does (compact stdlib JSON)"""
+    return json.dumps(users, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class CountingRepository:
+    """Counts full-list queries made through a repository"""
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.get_all_calls = 0
+
+    def get_all(self):
+        self.get_all_calls += 1
+        return self.repository.get_all()
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+def run(service, repository: CountingRepository, concurrency: int, rounds: int) -> Dict:
+    """Fire `rounds` bursts of `concurrency` simultaneous full-list reads"""
+    latencies = []
+    lock = threading.Lock()
+    repository.get_all_calls = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        barrier = threading.Barrier(concurrency)
+
+        def worker():
+            barrier.wait()
+            began = time.perf_counter()
+            service.get_all_users_encoded(encode)
+            with lock:
+                latencies.append(time.perf_counter() - began)
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'db_queries': repository.get_all_calls,
+        'wall_s': round(wall, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', default='1,8,32,64')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--users', type=parse_size, default='10k', help="dataset size (default: 10k)")
+    parser.add_argument('--db', help="dataset file (default: benchmarks/data/users-<size>.db)")
+    args = parser.parse_args()
+
+    db_path = args.db or default_path(args.users)
+    # Must be set before anything imports config or database; the coalesced
+    # variant gets its own SingleFlight, the direct one none
+    os.environ['DATABASE_PATH'] = db_path
+    os.environ.setdefault('DB_PROFILE_ENABLED', 'false')
+    os.environ['COALESCE_ENABLED'] = 'false'
+    generate(db_path, args.users, verbose=True)
+
+    from models.user_repository_db import UserRepositoryDB
+    from services.user_service import UserService
+    from utils.single_flight import SingleFlight
+
+    # Straight to the database, so every read that is not shared costs a query
+    repository = CountingRepository(UserRepositoryDB())
+    variants = [
+        ('coalesced', UserService(repository, single_flight=SingleFlight('bench'))),
+        ('direct', UserService(repository)),
+    ]
+
+    print(f"{args.rounds} rounds of simultaneous full-list reads, {os.cpu_count()} CPUs\n")
+    print(f"{'callers':>7} {'variant':<10} {'db queries':>10} {'wall':>8} {'p50':>9} {'p99':>9}")
+    for concurrency in (int(n) for n in args.concurrency.split(',')):
+        for name, service in variants:
+            service.get_all_users_encoded(encode)  # warm up
+            result = run(service, repository, concurrency, args.rounds)
+            print(f"{concurrency:>7} {name:<10} {result['db_queries']:>10} {result['wall_s']:>7.2f}s "
+                  f"{result['p50_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms")
+
+if __name__ == '__main__':
+    main()
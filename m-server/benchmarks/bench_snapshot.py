@@ -0,0 +1,97 @@
+"""
+Benchmark: in-memory users snapshot load, refresh and lookup costs
+
+Measures the full load of SnapshotUserRepository (wall time and retained
+memory), incremental refreshes after external writes of different sizes,
+and get_by_id / email_exists latency against the SQLite-backed repository.
+
+Usage:
+    python benchmarks/bench_snapshot.py [--rows 1000000] [--lookups 10000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_PATH', os.path.join(_tmp_dir, 'bench.db'))
+
+from database import db  # noqa: E402
+from models.user_repository_db import UserRepositoryDB  # noqa: E402
+from models.snapshot_user_repository import SnapshotUserRepository  # noqa: E402
+
+def seed(rows: int):
+    """Fill the users table up to the requested row count"""
+    missing = rows - db.execute_query("SELECT COUNT(*) AS count FROM users")[0]['count']
+    if missing > 0:
+        db.execute_many(
+            "INSERT INTO users (name, email) VALUES (?, ?)",
+            [(f"Bench User {i}", f"bench{i}@example.com") for i in range(missing)]
+        )
+
+def per_call_us(fn, args) -> float:
+    """Mean microseconds per fn(arg) over args"""
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) / len(args) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    repository = UserRepositoryDB()
+    ids = [row['id'] for row in db.execute_query("SELECT id FROM users")]
+
+    snapshot = SnapshotUserRepository(repository, max_staleness=3600)
+    start = time.perf_counter()
+    snapshot.refresh()
+    load_s = time.perf_counter() - start
+
+    # Memory is measured on a second load; tracing slows the load down
+    tracemalloc.start()
+    traced = SnapshotUserRepository(repository, max_staleness=3600)
+    before = tracemalloc.get_traced_memory()[0]
+    traced.refresh()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del traced
+
+    print(f"{len(ids)} users")
+    print(f"full load: {load_s:.2f} s, retained {retained / 2**20:.0f} MiB "
+          f"({retained / len(ids):.0f} bytes/user)")
+
+    print(f"\n{'changed users':>14} {'refresh (ms)':>13}")
+    for changed in (1, 100, 10000):
+        sample = random.sample(ids, min(changed, len(ids)))
+        db.execute_many("UPDATE users SET name = name || '.' WHERE id = ?", [(i,) for i in sample])
+        start = time.perf_counter()
+        snapshot.refresh()
+        print(f"{changed:>14} {(time.perf_counter() - start) * 1000:>13.2f}")
+    start = time.perf_counter()
+    snapshot.refresh()
+    print(f"{'none':>14} {(time.perf_counter() - start) * 1000:>13.2f}")
+
+    lookups = [random.choice(ids) for _ in range(args.lookups)]
+    emails = [f"bench{i % args.rows}@example.com" for i in lookups]
+    print(f"\n{'lookup':<14} {'sqlite (us)':>12} {'snapshot (us)':>14}")
+    print(f"{'get_by_id':<14} {per_call_us(repository.get_by_id, lookups):>12.2f} "
+          f"{per_call_us(snapshot.get_by_id, lookups):>14.2f}")
+    print(f"{'email_exists':<14} {per_call_us(repository.email_exists, emails):>12.2f} "
+          f"{per_call_us(snapshot.email_exists, emails):>14.2f}")
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(_tmp_dir, ignore_errors=True)
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark: per-row cost of turning stored users into JSON
+
+Compares the original pipeline (sqlite3.Row -> dict -> User with a parsed
+datetime -> to_dict() with isoformat() -> json.dumps) against the slotted
+User path and the tuple -> JSON fast path used by /api/users/export.
+
+Usage:
+    python benchmarks/bench_user_rows.py [--rows 100000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp_dir = tempfile.mkdtemp()
+os.environ.setdefault('DATABASE_PATH', os.path.join(_tmp_dir, 'bench.db'))
+
+from database import db  # noqa: E402
+from models.user_model import user_row_json  # noqa: E402
+from models.user_repository_db import UserRepositoryDB  # noqa: E402
+
+class LegacyUser:
+    """The User model as it was before __slots__ and lazy timestamps"""
+
+    def __init__(self, id, name, email, created_at=None):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.created_at = created_at or datetime.now()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'email': self.email,
+            'created_at': self.created_at.isoformat()
+        }
+
+def seed(rows: int):
+    """Fill the users table up to the requested row count"""
+    missing = rows - db.execute_query("SELECT COUNT(*) AS count FROM users")[0]['count']
+    if missing > 0:
+        db.execute_many(
+            "INSERT INTO users (name, email) VALUES (?, ?)",
+            [(f"Bench User {i}", f"bench{i}@example.com") for i in range(missing)]
+        )
+
+def legacy_path():
+    """Row -> dict -> LegacyUser -> dict -> JSON, one object per row"""
+    out = []
+    for row in db.iter_query("SELECT * FROM users ORDER BY id"):
+        created_at = datetime.fromisoformat(row['created_at'].replace('Z', '+00:00'))
+        user = LegacyUser(row['id'], row['name'], row['email'], created_at)
+        out.append(json.dumps(user.to_dict(), separators=(',', ':')))
+    return out
+
+def slotted_user_path():
+    """Row -> dict -> slotted User (timestamp kept as text) -> dict -> JSON"""
+    repository = UserRepositoryDB()
+    return [json.dumps(user.to_dict(), separators=(',', ':')) for user in repository.iter_all()]
+
+def row_json_path():
+    """Tuple -> JSON text, no intermediate objects"""
+    return [user_row_json(row) for row in UserRepositoryDB().iter_rows()]
+
+def measure(fn, repeat: int):
+    """Best wall time over repeat runs, plus the output of the last run"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    baseline = None
+    expected = None
+    print(f"{'path':<14} {'total (s)':>10} {'per row (us)':>13} {'speedup':>8}")
+    for name, fn in (('legacy', legacy_path), ('slotted_user', slotted_user_path),
+                     ('row_json', row_json_path)):
+        elapsed, output = measure(fn, args.repeat)
+        if expected is None:
+            expected = output
+        elif output != expected:
+            sys.exit(f"{name} produced different JSON than the legacy path")
+        baseline = baseline or elapsed
+        per_row = elapsed / len(output) * 1e6
+        print(f"{name:<14} {elapsed:>10.3f} {per_row:>13.2f} {baseline / elapsed:>7.2f}x")
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(_tmp_dir, ignore_errors=True)
@@ -0,0 +1,85 @@
+"""
+Compare two benchmark result files and flag regressions
+
+Every metric present in both files whose direction is known (see
+results.py) is compared; a change for the worse by more than the
+threshold percentage is a regression. Exits with status 1 if there are
+any, so it can gate CI.
+
+Usage:
+    python benchmarks/compare.py BASELINE CURRENT [--threshold 10] [--metrics p99_ms,rps]
+"""
+import argparse
+import os
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.results import load_results, metric_direction  # noqa: E402
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = 10.0,
+                    metrics: List[str] = None) -> List[Dict]:
+    """Compare the results of two result documents metric by metric
+
+    Returns one entry per compared metric with the relative change in
+    percent (positive means better) and whether it is a regression.
+    """
+    rows = []
+    for name, old in baseline['results'].items():
+        new = current['results'].get(name)
+        if new is None:
+            continue
+        for metric, old_value in old.items():
+            direction = metric_direction(metric)
+            new_value = new.get(metric)
+            if direction is None or new_value is None or (metrics and metric not in metrics):
+                continue
+            if old_value:
+                change = (new_value - old_value) / old_value * 100 * direction
+            else:
+                change = 0.0 if not new_value else -100.0 * direction
+            rows.append({
+                'benchmark': name,
+                'metric': metric,
+                'baseline': old_value,
+                'current': new_value,
+                'change_pct': round(change, 2),
+                'regression': change < -threshold,
+            })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('baseline', help="result file to compare against")
+    parser.add_argument('current', help="result file of the change under test")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="percent worse that counts as a regression (default: 10)")
+    parser.add_argument('--metrics', help="comma-separated metrics to compare (default: all)")
+    args = parser.parse_args()
+
+    try:
+        baseline = load_results(args.baseline)
+        current = load_results(args.current)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if baseline.get('suite') != current.get('suite'):
+        print(f"Warning: comparing a {baseline.get('suite')} run with a {current.get('suite')} run")
+    if baseline.get('params') != current.get('params'):
+        print("Warning: the runs used different parameters")
+
+    rows = compare_results(baseline, current, args.threshold,
+                           args.metrics.split(',') if args.metrics else None)
+    print(f"{'benchmark':<26} {'metric':<12} {'baseline':>12} {'current':>12} {'change':>9}")
+    for row in rows:
+        flag = '  REGRESSION' if row['regression'] else ''
+        print(f"{row['benchmark']:<26} {row['metric']:<12} {row['baseline']:>12,.2f} "
+              f"{row['current']:>12,.2f} {row['change_pct']:>+8.1f}%{flag}")
+
+    regressions = [row for row in rows if row['regression']]
+    print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}% in {len(rows)} compared metrics")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Synthetic users dataset generator
+
+Creates (or tops up) a migrated SQLite database with N deterministic
+pseudo-random users, creation times spread over the past years. Rows are
+bulk-inserted with the users triggers suspended; the FTS index, change log
+and table version they maintain are then rebuilt in bulk, so the result is
+indistinguishable from a database filled through the API.
+
+Generate datasets while no server is using the file.
+
+Usage:
+    python benchmarks/dataset.py 10k|1m|10m|<count> [--db PATH] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Iterator, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+FIRST_NAMES = ('Alice', 'Bob', 'Carol', 'David', 'Erin', 'Frank', 'Grace', 'Heidi', 'Ivan', 'Judy',
+               'Mallory', 'Niaj', 'Olivia', 'Peggy', 'Rupert', 'Sybil', 'Trent', 'Victor', 'Walter', 'Yan')
+LAST_NAMES = ('Smith', 'Johnson', 'Garcia', 'Miller', 'Davis', 'Martinez', 'Lopez', 'Wilson', 'Anderson',
+              'Thomas', 'Moore', 'Jackson', 'Martin', 'Lee', 'Thompson', 'White', 'Harris', 'Clark')
+DOMAINS = ('example.com', 'example.org', 'example.net', 'mail.example.com')
+# Creation times start here and advance by up to a minute per user
+EPOCH = 1577836800  # 2020-01-01 00:00:00 UTC
+
+def parse_size(value: str) -> int:
+    """Parse '10k', '1m', '10m' or a plain count"""
+    size = SIZES.get(value.lower())
+    if size is None:
+        try:
+            size = int(value.replace('_', ''))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected one of {', '.join(SIZES)} or a number")
+    if size < 1:
+        raise argparse.ArgumentTypeError("size must be positive")
+    return size
+
+def default_path(users: int) -> str:
+    """Where a dataset of this size is kept between runs"""
+    label = next((name for name, size in SIZES.items() if size == users), str(users))
+    return os.path.join(DATA_DIR, f"users-{label}.db")
+
+def generate_rows(start: int, stop: int, seed: int) -> Iterator[Tuple[str, str, str, str]]:
+    """Yield (name, email, created_at, updated_at) for users start..stop-1"""
+    rng = random.Random(seed * 1_000_003 + start)
+    timestamp = EPOCH + start * 30
+    for n in range(start, stop):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        timestamp += rng.randint(0, 60)
+        created_at = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(timestamp))
+        email = f"{first.lower()}.{last.lower()}{n}@{rng.choice(DOMAINS)}"
+        yield f"{first} {last}", email, created_at, created_at
+
+def generate(db_path: str, users: int, seed: int = 42, batch_size: int = 100_000,
+             verbose: bool = False) -> int:
+    """Top the users table of db_path up to `users` rows and return the row count"""
+    # Imported late: importing database creates the global db from
+    # DATABASE_PATH, which callers may still have to point at this file
+    from database import Database
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    database = Database(db_path)
+    try:
+        database.init_database()
+        existing = database.execute_query("SELECT COUNT(*) AS count FROM users")[0]['count']
+        if existing >= users:
+            return existing
+
+        start = time.perf_counter()
+        with database.connection() as conn:
+            triggers = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'users'"
+            ).fetchall()
+            for name, _ in triggers:
+                conn.execute(f'DROP TRIGGER "{name}"')
+            conn.commit()
+            try:
+                for offset in range(existing, users, batch_size):
+                    conn.executemany(
+                        "INSERT INTO users (name, email, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                        generate_rows(offset, min(offset + batch_size, users), seed)
+                    )
+                    conn.commit()
+                    if verbose:
+                        print(f"  {min(offset + batch_size, users):>12,} users", end='\r', flush=True)
+
+                # What the suspended triggers would have done, in bulk (this
+                # also covers rows left behind by an interrupted earlier run)
+                added = conn.execute(
+                    "INSERT INTO user_changes (user_id, op) SELECT id, 'insert' FROM users "
+                    "WHERE NOT EXISTS (SELECT 1 FROM user_changes WHERE user_changes.user_id = users.id)"
+                ).rowcount
+                conn.execute("UPDATE table_versions SET version = version + ? WHERE name = 'users'", (added,))
+                conn.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+                conn.commit()
+            finally:
+                for _, sql in triggers:
+                    conn.execute(sql)
+                conn.commit()
+            conn.execute("PRAGMA optimize")
+
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f"\nGenerated {users - existing:,} users in {elapsed:.1f} s -> {db_path}")
+        return users
+    finally:
+        database.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('size', type=parse_size, help="10k, 1m, 10m or a user count")
+    parser.add_argument('--db', help="database file (default: benchmarks/data/users-<size>.db)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    generate(args.db or default_path(args.size), args.size, args.seed, verbose=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+HTTP load harness for the m-server API
+
+Starts the server locally on a synthetic dataset (gunicorn by default,
+uvicorn serving asgi.py, or the development server) unless --url points at
+a running one, then drives it from concurrent keep-alive clients with a
+weighted mix of requests:
+
+    get     GET /api/users/<random id>
+    list    GET /api/users?limit=50
+    search  GET /api/users/search?q=<prefix>&limit=20
+    post    POST /api/users
+    put     PUT /api/users/<id>
+    delete  DELETE /api/users/<id of a user this client created>
+
+Reports requests/second and p50/p95/p99 latency overall and per operation
+and writes them as JSON for compare.py. The clients are threads of this
+process, so on small machines they compete with the server for CPU; keep
+that in mind when reading absolute numbers, and compare runs taken on the
+same machine with the same settings.
+
+Usage:
+    python benchmarks/load.py [--url URL] [--users 10k] [--db PATH]
+                              [--concurrency 16] [--duration 30] [--warmup 3]
+                              [--mix get=60,list=10,search=5,post=10,put=10,delete=5]
+                              [--server gunicorn|uvicorn|dev] [--output FILE]
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.dataset import default_path, generate, parse_size  # noqa: E402
+from benchmarks.results import save_results, summarize  # noqa: E402
+
+OPERATIONS = ('get', 'list', 'search', 'post', 'put', 'delete')
+DEFAULT_MIX = 'get=60,list=10,search=5,post=10,put=10,delete=5'
+SEARCH_TERMS = ('ali', 'bob', 'carol smi', 'grace', 'lee', 'olivia m')
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse 'get=60,post=10,...' into operation weights"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r} (expected: {', '.join(OPERATIONS)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"weight of {name} must be a number")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("at least one operation needs a positive weight")
+    return mix
+
+class LocalServer:
+    """Runs the app on a free local port for the duration of a with-block"""
+
+    def __init__(self, db_path: str, kind: str = 'gunicorn', startup_timeout: float = 60.0, env: Dict = None):
+        self.db_path = db_path
+        self.kind = kind
+        self.env = env or {}
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.tmp_dir = None
+
+    def __enter__(self) -> str:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.tmp_dir = tempfile.mkdtemp(prefix='m-server-load-')
+        env = dict(
+            os.environ,
+            FLASK_ENV='production',
+            DATABASE_PATH=os.path.abspath(self.db_path),
+            LOG_FILE=os.path.join(self.tmp_dir, 'app.log'),
+            METRICS_MULTIPROC_DIR=os.path.join(self.tmp_dir, 'metrics'),
+            GUNICORN_BIND=f"127.0.0.1:{port}",
+            # All load clients share one address; limit them only when asked to
+            RATE_LIMIT_ENABLED=os.environ.get('RATE_LIMIT_ENABLED', 'false'),
+            PORT=str(port),
+            **self.env,
+        )
+        if self.kind == 'gunicorn':
+            app = 'asgi:app' if env.get('GUNICORN_MODE') == 'asgi' else 'wsgi:app'
+            command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', app]
+        elif self.kind == 'uvicorn':
+            command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1',
+                       '--port', str(port), '--log-level', 'warning']
+        else:
+            command = [sys.executable, 'run.py']
+        self.log = open(os.path.join(self.tmp_dir, 'server.log'), 'wb')
+        self.process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+        url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+                conn.request('GET', '/health')
+                if conn.getresponse().status == 200:
+                    return url
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"{self.kind} server did not become healthy (its log is printed above)")
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.tmp_dir:
+            self.log.close()
+            if self.process is not None and self.process.returncode not in (0, -15):
+                with open(os.path.join(self.tmp_dir, 'server.log'), 'rb') as f:
+                    sys.stderr.write(f.read().decode('utf-8', 'replace')[-4000:])
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+class Client(threading.Thread):
+    """One keep-alive connection issuing requests drawn from the mix"""
+
+    def __init__(self, url: str, mix: Dict[str, float], ids: 'IdSource', state: 'RunState', seed: int):
+        super().__init__(daemon=True)
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.ids = ids
+        self.state = state
+        self.rng = random.Random(seed)
+        self.created = []
+        self.latencies = {name: [] for name in OPERATIONS}
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.conn = None
+
+    def run(self):
+        while not self.state.stopped.is_set():
+            operation = self.rng.choices(self.operations, self.weights)[0]
+            if operation == 'delete' and not self.created:
+                # Only delete users this client created, so reads keep their data
+                operation = 'post'
+            start = time.perf_counter()
+            status = self.perform(operation)
+            elapsed = time.perf_counter() - start
+            if self.state.recording(start):
+                self.latencies[operation].append(elapsed)
+                self.statuses[status] += 1
+                if status is None or status >= 500:
+                    self.errors[operation] += 1
+
+    def perform(self, operation: str) -> Optional[int]:
+        """Issue one request and return its status (None on connection errors)"""
+        if operation == 'get':
+            return self.request('GET', f"/api/users/{self.ids.pick(self.rng)}")[0]
+        if operation == 'list':
+            return self.request('GET', '/api/users?limit=50')[0]
+        if operation == 'search':
+            return self.request('GET', f"/api/users/search?q={self.rng.choice(SEARCH_TERMS).replace(' ', '%20')}&limit=20")[0]
+        if operation == 'post':
+            body = {"name": "Load Test", "email": f"load-{uuid.uuid4().hex}@example.com"}
+            status, data = self.request('POST', '/api/users', body)
+            if status == 201:
+                self.created.append(json.loads(data)['data']['id'])
+            return status
+        if operation == 'put':
+            user_id = self.rng.choice(self.created) if self.created else self.ids.pick(self.rng)
+            return self.request('PUT', f"/api/users/{user_id}", {"name": f"Load Test {self.rng.random():.6f}"})[0]
+        return self.request('DELETE', f"/api/users/{self.created.pop()}")[0]
+
+    def request(self, method: str, path: str, body: Dict = None):
+        """Send a request on the keep-alive connection, reconnecting after failures"""
+        headers = {'Accept-Encoding': 'gzip'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            self.conn.request(method, path, payload, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            if response.getheader('Content-Encoding') == 'gzip':
+                data = gzip.decompress(data)
+            return response.status, data
+        except (OSError, http.client.HTTPException):
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+            return None, b''
+
+class IdSource:
+    """Picks user IDs for reads: a known ID range, or a sample fetched over HTTP"""
+
+    def __init__(self, max_id: int = None, sample: List[int] = None):
+        self.max_id = max_id
+        self.sample = sample
+
+    def pick(self, rng: random.Random) -> int:
+        return rng.randint(1, self.max_id) if self.max_id else rng.choice(self.sample)
+
+    @classmethod
+    def from_database(cls, db_path: str) -> 'IdSource':
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return cls(max_id=conn.execute("SELECT MAX(id) FROM users").fetchone()[0])
+        finally:
+            conn.close()
+
+    @classmethod
+    def from_server(cls, url: str) -> 'IdSource':
+        parts = urlsplit(url)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        conn.request('GET', '/api/users?limit=500')
+        ids = [user['id'] for user in json.loads(conn.getresponse().read())['data']]
+        if not ids:
+            raise RuntimeError("The server has no users to read; seed it first")
+        return cls(sample=ids)
+
+class RunState:
+    """Warm-up / measurement phases shared by all clients"""
+
+    def __init__(self):
+        self.stopped = threading.Event()
+        self.measure_start = float('inf')
+        self.measure_end = float('inf')
+
+    def recording(self, started_at: float) -> bool:
+        return self.measure_start <= started_at < self.measure_end
+
+def run_load(url: str, mix: Dict[str, float], ids: IdSource, concurrency: int,
+             duration: float, warmup: float, seed: int) -> Dict:
+    """Drive the server and summarize what was measured"""
+    state = RunState()
+    clients = [Client(url, mix, ids, state, seed + n) for n in range(concurrency)]
+    for client in clients:
+        client.start()
+    time.sleep(warmup)
+    state.measure_start = time.perf_counter()
+    state.measure_end = state.measure_start + duration
+    time.sleep(duration)
+    state.stopped.set()
+    for client in clients:
+        client.join()
+
+    results = {}
+    everything = []
+    statuses = Counter()
+    errors = Counter()
+    for client in clients:
+        statuses.update(client.statuses)
+        errors.update(client.errors)
+    for operation in OPERATIONS:
+        latencies = [value for client in clients for value in client.latencies[operation]]
+        everything.extend(latencies)
+        if latencies:
+            results[operation] = _load_summary(latencies, duration, errors[operation])
+    results['all'] = _load_summary(everything, duration, sum(errors.values()))
+    results['all']['statuses'] = {str(status): count for status, count in sorted(statuses.items(), key=str)}
+    return results
+
+def _load_summary(latencies: List[float], duration: float, errors: int) -> Dict:
+    """Latency summary in ms, with throughput named rps"""
+    summary = summarize(latencies, duration, unit='ms')
+    summary['rps'] = summary.pop('ops_per_sec')
+    summary['errors'] = errors
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', help="test a running server instead of starting one")
+    parser.add_argument('--users', type=parse_size, default='10k', help="dataset size (default: 10k)")
+    parser.add_argument('--db', help="dataset file (default: benchmarks/data/users-<size>.db)")
+    parser.add_argument('--server', choices=('gunicorn', 'uvicorn', 'dev'), default='gunicorn')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=3.0, help="unmeasured seconds first")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="result file (default: benchmarks/results/load-<time>.json)")
+    args = parser.parse_args()
+
+    params = {'concurrency': args.concurrency, 'duration': args.duration, 'warmup': args.warmup,
+              'mix': args.mix, 'seed': args.seed}
+    if args.url:
+        params['url'] = args.url
+        results = run_load(args.url, args.mix, IdSource.from_server(args.url), args.concurrency,
+                           args.duration, args.warmup, args.seed)
+    else:
+        db_path = args.db or default_path(args.users)
+        params.update(users=generate(db_path, args.users, args.seed, verbose=True), server=args.server)
+        params.update({name: os.environ[name] for name in os.environ if name.startswith('GUNICORN_')})
+        ids = IdSource.from_database(db_path)
+        with LocalServer(db_path, args.server) as url:
+            results = run_load(url, args.mix, ids, args.concurrency, args.duration, args.warmup, args.seed)
+
+    print(f"{'operation':<10} {'requests':>9} {'rps':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<10} {result['count']:>9} {result['rps']:>9.1f} {result['p50_ms']:>9.2f} "
+              f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}")
+    print(f"statuses: {results['all']['statuses']}")
+    print(f"\nResults written to {save_results('load', params, results, args.output)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Micro-benchmarks for the data access, model and response layers
+
+Times Database.execute_query, UserRepositoryDB reads and writes,
+User.to_dict and format_response against a synthetic dataset (generated
+on first use, see dataset.py) and writes the results as JSON for
+compare.py.
+
+Usage:
+    python benchmarks/micro.py [--users 10k] [--db PATH] [--duration 1.0]
+                               [--only repo.,format_response] [--output FILE]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.dataset import default_path, generate, parse_size  # noqa: E402
+from benchmarks.results import save_results, summarize  # noqa: E402
+
+def bench(fn: Callable[[], object], duration: float, min_iterations: int = 20) -> Dict:
+    """Call fn repeatedly for about `duration` seconds and summarize per-call times"""
+    latencies = []
+    clock = time.perf_counter
+    start = clock()
+    deadline = start + duration
+    while True:
+        call_start = clock()
+        fn()
+        now = clock()
+        latencies.append(now - call_start)
+        if now >= deadline and len(latencies) >= min_iterations:
+            break
+    return summarize(latencies, now - start, unit='us')
+
+def build_benchmarks(seed: int) -> List[Tuple[str, Callable[[], object]]]:
+    """Set up every benchmark against the database named by DATABASE_PATH"""
+    # Imported here so DATABASE_PATH is already pointing at the dataset
+    from app import create_app
+    from database import db
+    from models.user_model import user_row_json
+    from models.user_repository_db import UserRepositoryDB
+    from utils.response_utils import format_response
+
+    rng = random.Random(seed)
+    repository = UserRepositoryDB()
+    max_id = db.execute_query("SELECT MAX(id) AS id FROM users")[0]['id']
+    keys = [(row['created_at'], row['id']) for row in db.execute_query(
+        "SELECT created_at, id FROM users WHERE id IN (SELECT value FROM json_each(?))",
+        (str([rng.randint(1, max_id) for _ in range(1000)]),)
+    )]
+    emails = [row['email'] for row in db.execute_query(
+        "SELECT email FROM users WHERE id IN (SELECT value FROM json_each(?))",
+        (str([rng.randint(1, max_id) for _ in range(1000)]),)
+    )]
+    scratch = repository.create("Bench Scratch", f"bench-scratch-{uuid.uuid4().hex}@example.com")
+    users_50 = list(repository.get_by_ids([rng.randint(1, max_id) for _ in range(50)]).values())
+    users_1000 = repository.get_page(1000)[0]
+    user = users_50[0]
+    row = (user.id, user.name, user.email, user._created_at)
+    counter = iter(range(10 ** 12))
+
+    def random_id() -> int:
+        return rng.randint(1, max_id)
+
+    def create_delete():
+        created = repository.create("Bench Write", f"bench-{next(counter)}-{uuid.uuid4().hex[:8]}@example.com")
+        repository.delete(created.id)
+
+    app = create_app('production')
+    context = app.test_request_context()
+    context.push()
+
+    return [
+        ('db.execute_query.point', lambda: db.execute_query("SELECT * FROM users WHERE id = ?", (random_id(),))),
+        ('db.execute_query.page50', lambda: db.execute_query(
+            "SELECT * FROM users ORDER BY created_at DESC, id DESC LIMIT 50")),
+        ('repo.get_by_id', lambda: repository.get_by_id(random_id())),
+        ('repo.get_by_ids.50', lambda: repository.get_by_ids([random_id() for _ in range(50)])),
+        ('repo.get_page.50', lambda: repository.get_page(50, rng.choice(keys))),
+        ('repo.count', repository.count),
+        ('repo.email_exists', lambda: repository.email_exists(rng.choice(emails))),
+        ('repo.search.20', lambda: repository.search(rng.choice(('ali', 'bob smi', 'grace', 'lee')), 20)),
+        ('repo.update', lambda: repository.update(scratch.id, name=f"Bench Scratch {next(counter)}")),
+        ('repo.create_delete', create_delete),
+        ('user.to_dict', user.to_dict),
+        ('user_row_json', lambda: user_row_json(row)),
+        ('format_response.user', lambda: format_response(success=True, data=user.to_dict())),
+        ('format_response.50', lambda: format_response(success=True, data=[u.to_dict() for u in users_50])),
+        ('format_response.1000', lambda: format_response(success=True, data=[u.to_dict() for u in users_1000])),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=parse_size, default='10k', help="dataset size (default: 10k)")
+    parser.add_argument('--db', help="dataset file (default: benchmarks/data/users-<size>.db)")
+    parser.add_argument('--duration', type=float, default=1.0, help="seconds per benchmark")
+    parser.add_argument('--only', help="comma-separated name prefixes to run")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="result file (default: benchmarks/results/micro-<time>.json)")
+    args = parser.parse_args()
+
+    db_path = args.db or default_path(args.users)
+    # Must be set before anything imports config or database
+    os.environ['DATABASE_PATH'] = db_path
+    os.environ.setdefault('DB_PROFILE_ENABLED', 'false')
+    users = generate(db_path, args.users, args.seed, verbose=True)
+
+    prefixes = tuple(args.only.split(',')) if args.only else None
+    results = {}
+    print(f"{'benchmark':<26} {'ops/s':>11} {'p50 (us)':>10} {'p95 (us)':>10} {'p99 (us)':>10}")
+    for name, fn in build_benchmarks(args.seed):
+        if prefixes and not name.startswith(prefixes):
+            continue
+        result = results[name] = bench(fn, args.duration)
+        print(f"{name:<26} {result['ops_per_sec']:>11,.0f} {result['p50_us']:>10.1f} "
+              f"{result['p95_us']:>10.1f} {result['p99_us']:>10.1f}")
+
+    params = {'users': users, 'duration': args.duration, 'seed': args.seed}
+    print(f"\nResults written to {save_results('micro', params, results, args.output)}")
+
+if __name__ == '__main__':
+    main()
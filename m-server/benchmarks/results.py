@@ -0,0 +1,90 @@
+"""
+Shared timing summaries and the JSON result file format
+
+A result file looks like:
+
+    {"suite": "micro", "created_at": "...", "environment": {...},
+     "params": {...}, "results": {"<benchmark>": {"<metric>": value, ...}}}
+
+Metric names carry their direction: rates (ops_per_sec, rps) are better
+higher, anything ending in a time unit (_us, _ms) is better lower.
+"""
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+HIGHER_IS_BETTER = ('ops_per_sec', 'rps')
+LOWER_IS_BETTER_SUFFIXES = ('_us', '_ms')
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def summarize(latencies: List[float], elapsed: float, unit: str = 'ms') -> Dict:
+    """Throughput and latency percentiles for per-call durations in seconds"""
+    scale = 1e6 if unit == 'us' else 1e3
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        'count': count,
+        'ops_per_sec': round(count / elapsed, 2) if elapsed else 0.0,
+        f'mean_{unit}': round(sum(values) / count * scale, 3) if count else 0.0,
+        f'p50_{unit}': round(percentile(values, 0.50) * scale, 3),
+        f'p95_{unit}': round(percentile(values, 0.95) * scale, 3),
+        f'p99_{unit}': round(percentile(values, 0.99) * scale, 3),
+    }
+
+def metric_direction(metric: str) -> Optional[int]:
+    """+1 if a metric is better higher, -1 if better lower, None if not comparable"""
+    if metric in HIGHER_IS_BETTER:
+        return 1
+    if metric.endswith(LOWER_IS_BETTER_SUFFIXES):
+        return -1
+    return None
+
+def environment() -> Dict:
+    """Describe where the numbers were taken"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def save_results(suite: str, params: Dict, results: Dict, path: str = None) -> str:
+    """Write a result file and return its path"""
+    created_at = datetime.now(timezone.utc)
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{suite}-{created_at:%Y%m%d-%H%M%S}.json")
+    document = {
+        'suite': suite,
+        'created_at': created_at.isoformat(),
+        'environment': environment(),
+        'params': params,
+        'results': results,
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    return path
+
+def load_results(path: str) -> Dict:
+    """Read a result file"""
+    with open(path) as f:
+        document = json.load(f)
+    if 'results' not in document:
+        raise ValueError(f"{path} is not a benchmark result file")
+    return document
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -10,20 +11,132 @@ class Config:
     DEBUG = False
     TESTING = False
 
+    # Database settings
+    DATABASE_PATH = os.environ.get('DATABASE_PATH', 'app.db')
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10.0))
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+    DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 8192))
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 64 * 1024 * 1024))
+    DB_WRITE_BATCHING = os.environ.get('DB_WRITE_BATCHING', 'false').lower() == 'true'
+    DB_WRITE_BATCH_MAX = int(os.environ.get('DB_WRITE_BATCH_MAX', 100))
+    DB_WRITE_BATCH_WINDOW_MS = float(os.environ.get('DB_WRITE_BATCH_WINDOW_MS', 1.0))
+
+    # ASGI serving mode (asgi.py): executor threads running the app, and how
+    # many more requests may wait for one before new ones get 503
+    ASGI_MAX_WORKERS = int(os.environ.get('ASGI_MAX_WORKERS', DB_POOL_SIZE))
+    ASGI_MAX_QUEUE = int(os.environ.get('ASGI_MAX_QUEUE', 64))
+    ASGI_RETRY_AFTER = int(os.environ.get('ASGI_RETRY_AFTER', 1))  # seconds
+
+    # Admission control: per-client token buckets for reads and writes, plus a
+    # per-process cap on requests in flight (429 / 503 with Retry-After)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'false').lower() == 'true'
+    RATE_LIMIT_READ_RATE = float(os.environ.get('RATE_LIMIT_READ_RATE', 50.0))  # per second; 0 = unlimited
+    RATE_LIMIT_READ_BURST = int(os.environ.get('RATE_LIMIT_READ_BURST', 100))
+    RATE_LIMIT_WRITE_RATE = float(os.environ.get('RATE_LIMIT_WRITE_RATE', 10.0))  # per second; 0 = unlimited
+    RATE_LIMIT_WRITE_BURST = int(os.environ.get('RATE_LIMIT_WRITE_BURST', 20))
+    RATE_LIMIT_CLIENT_HEADER = os.environ.get('RATE_LIMIT_CLIENT_HEADER')  # e.g. X-API-Key; default: client address
+    # Proxies appending to a list-valued client header (X-Forwarded-For) whose entries are trusted
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 1))
+    RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')  # 'memory' (per process) or 'sqlite' (shared)
+    RATE_LIMIT_STORE_PATH = os.environ.get(
+        'RATE_LIMIT_STORE_PATH', os.path.join(tempfile.gettempdir(), 'm-server-rate-limits.db')
+    )
+    RATE_LIMIT_EXEMPT_PATHS = ('/health', '/metrics')
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 0))  # 0 = unlimited
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 1))  # seconds
+
+    # Pagination settings
+    USERS_PAGE_DEFAULT_LIMIT = int(os.environ.get('USERS_PAGE_DEFAULT_LIMIT', 50))
+    USERS_PAGE_MAX_LIMIT = int(os.environ.get('USERS_PAGE_MAX_LIMIT', 500))
+
+    # Export settings
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Change feed settings
+    USER_CHANGES_RETENTION_DAYS = float(os.environ.get('USER_CHANGES_RETENTION_DAYS', 30))
+
+    # Bulk operation settings
+    BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 1000))
+
+    # Batch endpoint settings: sub-requests per batch, and threads running
+    # consecutive reads concurrently (each may hold a pooled connection)
+    BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+    BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', DB_POOL_SIZE))
+
+    # User lookup cache settings
+    USER_CACHE_ENABLED = os.environ.get('USER_CACHE_ENABLED', 'true').lower() == 'true'
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 30.0))
+    USER_CACHE_NEGATIVE_TTL = float(os.environ.get('USER_CACHE_NEGATIVE_TTL', 5.0))
+    USER_CACHE_VERSION_CHECK_INTERVAL = float(os.environ.get('USER_CACHE_VERSION_CHECK_INTERVAL', 0.5))
+
+    # In-memory users snapshot (replaces the lookup cache when enabled)
+    USER_SNAPSHOT_ENABLED = os.environ.get('USER_SNAPSHOT_ENABLED', 'false').lower() == 'true'
+    USER_SNAPSHOT_MAX_STALENESS = float(os.environ.get('USER_SNAPSHOT_MAX_STALENESS', 1.0))  # seconds
+
+    # Read coalescing: identical concurrent list/page/search reads share one query
+    COALESCE_ENABLED = os.environ.get('COALESCE_ENABLED', 'true').lower() == 'true'
+    COALESCE_TIMEOUT = float(os.environ.get('COALESCE_TIMEOUT', 10.0))  # seconds a caller waits
+
+    # Logging settings
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # 'text' or 'json'
+    LOG_FILE = os.environ.get('LOG_FILE', 'app.log')
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+    LOG_ROTATION = os.environ.get('LOG_ROTATION', 'size')  # 'size' (in process) or 'external' (e.g. logrotate)
+    LOG_ASYNC = os.environ.get('LOG_ASYNC', 'true').lower() == 'true'
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_DROP_POLICY = os.environ.get('LOG_DROP_POLICY', 'drop_newest')  # or 'drop_oldest'
+
+    # Metrics settings
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')  # set under gunicorn
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+
+    # JSON encoding settings
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')  # 'auto', 'orjson' or 'stdlib'
+    JSON_COMPACT = os.environ.get('JSON_COMPACT', 'true').lower() == 'true'
+
+    # Response compression settings
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # bytes
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    COMPRESSION_BROTLI_ENABLED = os.environ.get('COMPRESSION_BROTLI_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_EXCLUDE_PATHS = ('/health',)
+
+    # Query profiler settings (opt-in)
+    DB_PROFILE_ENABLED = os.environ.get('DB_PROFILE_ENABLED', 'false').lower() == 'true'
+    DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 100.0))
+    DB_SLOW_QUERY_LOG = os.environ.get('DB_SLOW_QUERY_LOG', 'slow_queries.log')
+    DB_PROFILE_TOP_N = int(os.environ.get('DB_PROFILE_TOP_N', 20))
+    DB_PROFILE_STATS_DIR = os.environ.get('DB_PROFILE_STATS_DIR', 'query_stats')
+    DB_N_PLUS_ONE_THRESHOLD = int(os.environ.get('DB_N_PLUS_ONE_THRESHOLD', 10))
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     ENV = 'development'
+    JSON_COMPACT = os.environ.get('JSON_COMPACT', 'false').lower() == 'true'
+    # Cheapest levels locally; payload size matters less than CPU here
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 1))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 1))
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
     ENV = 'production'
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 64))
 
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     DEBUG = True
+    RATE_LIMIT_ENABLED = False
 
 # Configuration dictionary
 config = {
@@ -0,0 +1,101 @@
+"""
+Batch controller for running many API calls in one HTTP request
+"""
+from urllib.parse import unquote
+from flask import Blueprint, request, current_app
+from werkzeug.exceptions import HTTPException
+from utils.batch import METHODS
+from utils.decorators import validate_json, log_request
+from utils.response_utils import format_response
+import logging
+
+batch_bp = Blueprint('batch', __name__)
+logger = logging.getLogger(__name__)
+
+@batch_bp.route('/batch', methods=['POST'])
+@log_request
+@validate_json
+def run_batch():
+    """Run a list of sub-requests and return all their responses"""
+    try:
+        data = request.get_json()
+        items = _get_batch_items(data)
+        transaction = data.get('transaction', False)
+        if not isinstance(transaction, bool):
+            raise ValueError("'transaction' must be a boolean")
+
+        results, failed = current_app.extensions['batch_dispatcher'].run(
+            items, transaction=transaction, base_url=request.host_url, environ=request.environ
+        )
+        if failed is not None:
+            return format_response(
+                success=False,
+                data=results,
+                message=f"Request {failed} failed with status {results[failed]['status']}; transaction rolled back",
+                status_code=400
+            )
+
+        succeeded = sum(1 for result in results if result['status'] < 400)
+        if succeeded == len(results):
+            status_code = 200
+        elif succeeded:
+            status_code = 207
+        else:
+            status_code = 400
+        return format_response(
+            success=succeeded > 0,
+            data=results,
+            message=f"{succeeded} of {len(results)} requests succeeded",
+            status_code=status_code
+        )
+    except ValueError as e:
+        return format_response(success=False, message=str(e), status_code=400)
+    except Exception as e:
+        logger.error(f"Error running batch: {e}")
+        return format_response(success=False, message="Internal server error", status_code=500)
+
+def _get_batch_items(data):
+    """Validate the sub-request list of a batch request body"""
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError("'requests' must be a non-empty list")
+
+    max_requests = current_app.config['BATCH_MAX_REQUESTS']
+    if len(items) > max_requests:
+        raise ValueError(f"At most {max_requests} requests are allowed per batch")
+
+    validated = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"Request {index} must be an object")
+
+        method = item.get('method', 'GET')
+        path = item.get('path')
+        if not isinstance(method, str) or method.upper() not in METHODS:
+            raise ValueError(f"Request {index}: method must be one of: {', '.join(sorted(METHODS))}")
+        if not isinstance(path, str) or not path.startswith('/'):
+            raise ValueError(f"Request {index}: 'path' must be an absolute path")
+        if _routes_to_batch(path, method.upper()):
+            raise ValueError(f"Request {index}: batches cannot be nested")
+
+        headers = item.get('headers', {})
+        if not isinstance(headers, dict) or not all(isinstance(value, str) for value in headers.values()):
+            raise ValueError(f"Request {index}: 'headers' must map names to strings")
+
+        sub_request = {'method': method.upper(), 'path': path, 'headers': headers}
+        if 'body' in item:
+            sub_request['body'] = item['body']
+        if 'id' in item:
+            sub_request['id'] = item['id']
+        validated.append(sub_request)
+    return validated
+
+def _routes_to_batch(path, method):
+    """Check whether a sub-request would be routed back to this endpoint"""
+    # Match the decoded path, as the sub-request's own routing will
+    adapter = current_app.url_map.bind(request.host)
+    try:
+        endpoint, _ = adapter.match(unquote(path.split('?', 1)[0]), method=method)
+    except HTTPException:
+        return False
+    return endpoint == request.endpoint
@@ -1,18 +1,35 @@
 """
 Health check controller
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, current_app, jsonify
 from datetime import datetime
 from utils.response_utils import format_response
+from database import db
+from utils.logging_utils import get_logging_stats
+from utils.compression import get_compression_stats
+from controllers.user_controller import user_service
 
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    asgi_adapter = current_app.extensions.get('asgi_adapter')
+    admission = current_app.extensions.get('admission_control')
     data = {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "service": "Python Backend Service"
+        "service": "Python Backend Service",
+        "database": {
+            "pool": db.pool_stats(),
+            "writer": db.writer_stats(),
+            "user_cache": user_service.get_cache_stats(),
+            "user_snapshot": user_service.get_snapshot_stats(),
+            "user_coalescing": user_service.get_coalescing_stats()
+        },
+        "logging": get_logging_stats(),
+        "compression": get_compression_stats(),
+        "executor": asgi_adapter.stats() if asgi_adapter else None,
+        "admission": admission.stats() if admission else None
     }
     return format_response(success=True, data=data)
\ No newline at end of file
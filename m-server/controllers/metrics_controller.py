@@ -0,0 +1,12 @@
+"""
+Metrics controller
+"""
+from flask import Blueprint, Response
+from utils.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose request metrics in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
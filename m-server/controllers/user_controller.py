@@ -1,10 +1,14 @@
 """
 User controller for handling user-related HTTP requests
 """
-from flask import Blueprint, request
-from services import UserService
+from flask import Blueprint, request, current_app
+from services import UserService, SyncTokenExpiredError
+from utils.single_flight import SingleFlightTimeout
 from utils.decorators import validate_json, log_request
-from utils.response_utils import format_response
+from utils.response_utils import (
+    format_response, format_encoded_response, encode_list_response, format_stream_response, STREAM_FORMATS,
+    make_etag, is_not_modified, not_modified_response
+)
 import logging
 
 user_bp = Blueprint('users', __name__)
@@ -14,22 +18,124 @@ logger = logging.getLogger(__name__)
 @user_bp.route('/users', methods=['GET'])
 @log_request
 def get_users():
-    """Get all users"""
+    """Get all users, or one page of users when limit/cursor is given"""
     try:
-        users = user_service.get_all_users()
-        return format_response(success=True, data=users)
+        # The table version changes on every write, so a matching tag means
+        # the client's copy is current and no rows need to be read
+        version = user_service.get_users_version()
+        etag = make_etag('users', version, request.query_string)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        if 'limit' not in request.args and 'cursor' not in request.args:
+            body = user_service.get_all_users_encoded(encode_list_response, version)
+            return format_encoded_response(body, etag=etag)
+        
+        limit = _parse_limit(request.args.get('limit'))
+        
+        users, next_cursor = user_service.get_users_page(limit, request.args.get('cursor'), version)
+        return format_response(
+            success=True,
+            data=users,
+            pagination={
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
+            },
+            etag=etag
+        )
+    except ValueError as e:
+        return format_response(success=False, message=str(e), status_code=400)
+    except SingleFlightTimeout as e:
+        return _busy_response(e)
     except Exception as e:
         logger.error(f"Error getting users: {e}")
         return format_response(success=False, message="Internal server error", status_code=500)
 
+@user_bp.route('/users/search', methods=['GET'])
+@log_request
+def search_users():
+    """Full-text search users by name or email"""
+    try:
+        version = user_service.get_users_version()
+        etag = make_etag('users-search', version, request.query_string)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
+        limit = _parse_limit(request.args.get('limit'))
+        users, next_cursor = user_service.search_users(
+            request.args.get('q', ''), limit, request.args.get('cursor'), version
+        )
+        return format_response(
+            success=True,
+            data=users,
+            pagination={
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
+            },
+            etag=etag
+        )
+    except ValueError as e:
+        return format_response(success=False, message=str(e), status_code=400)
+    except SingleFlightTimeout as e:
+        return _busy_response(e)
+    except Exception as e:
+        logger.error(f"Error searching users: {e}")
+        return format_response(success=False, message="Internal server error", status_code=500)
+
+@user_bp.route('/users/export', methods=['GET'])
+@log_request
+def export_users():
+    """Stream all users as NDJSON or a JSON array"""
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in STREAM_FORMATS:
+        return format_response(
+            success=False,
+            message=f"Format must be one of: {', '.join(STREAM_FORMATS)}",
+            status_code=400
+        )
+    
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    users = user_service.iter_users_json(batch_size)
+    return format_stream_response(users, fmt, chunk_rows=batch_size, filename='users', encoded=True)
+
+@user_bp.route('/users/changes', methods=['GET'])
+@log_request
+def get_user_changes():
+    """Get users created, updated or deleted since a sync token"""
+    try:
+        limit = _parse_limit(request.args.get('limit'))
+        changes, sync_token, has_more = user_service.get_changes(request.args.get('since'), limit)
+        return format_response(
+            success=True,
+            data=changes,
+            pagination={
+                "limit": limit,
+                "sync_token": sync_token,
+                "has_more": has_more
+            }
+        )
+    except SyncTokenExpiredError as e:
+        return format_response(success=False, message=str(e), status_code=410)
+    except ValueError as e:
+        return format_response(success=False, message=str(e), status_code=400)
+    except Exception as e:
+        logger.error(f"Error getting user changes: {e}")
+        return format_response(success=False, message="Internal server error", status_code=500)
+
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 @log_request
 def get_user(user_id):
     """Get user by ID"""
     try:
+        etag = make_etag('user', user_id, user_service.get_users_version())
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        
         user = user_service.get_user_by_id(user_id)
         if user:
-            return format_response(success=True, data=user)
+            return format_response(success=True, data=user, etag=etag)
         return format_response(success=False, message="User not found", status_code=404)
     except Exception as e:
         logger.error(f"Error getting user {user_id}: {e}")
@@ -63,6 +169,54 @@ def create_user():
         logger.error(f"Error creating user: {e}")
         return format_response(success=False, message="Internal server error", status_code=500)
 
+@user_bp.route('/users/bulk', methods=['POST'])
+@log_request
+@validate_json
+def create_users_bulk():
+    """Create many users in one request"""
+    try:
+        data = request.get_json()
+        items = _get_bulk_items(data, 'users')
+        results = user_service.create_users(items)
+        return _bulk_response(results, "created", success_status=201)
+    except ValueError as e:
+        return format_response(success=False, message=str(e), status_code=400)
+    except Exception as e:
+        logger.error(f"Error bulk creating users: {e}")
+        return format_response(success=False, message="Internal server error", status_code=500)
+
+@user_bp.route('/users/bulk', methods=['PATCH'])
+@log_request
+@validate_json
+def update_users_bulk():
+    """Update many users in one request"""
+    try:
+        data = request.get_json()
+        items = _get_bulk_items(data, 'users')
+        results = user_service.update_users(items)
+        return _bulk_response(results, "updated")
+    except ValueError as e:
+        return format_response(success=False, message=str(e), status_code=400)
+    except Exception as e:
+        logger.error(f"Error bulk updating users: {e}")
+        return format_response(success=False, message="Internal server error", status_code=500)
+
+@user_bp.route('/users/bulk', methods=['DELETE'])
+@log_request
+@validate_json
+def delete_users_bulk():
+    """Delete many users in one request"""
+    try:
+        data = request.get_json()
+        user_ids = _get_bulk_items(data, 'ids')
+        results = user_service.delete_users(user_ids)
+        return _bulk_response(results, "deleted")
+    except ValueError as e:
+        return format_response(success=False, message=str(e), status_code=400)
+    except Exception as e:
+        logger.error(f"Error bulk deleting users: {e}")
+        return format_response(success=False, message="Internal server error", status_code=500)
+
 @user_bp.route('/users/<int:user_id>', methods=['PUT'])
 @log_request
 @validate_json
@@ -100,4 +254,53 @@ def delete_user(user_id):
         return format_response(success=False, message="User not found", status_code=404)
     except Exception as e:
         logger.error(f"Error deleting user {user_id}: {e}")
-        return format_response(success=False, message="Internal server error", status_code=500)
\ No newline at end of file
+        return format_response(success=False, message="Internal server error", status_code=500)
+
+def _parse_limit(raw_limit):
+    """Parse and clamp the page size query parameter"""
+    if raw_limit is None:
+        return current_app.config['USERS_PAGE_DEFAULT_LIMIT']
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError("Limit must be a positive integer")
+    return min(limit, current_app.config['USERS_PAGE_MAX_LIMIT'])
+
+def _busy_response(error):
+    """503 for a read that waited too long on an identical in-flight read"""
+    logger.warning(f"Coalesced read timed out: {error}")
+    response, status_code = format_response(
+        success=False, message="Server is busy, please retry shortly", status_code=503
+    )
+    response.headers['Retry-After'] = str(current_app.config['ADMISSION_RETRY_AFTER'])
+    return response, status_code
+
+def _get_bulk_items(data, key):
+    """Extract and size-check the item list of a bulk request body"""
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"'{key}' must be a non-empty list")
+    
+    max_items = current_app.config['BULK_MAX_ITEMS']
+    if len(items) > max_items:
+        raise ValueError(f"At most {max_items} items are allowed per request")
+    return items
+
+def _bulk_response(results, action, success_status=200):
+    """Format per-item bulk results with an overall status code"""
+    succeeded = sum(1 for result in results if result['success'])
+    if succeeded == len(results):
+        status_code = success_status
+    elif succeeded:
+        status_code = 207
+    else:
+        status_code = 400
+    
+    return format_response(
+        success=succeeded > 0,
+        data=results,
+        message=f"{succeeded} of {len(results)} users {action}",
+        status_code=status_code
+    )
\ No newline at end of file
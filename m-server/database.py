@@ -3,32 +3,354 @@ Database setup and management
 """
 import sqlite3
 import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict, Iterator, Tuple
+from config import Config
+from migrations import MigrationRunner
+from query_profiler import profiler_from_config
 
-class Database:
-    """SQLite database manager"""
-    
-    def __init__(self, db_path: str = "app.db"):
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections"""
+
+    def __init__(self, db_path: str, size: int = 5, timeout: float = 10.0,
+                 busy_timeout_ms: int = 5000, cache_size_kb: int = 8192,
+                 mmap_size: int = 64 * 1024 * 1024):
         self.db_path = db_path
-        self.init_database()
-    
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Reset pool state (used on first use and after fork)"""
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=self.size)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._discarded = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection and apply tuned PRAGMAs once"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Enable dict-like access
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        """Check that a pooled connection is still usable"""
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection, waiting up to the pool timeout"""
+        if self._pid != os.getpid():
+            # Connections must never be shared with a forked parent
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.timeout):
+                raise PoolTimeoutError(
+                    f"No database connection available after {self.timeout}s"
+                )
+            waited = time.perf_counter() - start
+            with self._lock:
+                self._waits += 1
+                self._wait_time_total += waited
+                self._wait_time_max = max(self._wait_time_max, waited)
+
+        try:
+            conn = None
+            while conn is None:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._connect()
+                    break
+                if not self._is_healthy(conn):
+                    self._close(conn)
+                    conn = None
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (sqlite3.Error, queue.Full):
+            self._close(conn)
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    def _close(self, conn: sqlite3.Connection):
+        """Close and forget a connection"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._discarded += 1
+
+    def close_all(self):
+        """Close all idle connections"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+    def stats(self) -> Dict:
+        """Get pool usage statistics"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'created': self._created,
+                'discarded': self._discarded,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_time_total_ms': round(self._wait_time_total * 1000, 3),
+                'wait_time_max_ms': round(self._wait_time_max * 1000, 3),
+            }
+
+
+class GroupCommitWriter:
+    """Applies writes from many threads on one thread, one transaction per batch
+
+    Callers submit a statement and block on the returned future. The writer
+    thread takes the first queued write, keeps collecting until max_batch
+    writes are pending or window_ms has passed, then runs them all inside
+    one BEGIN IMMEDIATE ... COMMIT. Each write runs under its own savepoint,
+    so a failing write (e.g. a UNIQUE violation) is rolled back and reported
+    to its caller alone while the rest of the batch still commits. Futures
+    are resolved only after the commit.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_batch: int = 100, window_ms: float = 1.0):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._batches = 0
+        self._writes = 0
+        self._failed = 0
+        self._largest_batch = 0
+
+    def submit(self, kind: str, query: str, params) -> Future:
+        """Queue a write and return a future for its result"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='db-group-commit', daemon=True)
+                    self._thread.start()
+        future = Future()
+        self._queue.put((kind, query, params, future))
+        return future
+
+    def stop(self, timeout: float = 5.0):
+        """Apply queued writes, then stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def stats(self) -> Dict:
+        """Get batching statistics"""
+        with self._lock:
+            return {
+                'batches': self._batches,
+                'writes': self._writes,
+                'failed': self._failed,
+                'largest_batch': self._largest_batch,
+                'avg_batch': round(self._writes / self._batches, 2) if self._batches else 0,
+                'queued': self._queue.qsize(),
+            }
+
+    def _run(self):
+        """Writer thread: collect batches and apply them until stopped"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._apply(batch)
+            if stopping:
+                return
+
+    def _apply(self, batch: List[Tuple]):
+        """Run one batch in a single transaction and resolve its futures"""
+        outcomes = []
+        try:
+            conn = self.pool.acquire()
+        except Exception as e:
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for kind, query, params, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT group_write')
+                try:
+                    outcomes.append((future, _apply_write(conn.cursor(), kind, query, params), None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO group_write')
+                    outcomes.append((future, None, e))
+                conn.execute('RELEASE group_write')
+            conn.commit()
+        except Exception as e:
+            # BEGIN or COMMIT failed: nothing in this batch was applied
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            outcomes = [(future, None, e) for _, _, _, future in batch if not future.done()]
+        finally:
+            self.pool.release(conn)
+
+        failed = 0
+        for future, result, error in outcomes:
+            if error is not None:
+                failed += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        with self._lock:
+            self._batches += 1
+            self._writes += len(batch)
+            self._failed += failed
+            self._largest_batch = max(self._largest_batch, len(batch))
+
+
+def _apply_write(cursor: sqlite3.Cursor, kind: str, query: str, params):
+    """Execute one write statement and return the result its kind calls for"""
+    if kind == 'many':
+        cursor.executemany(query, params)
+        return cursor.rowcount
+    cursor.execute(query, params)
+    if kind == 'insert':
+        return cursor.lastrowid
+    if kind == 'returning':
+        # RETURNING rows must be read before the statement is committed
+        return [dict(row) for row in cursor.fetchall()]
+    return cursor.rowcount
+
+
+class Database:
+    """SQLite database manager
+
+    Construction never touches the disk. The schema is migrated and seeded
+    lazily, once, by the first call that needs a connection (or explicitly
+    via init_database()), which keeps importing this module side-effect free
+    and safe to do before forking worker processes.
+    """
+
+    def __init__(self, db_path: str = None, pool_size: int = None, auto_init: bool = True,
+                 write_batching: bool = None):
+        self.db_path = db_path or Config.DATABASE_PATH
+        self.auto_init = auto_init
+        self.write_batching = Config.DB_WRITE_BATCHING if write_batching is None else write_batching
+        self._writer = None
+        self.pool = ConnectionPool(
+            self.db_path,
+            size=pool_size or Config.DB_POOL_SIZE,
+            timeout=Config.DB_POOL_TIMEOUT,
+            busy_timeout_ms=Config.DB_BUSY_TIMEOUT_MS,
+            cache_size_kb=Config.DB_CACHE_SIZE_KB,
+            mmap_size=Config.DB_MMAP_SIZE
+        )
+        self._local = threading.local()
+        self.profiler = profiler_from_config(Config)
+        self._initialized = False
+        self._initializing = False
+        self._init_lock = threading.RLock()
+
     def init_database(self):
-        """Initialize database and create tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Initialize database: apply pending migrations and seed defaults
+
+        Idempotent and thread-safe; only the first call does any work.
+        """
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized or self._initializing:
+                # Already done, or re-entered from the migrations below
+                return
+            self._initializing = True
+            try:
+                MigrationRunner(self).migrate()
+                self._seed_defaults()
+                self._initialized = True
+            finally:
+                self._initializing = False
+
+    def _ensure_initialized(self):
+        """Run init_database() on first use unless auto_init is off"""
+        if not self._initialized and self.auto_init:
+            self.init_database()
+
+    def _seed_defaults(self):
+        """Insert the default users if the table is empty"""
+        with self.connection() as conn:
             cursor = conn.cursor()
-            
-            # Create users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    email TEXT UNIQUE NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
+
             # Insert default users if table is empty
             cursor.execute('SELECT COUNT(*) FROM users')
             if cursor.fetchone()[0] == 0:
@@ -40,38 +362,220 @@ class Database:
                     'INSERT INTO users (name, email) VALUES (?, ?)',
                     default_users
                 )
-            
+
             conn.commit()
-    
+
+    def close(self):
+        """Stop the writer and close pooled connections; the next use initializes again"""
+        if self._writer is not None:
+            self._writer.stop()
+            self._writer = None
+        self.pool.close_all()
+        self._initialized = False
+
+    def after_fork(self):
+        """Drop state inherited from the parent process
+
+        Pooled connections must never be shared across fork, so the child
+        starts with an empty pool and fresh thread-local state. Whether the
+        schema is initialized carries over, so a pre-fork init_database()
+        is not repeated in every worker.
+        """
+        self.pool._reset()
+        self._local = threading.local()
+        self._init_lock = threading.RLock()
+        self._initializing = False
+        # The writer thread did not survive the fork; start a new one on demand
+        self._writer = None
+        self.profiler.reset()
+
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable dict-like access
-        return conn
-    
+        """Get a new, unpooled database connection"""
+        self._ensure_initialized()
+        return self.pool._connect()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection for the current thread"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            # Nested use on the same thread shares the checked-out connection
+            yield held
+            return
+
+        self._ensure_initialized()
+        conn = self.pool.acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self.pool.release(conn)
+
+    def reset_query_count(self, count: int = 0):
+        """Reset (or restore) the number of statements issued by the current thread"""
+        self._local.query_count = count
+
+    def get_query_count(self) -> int:
+        """Get the number of statements issued by the current thread"""
+        return getattr(self._local, 'query_count', 0)
+
+    def _record_query(self, query: str, params, start: float):
+        """Count a statement against the current thread and profile it if enabled"""
+        self._local.query_count = getattr(self._local, 'query_count', 0) + 1
+        if self.profiler.enabled:
+            self.profiler.record(query, params, time.perf_counter() - start, self.db_path)
+
+    def pool_stats(self) -> Dict:
+        """Get connection pool statistics"""
+        return self.pool.stats()
+
     def execute_query(self, query: str, params: tuple = ()) -> List[Dict]:
         """Execute SELECT query and return results"""
-        with self.get_connection() as conn:
+        with self.connection() as conn:
+            start = time.perf_counter()
             cursor = conn.cursor()
             cursor.execute(query, params)
             rows = cursor.fetchall()
+            self._record_query(query, params, start)
             return [dict(row) for row in rows]
-    
-    def execute_update(self, query: str, params: tuple = ()) -> int:
-        """Execute INSERT/UPDATE/DELETE query and return affected rows"""
-        with self.get_connection() as conn:
+
+    def iter_query(self, query: str, params: tuple = (), batch_size: int = 1000) -> Iterator[Dict]:
+        """Execute SELECT query and lazily yield rows in batches
+
+        The connection is checked out for the lifetime of the generator, so
+        callers should exhaust or close it promptly.
+        """
+        for row in self._iter_cursor(query, params, batch_size, sqlite3.Row):
+            yield dict(row)
+
+    def iter_rows(self, query: str, params: tuple = (), batch_size: int = 1000) -> Iterator[Tuple]:
+        """Like iter_query, but yield plain tuples in column order
+
+        Skips building a sqlite3.Row and a dict per row, for hot paths that
+        only need positional access.
+        """
+        return self._iter_cursor(query, params, batch_size, None)
+
+    def _iter_cursor(self, query: str, params: tuple, batch_size: int, row_factory) -> Iterator:
+        """Stream a query's rows in fetchmany batches on a dedicated connection"""
+        self._ensure_initialized()
+        conn = self.pool.acquire()
+        try:
+            start = time.perf_counter()
             cursor = conn.cursor()
+            cursor.row_factory = row_factory
             cursor.execute(query, params)
-            conn.commit()
-            return cursor.rowcount
-    
+            self._record_query(query, params, start)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+            cursor.close()
+        finally:
+            self.pool.release(conn)
+
+    def execute_update(self, query: str, params: tuple = ()) -> int:
+        """Execute INSERT/UPDATE/DELETE query and return affected rows"""
+        return self._write('update', query, params)
+
     def execute_insert(self, query: str, params: tuple = ()) -> int:
         """Execute INSERT query and return last row id"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
+        return self._write('insert', query, params)
+
+    def execute_returning(self, query: str, params: tuple = ()) -> List[Dict]:
+        """Execute INSERT/UPDATE/DELETE ... RETURNING and return the emitted rows"""
+        return self._write('returning', query, params)
+
+    def execute_many(self, query: str, seq_of_params: List[tuple]) -> int:
+        """Execute a statement for every parameter tuple and return affected rows"""
+        return self._write('many', query, seq_of_params)
+
+    def writer_stats(self) -> Optional[Dict]:
+        """Get group-commit writer statistics, or None when batching is off"""
+        return self._writer.stats() if self._writer is not None else None
+
+    def _write(self, kind: str, query: str, params):
+        """Run one write, through the group-commit writer when enabled
+
+        Writes inside transaction() always run on the caller's connection,
+        since they must commit or roll back with the rest of it. So does any
+        write from a thread already holding a connection: the writer thread
+        would need a second one, and the caller would block on it while
+        keeping its own out of the pool.
+        """
+        start = time.perf_counter()
+        record_params = (params[0] if params else ()) if kind == 'many' else params
+        if self.write_batching and getattr(self._local, 'conn', None) is None:
+            self._ensure_initialized()
+            result = self._get_writer().submit(kind, query, params).result()
+            self._record_query(query, record_params, start)
+            return result
+
+        with self.connection() as conn:
+            result = _apply_write(conn.cursor(), kind, query, params)
+            self._record_query(query, record_params, start)
+            self._commit(conn)
+            return result
+
+    def _get_writer(self) -> 'GroupCommitWriter':
+        """Get the group-commit writer, creating it on first use"""
+        if self._writer is None:
+            with self._init_lock:
+                if self._writer is None:
+                    self._writer = GroupCommitWriter(
+                        self.pool,
+                        max_batch=Config.DB_WRITE_BATCH_MAX,
+                        window_ms=Config.DB_WRITE_BATCH_WINDOW_MS
+                    )
+        return self._writer
+
+    @contextmanager
+    def transaction(self, immediate: bool = False):
+        """Run the enclosed execute_* calls in a single transaction
+
+        With immediate=True the write lock is taken up front, so reads made
+        inside the transaction cannot be invalidated by a concurrent writer.
+        Nested transactions join the outermost one.
+        """
+        with self.connection() as conn:
+            if getattr(self._local, 'in_transaction', False):
+                yield conn
+                return
+
+            self._local.in_transaction = True
+            self._local.on_commit = []
+            try:
+                conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._local.in_transaction = False
+                callbacks, self._local.on_commit = self._local.on_commit, []
+
+        # Only reached when the transaction committed
+        for callback in callbacks:
+            callback()
+
+    def in_transaction(self) -> bool:
+        """Check whether this thread is inside transaction()"""
+        return getattr(self._local, 'in_transaction', False)
+
+    def after_commit(self, callback: Callable[[], None]):
+        """Run callback once the current transaction commits (or now if none)"""
+        if getattr(self._local, 'in_transaction', False):
+            self._local.on_commit.append(callback)
+        else:
+            callback()
+
+    def _commit(self, conn: sqlite3.Connection):
+        """Commit unless an enclosing transaction() owns the commit"""
+        if not getattr(self._local, 'in_transaction', False):
             conn.commit()
-            return cursor.lastrowid
 
-# Global database instance
-db = Database()
\ No newline at end of file
+# Global database instance (lazy: nothing is opened until first use)
+db = Database()
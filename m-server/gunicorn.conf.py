@@ -0,0 +1,116 @@
+"""
+Gunicorn configuration
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Three worker modes are supported, selected with GUNICORN_MODE:
+
+- ``process`` (default): 2 * CPUs + 1 single-threaded sync workers
+- ``threaded``: one gthread worker per CPU, each serving several threads
+- ``asgi``: one uvicorn worker per CPU serving ``asgi:app``; connections
+  live on the event loop and requests run on a bounded executor
+  (requires uvicorn: ``GUNICORN_MODE=asgi gunicorn -c gunicorn.conf.py asgi:app``)
+
+GUNICORN_WORKERS and GUNICORN_THREADS override the derived counts. Keep
+threads per worker at or below DB_POOL_SIZE so requests do not queue on
+the connection pool.
+
+The schema is migrated once in the master before any worker starts. With
+preload_app (GUNICORN_PRELOAD, default on) the app is imported once in the
+master and shared copy-on-write; post_fork then rebuilds the per-process
+state (connection pool, logging thread, metric shards) in every worker.
+
+Graceful reload: ``kill -HUP <master pid>`` starts new workers and lets old
+ones finish in-flight requests for up to graceful_timeout seconds. With
+preload_app the master keeps the code it loaded, so deploy new code with
+``kill -USR2`` (re-exec the master) followed by ``kill -WINCH`` / ``-QUIT``
+on the old master, or run with GUNICORN_PRELOAD=false.
+"""
+import multiprocessing
+import os
+import tempfile
+
+os.environ.setdefault('FLASK_ENV', 'production')
+# Workers share one log file, so none of them may rotate it
+os.environ.setdefault('LOG_ROTATION', 'external')
+# If rate limiting is enabled, all workers must draw from the same buckets
+os.environ.setdefault('RATE_LIMIT_STORE', 'sqlite')
+# Let every worker's /metrics include the others' counters
+os.environ.setdefault('METRICS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'm-server-metrics'))
+
+_cpus = multiprocessing.cpu_count()
+_mode = os.environ.get('GUNICORN_MODE', 'process')
+if _mode not in ('process', 'threaded', 'asgi'):
+    raise ValueError("GUNICORN_MODE must be 'process', 'threaded' or 'asgi'")
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+if _mode == 'asgi':
+    # Concurrency comes from the event loop; ASGI_MAX_WORKERS sizes the executor
+    workers = int(os.environ.get('GUNICORN_WORKERS', _cpus))
+    threads = 1
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'asgi:app'
+else:
+    if _mode == 'threaded':
+        workers = int(os.environ.get('GUNICORN_WORKERS', _cpus))
+        threads = int(os.environ.get('GUNICORN_THREADS', 4))
+    else:
+        workers = int(os.environ.get('GUNICORN_WORKERS', _cpus * 2 + 1))
+        threads = int(os.environ.get('GUNICORN_THREADS', 1))
+    worker_class = 'gthread' if threads > 1 else 'sync'
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically (with jitter so they do not restart together)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')  # e.g. '-' for stdout
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+
+def on_starting(server):
+    """Prepare shared state in the master before any worker exists"""
+    metrics_dir = os.environ['METRICS_MULTIPROC_DIR']
+    os.makedirs(metrics_dir, exist_ok=True)
+    # Snapshots from a previous run would be summed into the new one
+    for filename in os.listdir(metrics_dir):
+        if filename.startswith('metrics_'):
+            os.remove(os.path.join(metrics_dir, filename))
+
+    from database import db
+
+    # Migrate once here so workers never race on DDL, then drop the
+    # connections so none are inherited across fork
+    db.init_database()
+    db.pool.close_all()
+
+def post_fork(server, worker):
+    """Rebuild per-worker state inherited from the master"""
+    from app import init_worker
+
+    init_worker()
+    server.log.info("Worker %s initialized (%s mode, %d threads)", worker.pid, _mode, threads)
+
+def worker_exit(server, worker):
+    """Flush per-worker data before the process goes away"""
+    from database import db
+    from utils.logging_utils import shutdown_logging
+    from utils.metrics import metrics
+
+    metrics.flush(force=True)
+    if db.profiler.enabled:
+        db.profiler.flush(force=True)
+    shutdown_logging()
+
+def child_exit(server, worker):
+    """Fold an exited worker's metrics into the dead workers' totals (in the master)"""
+    from utils.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid, os.environ['METRICS_MULTIPROC_DIR'])
+
+def on_reload(server):
+    """Log graceful reloads (SIGHUP)"""
+    server.log.info("Reloading: replacing workers gracefully")
@@ -3,8 +3,13 @@
 Database management script
 """
 import os
+import sys
 import sqlite3
 from database import db
+from migrations import MigrationRunner
+from models.user_repository_db import UserRepositoryDB
+from query_profiler import top_stats
+from config import Config
 
 def show_database_info():
     """Show database information"""
@@ -25,14 +30,15 @@ def show_users():
     print("=" * 50)
     
     try:
-        users = db.execute_query("SELECT * FROM users ORDER BY id")
-        if users:
-            print(f"{'ID':<5} {'Name':<20} {'Email':<30} {'Created':<20}")
-            print("-" * 75)
-            for user in users:
-                created = user['created_at'][:19] if user['created_at'] else 'N/A'
-                print(f"{user['id']:<5} {user['name']:<20} {user['email']:<30} {created:<20}")
-        else:
+        count = 0
+        for user in db.iter_query("SELECT * FROM users ORDER BY id"):
+            if count == 0:
+                print(f"{'ID':<5} {'Name':<20} {'Email':<30} {'Created':<20}")
+                print("-" * 75)
+            created = user['created_at'][:19] if user['created_at'] else 'N/A'
+            print(f"{user['id']:<5} {user['name']:<20} {user['email']:<30} {created:<20}")
+            count += 1
+        if count == 0:
             print("No users found in database")
     except Exception as e:
         print(f"Error reading users: {e}")
@@ -58,9 +64,15 @@ def reset_database():
     print("=" * 50)
     
     try:
+        # Release pooled connections before removing the files
+        db.close()
+        
         # Delete database file if exists
         if os.path.exists(db.db_path):
             os.remove(db.db_path)
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(db.db_path + suffix):
+                    os.remove(db.db_path + suffix)
             print("✅ Old database deleted")
         
         # Reinitialize database
@@ -92,6 +104,127 @@ def backup_database():
     except Exception as e:
         print(f"❌ Error creating backup: {e}")
 
+def migrate_database(target=None):
+    """Apply pending schema migrations"""
+    print("⬆️  Applying Migrations")
+    print("=" * 50)
+    
+    try:
+        applied = MigrationRunner(db).migrate(target)
+        for migration in applied:
+            print(f"✅ Applied {migration.version:04d}_{migration.name}")
+        if not applied:
+            print("Database is up to date")
+    except Exception as e:
+        print(f"❌ Error applying migrations: {e}")
+
+def rollback_database(target=None):
+    """Revert schema migrations (one step by default)"""
+    print("⬇️  Rolling Back Migrations")
+    print("=" * 50)
+    
+    try:
+        reverted = MigrationRunner(db).rollback(target)
+        for migration in reverted:
+            print(f"✅ Reverted {migration.version:04d}_{migration.name}")
+        if not reverted:
+            print("Nothing to roll back")
+    except Exception as e:
+        print(f"❌ Error rolling back migrations: {e}")
+
+def show_migration_status():
+    """Show applied and pending migrations"""
+    print("📜 Migration Status")
+    print("=" * 50)
+    
+    try:
+        runner = MigrationRunner(db)
+        print(f"Current version: {runner.current_version()}")
+        print()
+        print(f"{'Version':<9} {'Name':<35} {'Applied':<20}")
+        print("-" * 65)
+        for entry in runner.status():
+            applied = entry['applied_at'] if entry['applied'] else 'pending'
+            print(f"{entry['version']:04d}{'':<5} {entry['name']:<35} {applied:<20}")
+    except Exception as e:
+        print(f"❌ Error reading migration status: {e}")
+    
+    print()
+
+def show_query_report(limit=None):
+    """Show the most expensive statements recorded by the query profiler"""
+    print("🐢 Query Profile Report")
+    print("=" * 50)
+    
+    stats = top_stats(Config.DB_PROFILE_STATS_DIR, limit or Config.DB_PROFILE_TOP_N)
+    if not stats:
+        print("No profile data found (run the server with DB_PROFILE_ENABLED=true)")
+        print()
+        return
+    
+    print(f"{'Count':>8} {'Total ms':>11} {'Avg ms':>9} {'Max ms':>9} {'Slow':>6}  Query")
+    print("-" * 90)
+    for entry in stats:
+        print(
+            f"{entry['count']:>8} {entry['total_ms']:>11.2f} {entry['avg_ms']:>9.3f} "
+            f"{entry['max_ms']:>9.3f} {entry['slow']:>6}  {entry['query'][:120]}"
+        )
+    print()
+
+def compact_changes(retention_days=None):
+    """Prune superseded change log entries and tombstones past retention"""
+    print("🧹 Compacting User Change Log")
+    print("=" * 50)
+    
+    if retention_days is None:
+        retention_days = Config.USER_CHANGES_RETENTION_DAYS
+    try:
+        result = UserRepositoryDB().compact_changes(retention_days)
+        print(f"✅ Removed {result['superseded']} superseded entries "
+              f"and {result['tombstones']} tombstones older than {retention_days:g} days")
+        print(f"Sync tokens from before change {result['pruned_through']} must start over")
+    except Exception as e:
+        print(f"❌ Error compacting change log: {e}")
+
+COMMANDS = {
+    'migrate': migrate_database,
+    'rollback': rollback_database,
+    'status': show_migration_status,
+    'report': show_query_report,
+    'compact': compact_changes,
+}
+
+MIGRATION_COMMANDS = (migrate_database, rollback_database, show_migration_status)
+
+def run_command(args):
+    """Run a non-interactive command, e.g. `python manage_db.py migrate 3`"""
+    command = COMMANDS.get(args[0])
+    if command is None:
+        print(f"❌ Unknown command: {args[0]} (expected one of: {', '.join(COMMANDS)})")
+        return 1
+    
+    if command is show_migration_status:
+        command_args = ()
+    else:
+        try:
+            command_args = (int(args[1]) if len(args) > 1 else None,)
+        except ValueError:
+            print(f"❌ Usage: python manage_db.py {args[0]} [<number>] (got {args[1]!r})")
+            return 1
+    if command in MIGRATION_COMMANDS:
+        without_auto_init(command, *command_args)
+    else:
+        command(*command_args)
+    return 0
+
+def without_auto_init(command, *args):
+    """Run a migration command on the schema as it is, not auto-migrated first"""
+    auto_init, db.auto_init = db.auto_init, False
+    try:
+        return command(*args)
+    finally:
+        db.auto_init = auto_init
+
 def main():
     """Main menu"""
     while True:
@@ -102,10 +235,15 @@ def main():
         print("3. Show database schema")
         print("4. Reset database")
         print("5. Backup database")
-        print("6. Exit")
+        print("6. Apply migrations")
+        print("7. Roll back last migration")
+        print("8. Show migration status")
+        print("9. Show query profile report")
+        print("10. Compact user change log")
+        print("11. Exit")
         print()
         
-        choice = input("Select option (1-6): ").strip()
+        choice = input("Select option (1-11): ").strip()
         
         if choice == '1':
             show_database_info()
@@ -120,10 +258,22 @@ def main():
         elif choice == '5':
             backup_database()
         elif choice == '6':
+            without_auto_init(migrate_database)
+        elif choice == '7':
+            without_auto_init(rollback_database)
+        elif choice == '8':
+            without_auto_init(show_migration_status)
+        elif choice == '9':
+            show_query_report()
+        elif choice == '10':
+            compact_changes()
+        elif choice == '11':
             print("👋 Goodbye!")
             break
         else:
             print("❌ Invalid option. Please try again.")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
     main()
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+Add per-table change counters maintained by triggers
+"""
+
+EVENTS = ('insert', 'update', 'delete')
+
+def up(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO table_versions (name) VALUES ('users')")
+    for event in EVENTS:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS users_version_{event}
+            AFTER {event.upper()} ON users
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+            END
+        ''')
+
+def down(cursor):
+    for event in EVENTS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS users_version_{event}')
+    cursor.execute('DROP TABLE IF EXISTS table_versions')
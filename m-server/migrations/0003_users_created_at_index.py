@@ -0,0 +1,12 @@
+"""
+Index users by (created_at, id) for ordered listing and keyset pagination
+"""
+
+def up(cursor):
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_created_at_id
+        ON users (created_at, id)
+    ''')
+
+def down(cursor):
+    cursor.execute('DROP INDEX IF EXISTS idx_users_created_at_id')
@@ -0,0 +1,12 @@
+"""
+Index users by email for case-insensitive lookups
+"""
+
+def up(cursor):
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_email_nocase
+        ON users (email COLLATE NOCASE)
+    ''')
+
+def down(cursor):
+    cursor.execute('DROP INDEX IF EXISTS idx_users_email_nocase')
@@ -0,0 +1,40 @@
+"""
+Add an FTS5 index over user names and emails, kept in sync by triggers
+"""
+
+def up(cursor):
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            name, email,
+            content='users', content_rowid='id',
+            prefix='2 3'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO users_fts (rowid, name, email) VALUES (new.id, new.name, new.email);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, email)
+            VALUES ('delete', old.id, old.name, old.email);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, email ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, name, email)
+            VALUES ('delete', old.id, old.name, old.email);
+            INSERT INTO users_fts (rowid, name, email) VALUES (new.id, new.name, new.email);
+        END
+    ''')
+    # Index rows that existed before this migration
+    cursor.execute("INSERT INTO users_fts (users_fts) VALUES ('rebuild')")
+
+def down(cursor):
+    for trigger in ('users_fts_insert', 'users_fts_delete', 'users_fts_update'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    cursor.execute('DROP TABLE IF EXISTS users_fts')
@@ -0,0 +1,17 @@
+"""
+Make email uniqueness case-insensitive so the constraint alone rejects duplicates
+"""
+
+def up(cursor):
+    cursor.execute('DROP INDEX IF EXISTS idx_users_email_nocase')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email_nocase
+        ON users (email COLLATE NOCASE)
+    ''')
+
+def down(cursor):
+    cursor.execute('DROP INDEX IF EXISTS idx_users_email_nocase')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_email_nocase
+        ON users (email COLLATE NOCASE)
+    ''')
@@ -0,0 +1,31 @@
+"""
+Add a trigger-maintained change log of user IDs touched by each write
+"""
+
+OPERATIONS = (('insert', 'new'), ('update', 'new'), ('delete', 'old'))
+
+def up(cursor):
+    # AUTOINCREMENT keeps sequence numbers from being reused once old entries are purged
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for op, row in OPERATIONS:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS user_changes_{op}
+            AFTER {op.upper()} ON users
+            BEGIN
+                INSERT INTO user_changes (user_id, op) VALUES ({row}.id, '{op}');
+            END
+        ''')
+    # Users created before the log existed must reach a first full sync too
+    cursor.execute("INSERT INTO user_changes (user_id, op) SELECT id, 'insert' FROM users ORDER BY id")
+
+def down(cursor):
+    for op, _ in OPERATIONS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS user_changes_{op}')
+    cursor.execute('DROP TABLE IF EXISTS user_changes')
@@ -0,0 +1,23 @@
+"""
+Index the user change log by user and record how far it has been compacted
+"""
+
+def up(cursor):
+    # Lets readers skip entries superseded by a later change to the same user
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_user_changes_user_seq
+        ON user_changes (user_id, seq)
+    ''')
+    # Tokens older than pruned_through may have missed compacted tombstones
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log_state (
+            name TEXT PRIMARY KEY,
+            pruned_through INTEGER NOT NULL DEFAULT 0,
+            compacted_at TIMESTAMP
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO change_log_state (name) VALUES ('users')")
+
+def down(cursor):
+    cursor.execute('DROP TABLE IF EXISTS change_log_state')
+    cursor.execute('DROP INDEX IF EXISTS idx_user_changes_user_seq')
@@ -0,0 +1,130 @@
+"""
+Versioned schema migrations
+
+Each migration is a module named NNNN_description.py in this package that
+defines up(cursor) and down(cursor). Applied versions are recorded in the
+schema_version table; every migration runs in its own transaction.
+"""
+import importlib
+import os
+import re
+from typing import Dict, List, Optional
+
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+class Migration:
+    """A single numbered migration module"""
+
+    def __init__(self, version: int, name: str, module):
+        self.version = version
+        self.name = name
+        self.module = module
+
+    def up(self, cursor):
+        """Apply the migration"""
+        self.module.up(cursor)
+
+    def down(self, cursor):
+        """Revert the migration"""
+        self.module.down(cursor)
+
+    def __repr__(self):
+        return f"<Migration {self.version:04d}: {self.name}>"
+
+class MigrationRunner:
+    """Applies and reverts migrations against a Database"""
+
+    def __init__(self, database, package: str = __name__):
+        self.database = database
+        self.package = package
+
+    def discover(self) -> List[Migration]:
+        """Load all migration modules in version order"""
+        directory = os.path.dirname(importlib.import_module(self.package).__file__)
+        migrations = []
+        for filename in sorted(os.listdir(directory)):
+            match = MIGRATION_FILE.match(filename)
+            if match:
+                module = importlib.import_module(f"{self.package}.{filename[:-3]}")
+                migrations.append(Migration(int(match.group(1)), match.group(2), module))
+        return migrations
+
+    def applied(self) -> Dict[int, str]:
+        """Map each applied version to the time it was applied"""
+        self._ensure_version_table()
+        rows = self.database.execute_query(
+            "SELECT version, applied_at FROM schema_version ORDER BY version"
+        )
+        return {row['version']: row['applied_at'] for row in rows}
+
+    def current_version(self) -> int:
+        """Get the highest applied migration version (0 if none)"""
+        applied = self.applied()
+        return max(applied) if applied else 0
+
+    def migrate(self, target: Optional[int] = None) -> List[Migration]:
+        """Apply pending migrations up to target (default: latest)"""
+        applied = self.applied()
+        done = []
+        for migration in self.discover():
+            if target is not None and migration.version > target:
+                break
+            if migration.version in applied:
+                continue
+            with self.database.transaction(immediate=True) as conn:
+                cursor = conn.cursor()
+                # Another process may have applied it while we waited for the lock
+                cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (migration.version,))
+                if cursor.fetchone():
+                    continue
+                migration.up(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                    (migration.version, migration.name)
+                )
+            done.append(migration)
+        return done
+
+    def rollback(self, target: Optional[int] = None) -> List[Migration]:
+        """Revert applied migrations down to target (default: one step back)"""
+        applied = self.applied()
+        if not applied:
+            return []
+        if target is None:
+            target = max(v for v in [0, *applied] if v < max(applied))
+
+        done = []
+        for migration in reversed(self.discover()):
+            if migration.version <= target:
+                break
+            if migration.version not in applied:
+                continue
+            with self.database.transaction(immediate=True) as conn:
+                cursor = conn.cursor()
+                migration.down(cursor)
+                cursor.execute("DELETE FROM schema_version WHERE version = ?", (migration.version,))
+            done.append(migration)
+        return done
+
+    def status(self) -> List[Dict]:
+        """Describe every known migration and whether it is applied"""
+        applied = self.applied()
+        return [
+            {
+                'version': migration.version,
+                'name': migration.name,
+                'applied': migration.version in applied,
+                'applied_at': applied.get(migration.version),
+            }
+            for migration in self.discover()
+        ]
+
+    def _ensure_version_table(self):
+        """Create the schema_version bookkeeping table if needed"""
+        self.database.execute_update('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
@@ -0,0 +1,171 @@
+"""
+Read-through cache in front of a user repository
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from utils.cache import LRUCache, MISSING
+from .user_model import User
+
+class CachedUserRepository:
+    """Caches user lookups by ID and invalidates them on writes
+
+    Writes made through this wrapper invalidate exactly the affected IDs once
+    their transaction commits. Writes from other processes are detected by
+    polling the trigger-maintained users table version at most once per
+    version_check_interval seconds, which flushes the whole cache.
+    Every other repository method is delegated unchanged.
+    """
+
+    def __init__(self, repository, max_size: int = 1024, ttl: float = 30.0,
+                 negative_ttl: float = 5.0, version_check_interval: float = 0.5):
+        self.repository = repository
+        self.cache = LRUCache(max_size, ttl)
+        self.negative_ttl = negative_ttl
+        self.version_check_interval = version_check_interval
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._version = None
+        self._version_checked_at = 0.0
+        self.negative_hits = 0
+        self.invalidations = 0
+        self.flushes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    def get_by_id(self, user_id: int) -> Optional[User]:
+        """Get user by ID, from cache when possible"""
+        if self.repository.in_transaction():
+            # Uncommitted writes are not in the cache yet, and rows read
+            # here must not be cached in case the transaction rolls back
+            return self.repository.get_by_id(user_id)
+        self._check_version()
+
+        user = self.cache.get(user_id)
+        if user is not MISSING:
+            if user is None:
+                self.negative_hits += 1
+            return user
+
+        generation = self._generation
+        user = self.repository.get_by_id(user_id)
+        with self._lock:
+            # Skip the fill if a local write landed while we were reading
+            if generation == self._generation:
+                self.cache.set(user_id, user, ttl=None if user else self.negative_ttl)
+        return user
+
+    def create(self, name: str, email: str) -> User:
+        """Create new user and drop any cached miss for its ID"""
+        user = self.repository.create(name, email)
+        self._written({user.id})
+        return user
+
+    def create_many(self, users: List[Tuple[str, str]]) -> List[User]:
+        """Create many users and drop any cached misses for their IDs"""
+        created = self.repository.create_many(users)
+        self._written({user.id for user in created})
+        return created
+
+    def update(self, user_id: int, name: str = None, email: str = None) -> Optional[User]:
+        """Update user and invalidate its cache entry"""
+        user = self.repository.update(user_id, name, email)
+        self._written({user_id})
+        return user
+
+    def update_many(self, changes: List[Tuple[int, Optional[str], Optional[str]]]) -> Dict[int, User]:
+        """Update many users and invalidate their cache entries"""
+        updated = self.repository.update_many(changes)
+        self._written(set(updated))
+        return updated
+
+    def delete(self, user_id: int) -> bool:
+        """Delete user and invalidate its cache entry"""
+        deleted = self.repository.delete(user_id)
+        self._written({user_id})
+        return deleted
+
+    def delete_many(self, user_ids: List[int]) -> Set[int]:
+        """Delete many users and invalidate their cache entries"""
+        deleted = self.repository.delete_many(user_ids)
+        self._written(deleted)
+        return deleted
+
+    def get_table_version(self) -> int:
+        """Get the users table version, syncing the cache with it
+
+        Callers that derive validators (such as ETags) from the version are
+        then guaranteed not to be served entries older than that version.
+        Inside a transaction the version may include uncommitted writes, so
+        it is returned without syncing the cache to it.
+        """
+        if self.repository.in_transaction():
+            return self.repository.get_table_version()
+        return self._sync_version()
+
+    def stats(self) -> Dict:
+        """Get cache counters"""
+        stats = self.cache.stats()
+        stats.update({
+            'negative_hits': self.negative_hits,
+            'invalidations': self.invalidations,
+            'flushes': self.flushes,
+            'table_version': self._version,
+        })
+        return stats
+
+    def _written(self, user_ids: Set[int]):
+        """Invalidate user_ids once the write that just ran commits
+
+        The write reports the table versions it moved between, so no extra
+        statements are needed to tell local changes from other processes'.
+        """
+        versions = self.repository.last_write_versions()
+        if versions is None:
+            # Nothing changed
+            return
+        before, after = versions
+        self.repository.after_commit(lambda: self._invalidate(user_ids, before, after))
+
+    def _invalidate(self, user_ids: Set[int], before: int, after: int):
+        """Apply a committed local write to the cache"""
+        with self._lock:
+            self._generation += 1
+            if self._version is not None and before > self._version:
+                # Another process wrote since we last looked
+                self.cache.clear()
+                self.flushes += 1
+            else:
+                # Callbacks of concurrent writers may arrive out of order, so
+                # an older write is applied without moving the version back
+                for user_id in user_ids:
+                    if self.cache.delete(user_id):
+                        self.invalidations += 1
+            if self._version is None or after > self._version:
+                self._version = after
+                self._version_checked_at = time.monotonic()
+
+    def _check_version(self):
+        """Flush the cache if another process changed the users table"""
+        now = time.monotonic()
+        if now - self._version_checked_at >= self.version_check_interval:
+            self._sync_version()
+
+    def _sync_version(self) -> int:
+        """Read the table version and flush the cache if it moved"""
+        now = time.monotonic()
+        generation = self._generation
+        version = self.repository.get_table_version()
+        with self._lock:
+            if generation != self._generation:
+                # A local write already synced a newer version
+                return version
+            if self._version is not None and version != self._version:
+                # Lookups that read before the flush must not refill the cache
+                self._generation += 1
+                self.cache.clear()
+                self.flushes += 1
+            self._version = version
+            self._version_checked_at = now
+        return version
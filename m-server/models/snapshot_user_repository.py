@@ -0,0 +1,311 @@
+"""
+In-process read snapshot of the users table
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from .user_model import User
+
+def _email_key(email: str) -> str:
+    """Case-folded email, matching the NOCASE unique index"""
+    return email if email.islower() else email.lower()
+
+def _order_key(row: Tuple) -> Tuple[str, int]:
+    """Sort key of a snapshot row: (created_at, id)"""
+    return row[3], row[0]
+
+class _SortedRows:
+    """Rows kept sorted by (created_at, id) in bounded buckets
+
+    A single 1M-entry list would shift megabytes on every insert or
+    removal; with buckets of at most 2 * BUCKET_SIZE rows each change only
+    touches one small list.
+    """
+
+    BUCKET_SIZE = 1000
+
+    def __init__(self, rows: List[Tuple] = ()):
+        ordered = sorted(rows, key=_order_key)
+        size = self.BUCKET_SIZE
+        self._buckets = [ordered[i:i + size] for i in range(0, len(ordered), size)]
+        self._maxes = [_order_key(bucket[-1]) for bucket in self._buckets]
+        self._len = len(ordered)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __reversed__(self) -> Iterator[Tuple]:
+        for bucket in reversed(self._buckets):
+            yield from reversed(bucket)
+
+    def add(self, row: Tuple):
+        """Insert a row at its sorted position"""
+        key = _order_key(row)
+        if not self._buckets:
+            self._buckets.append([row])
+            self._maxes.append(key)
+        else:
+            index = min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+            bucket = self._buckets[index]
+            insort(bucket, row, key=_order_key)
+            self._maxes[index] = _order_key(bucket[-1])
+            if len(bucket) > 2 * self.BUCKET_SIZE:
+                self._buckets[index:index + 1] = [bucket[:self.BUCKET_SIZE], bucket[self.BUCKET_SIZE:]]
+                self._maxes[index:index + 1] = [_order_key(bucket[self.BUCKET_SIZE - 1]), self._maxes[index]]
+        self._len += 1
+
+    def remove(self, row: Tuple):
+        """Remove a row if present"""
+        key = _order_key(row)
+        index = bisect_left(self._maxes, key)
+        if index == len(self._buckets):
+            return
+        bucket = self._buckets[index]
+        position = bisect_left(bucket, key, key=_order_key)
+        if position == len(bucket) or bucket[position][0] != row[0]:
+            return
+        del bucket[position]
+        self._len -= 1
+        if bucket:
+            self._maxes[index] = _order_key(bucket[-1])
+        else:
+            del self._buckets[index]
+            del self._maxes[index]
+
+class SnapshotUserRepository:
+    """Serves user reads from an in-memory copy of the users table
+
+    The whole table is loaded on first use and kept as immutable
+    (id, name, email, created_at) tuples indexed by ID and by case-folded
+    email, plus a bucketed list presorted by (created_at, id). Afterwards the
+    trigger-maintained user_changes log is polled at most once per
+    max_staleness seconds and only the users it names are re-read.
+
+    get_all, get_by_id, get_by_ids, count and email_exists never touch
+    SQLite while the snapshot is fresh. Writes made through this wrapper
+    mark it stale once they commit, so this process reads its own writes;
+    reads inside an open transaction go straight to the repository.
+    get_table_version brings the snapshot up to the version it reports, so
+    validators built from it never describe newer data than is served.
+    Every other method is delegated unchanged.
+    """
+
+    def __init__(self, repository, max_staleness: float = 1.0, batch_size: int = 10000):
+        self.repository = repository
+        self.max_staleness = max_staleness
+        self.batch_size = batch_size
+        self._by_id = {}
+        self._by_email = {}
+        self._order = _SortedRows()
+        self._seq = None
+        self._version = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._refresh_lock = threading.Lock()
+        self._data_lock = threading.Lock()
+        self.loads = 0
+        self.refreshes = 0
+        self.changes_applied = 0
+        self.last_load_ms = None
+        self.last_refresh_ms = None
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    def get_all(self) -> List[User]:
+        """Get all users, newest first"""
+        if not self._ensure_fresh():
+            return self.repository.get_all()
+        with self._data_lock:
+            return [User(*row) for row in reversed(self._order)]
+
+    def get_by_id(self, user_id: int) -> Optional[User]:
+        """Get user by ID"""
+        if not self._ensure_fresh():
+            return self.repository.get_by_id(user_id)
+        row = self._by_id.get(user_id)
+        return User(*row) if row else None
+
+    def get_by_ids(self, user_ids: List[int]) -> Dict[int, User]:
+        """Get many users by ID, keyed by ID"""
+        if not self._ensure_fresh():
+            return self.repository.get_by_ids(user_ids)
+        rows = (self._by_id.get(user_id) for user_id in user_ids)
+        return {row[0]: User(*row) for row in rows if row}
+
+    def count(self) -> int:
+        """Get total user count"""
+        if not self._ensure_fresh():
+            return self.repository.count()
+        return len(self._by_id)
+
+    def email_exists(self, email: str, exclude_user_id: int = None) -> bool:
+        """Check if email is taken, ignoring case"""
+        if not self._ensure_fresh():
+            return self.repository.email_exists(email, exclude_user_id)
+        owner = self._by_email.get(_email_key(email))
+        return owner is not None and owner != exclude_user_id
+
+    def create(self, name: str, email: str) -> User:
+        """Create new user"""
+        user = self.repository.create(name, email)
+        self._written()
+        return user
+
+    def create_many(self, users: List[Tuple[str, str]]) -> List[User]:
+        """Create many users"""
+        created = self.repository.create_many(users)
+        self._written()
+        return created
+
+    def update(self, user_id: int, name: str = None, email: str = None) -> Optional[User]:
+        """Update user"""
+        user = self.repository.update(user_id, name, email)
+        self._written()
+        return user
+
+    def update_many(self, changes: List[Tuple[int, Optional[str], Optional[str]]]) -> Dict[int, User]:
+        """Update many users"""
+        updated = self.repository.update_many(changes)
+        self._written()
+        return updated
+
+    def delete(self, user_id: int) -> bool:
+        """Delete user"""
+        deleted = self.repository.delete(user_id)
+        self._written()
+        return deleted
+
+    def delete_many(self, user_ids: List[int]) -> Set[int]:
+        """Delete many users"""
+        deleted = self.repository.delete_many(user_ids)
+        self._written()
+        return deleted
+
+    def get_table_version(self) -> int:
+        """Get the users table version, refreshing the snapshot if it is behind
+
+        Without this a client could get a current ETag on rows up to
+        max_staleness old, and then keep getting 304 on them.
+        """
+        version = self.repository.get_table_version()
+        if version == self._version or self.repository.in_transaction():
+            return version
+        with self._refresh_lock:
+            if version != self._version:
+                # Read after the version, so the snapshot is at least as new
+                self._refresh()
+                self._version = version
+        return version
+
+    def refresh(self):
+        """Bring the snapshot up to date now, loading it on first use"""
+        with self._refresh_lock:
+            self._refresh()
+
+    def stats(self) -> Dict:
+        """Get snapshot counters"""
+        return {
+            'users': len(self._by_id),
+            'seq': self._seq,
+            'age_seconds': round(time.monotonic() - self._checked_at, 3) if self._seq is not None else None,
+            'max_staleness': self.max_staleness,
+            'loads': self.loads,
+            'refreshes': self.refreshes,
+            'changes_applied': self.changes_applied,
+            'last_load_ms': self.last_load_ms,
+            'last_refresh_ms': self.last_refresh_ms,
+        }
+
+    def _ensure_fresh(self) -> bool:
+        """Refresh the snapshot if it is older than max_staleness
+
+        Returns False when the caller must read from the repository instead.
+        """
+        if self.repository.in_transaction():
+            # The snapshot cannot see this transaction's uncommitted writes
+            return False
+        if not self._is_stale():
+            return True
+        with self._refresh_lock:
+            # Another thread may have refreshed while we waited
+            if self._is_stale():
+                self._refresh()
+        return True
+
+    def _is_stale(self) -> bool:
+        """Check whether a local write or max_staleness calls for a refresh"""
+        return self._stale or time.monotonic() - self._checked_at >= self.max_staleness
+
+    def _refresh(self):
+        """Load the snapshot, or apply the changes logged since the last refresh"""
+        now = time.monotonic()
+        # Cleared before reading, so writes committing meanwhile mark it again
+        self._stale = False
+        try:
+            if self._seq is None:
+                self._load()
+            else:
+                start = time.perf_counter()
+                pruned_through, head, rows = self.repository.get_changes(self._seq)
+                if pruned_through > self._seq:
+                    # Compaction removed tombstones we never applied
+                    self._load()
+                else:
+                    if rows:
+                        self._apply(rows)
+                    self._seq = max(self._seq, head)
+                self.refreshes += 1
+                self.last_refresh_ms = round((time.perf_counter() - start) * 1000, 3)
+        except BaseException:
+            self._stale = True
+            raise
+        self._checked_at = now
+
+    def _load(self):
+        """Read the whole table in one statement"""
+        start = time.perf_counter()
+        by_id = {}
+        by_email = {}
+        seq = 0
+        for seq, *row in self.repository.iter_rows_with_seq(self.batch_size):
+            if row[0] is None:
+                # Empty table
+                continue
+            row = tuple(row)
+            by_id[row[0]] = row
+            by_email[_email_key(row[2])] = row[0]
+        order = _SortedRows(by_id.values())
+
+        with self._data_lock:
+            self._by_id, self._by_email, self._order = by_id, by_email, order
+            self._seq = seq
+        self.loads += 1
+        self.last_load_ms = round((time.perf_counter() - start) * 1000, 3)
+
+    def _apply(self, rows: List[Tuple]):
+        """Replace the changed users with their current rows"""
+        with self._data_lock:
+            for seq, user_id, _, name, email, created_at in rows:
+                old = self._by_id.pop(user_id, None)
+                if old is not None:
+                    self._order.remove(old)
+                    if self._by_email.get(_email_key(old[2])) == user_id:
+                        del self._by_email[_email_key(old[2])]
+
+                if name is not None:
+                    row = (user_id, name, email, created_at)
+                    self._by_id[user_id] = row
+                    self._by_email[_email_key(email)] = user_id
+                    self._order.add(row)
+                self._seq = max(self._seq, seq)
+            self.changes_applied += len(rows)
+
+    def _written(self):
+        """Make the next read refresh once the write that just ran commits"""
+        self.repository.after_commit(self._mark_stale)
+
+    def _mark_stale(self):
+        """Force a refresh on the next read"""
+        self._stale = True
@@ -2,16 +2,35 @@
 User model class
 """
 from datetime import datetime
-from typing import Dict
+from json.encoder import encode_basestring_ascii
+from typing import Dict, Tuple, Union
 
 class User:
-    """User model class"""
+    """User model class
     
-    def __init__(self, id: int, name: str, email: str, created_at: datetime = None):
+    Uses __slots__ to keep per-instance memory small. created_at may be
+    given as a datetime or as the raw SQLite timestamp text; text is only
+    parsed when the datetime is actually asked for.
+    """
+    
+    __slots__ = ('id', 'name', 'email', '_created_at')
+    
+    def __init__(self, id: int, name: str, email: str, created_at: Union[datetime, str] = None):
         self.id = id
         self.name = name
         self.email = email
-        self.created_at = created_at or datetime.now()
+        self._created_at = created_at or datetime.now()
+    
+    @property
+    def created_at(self) -> datetime:
+        """Creation time as a datetime"""
+        if isinstance(self._created_at, str):
+            self._created_at = _parse_timestamp(self._created_at)
+        return self._created_at
+    
+    @created_at.setter
+    def created_at(self, value: Union[datetime, str]):
+        self._created_at = value
     
     def to_dict(self) -> Dict:
         """Convert user object to dictionary"""
@@ -19,7 +38,7 @@ class User:
             'id': self.id,
             'name': self.name,
             'email': self.email,
-            'created_at': self.created_at.isoformat()
+            'created_at': iso_timestamp(self._created_at)
         }
     
     @classmethod
@@ -33,4 +52,33 @@ class User:
         )
     
     def __repr__(self):
-        return f"<User {self.id}: {self.name}>"
\ No newline at end of file
+        return f"<User {self.id}: {self.name}>"
+
+def iso_timestamp(value: Union[datetime, str]) -> str:
+    """Format a datetime or SQLite timestamp text as ISO 8601
+    
+    SQLite's CURRENT_TIMESTAMP text ('YYYY-MM-DD HH:MM:SS') is converted by
+    swapping the separator, which gives the same result as parsing it and
+    calling isoformat(); anything else takes the parsing route.
+    """
+    if not isinstance(value, str):
+        return value.isoformat()
+    if len(value) == 19 and value[10] == ' ':
+        return value[:10] + 'T' + value[11:]
+    return _parse_timestamp(value).isoformat()
+
+def user_row_json(row: Tuple) -> str:
+    """Serialize an (id, name, email, created_at) row straight to JSON
+    
+    Produces the same compact text as json.dumps(User.to_dict()) with
+    (',', ':') separators, without building a User or a dict.
+    """
+    created_at = iso_timestamp(row[3] or datetime.now())
+    return (
+        f'{{"id":{row[0]},"name":{encode_basestring_ascii(row[1])},'
+        f'"email":{encode_basestring_ascii(row[2])},"created_at":"{created_at}"}}'
+    )
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parse SQLite timestamp text"""
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
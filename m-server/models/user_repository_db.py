@@ -1,20 +1,109 @@
 """
 Database-backed user repository
 """
-from typing import List, Optional
-from datetime import datetime
+import json
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple, Iterator, Set
 from .user_model import User
 from database import db
 
+# RETURNING cannot use table.* wildcards, so written rows are listed explicitly
+USER_COLUMNS = "id, name, email, created_at, updated_at"
+# Latest change log seq ever issued; unlike MAX(seq) it survives compaction
+CHANGE_LOG_HEAD = "SELECT COALESCE(MAX(seq), 0) AS seq FROM sqlite_sequence WHERE name = 'user_changes'"
+# Appended to RETURNING clauses so writes report the version they started from
+TABLE_VERSION = "(SELECT version FROM table_versions WHERE name = 'users') AS table_version"
+
+class DuplicateEmailError(ValueError):
+    """Raised when a write violates the unique email constraint"""
+
 class UserRepositoryDB:
     """Database-backed user repository"""
     
+    def __init__(self):
+        self._local = threading.local()
+    
+    def transaction(self, immediate: bool = False):
+        """Group repository calls into one database transaction"""
+        return db.transaction(immediate)
+    
+    def after_commit(self, callback):
+        """Run callback once the current transaction (if any) commits"""
+        db.after_commit(callback)
+    
+    def in_transaction(self) -> bool:
+        """Check whether the calling thread has a transaction open"""
+        return db.in_transaction()
+    
     def get_all(self) -> List[User]:
         """Get all users from database"""
         query = "SELECT * FROM users ORDER BY created_at DESC"
         rows = db.execute_query(query)
         return [self._row_to_user(row) for row in rows]
     
+    def iter_all(self, batch_size: int = 1000) -> Iterator[User]:
+        """Stream all users from database in id order"""
+        query = "SELECT * FROM users ORDER BY id"
+        for row in db.iter_query(query, batch_size=batch_size):
+            yield self._row_to_user(row)
+    
+    def iter_rows(self, batch_size: int = 1000) -> Iterator[Tuple]:
+        """Stream all users in id order as (id, name, email, created_at) tuples
+        
+        The fast path for bulk serialization: no dict or User per row, and
+        created_at stays as the stored text.
+        """
+        query = "SELECT id, name, email, created_at FROM users ORDER BY id"
+        return db.iter_rows(query, batch_size=batch_size)
+    
+    def get_page(self, limit: int, after: Tuple[str, int] = None) -> Tuple[List[User], Optional[Tuple[str, int]]]:
+        """Get one page of users, newest first, using keyset pagination
+        
+        Returns the users and the (created_at, id) key to resume after,
+        or None when there are no further rows.
+        """
+        if after:
+            query = """
+                SELECT * FROM users
+                WHERE (created_at, id) < (?, ?)
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """
+            params = (after[0], after[1], limit + 1)
+        else:
+            query = "SELECT * FROM users ORDER BY created_at DESC, id DESC LIMIT ?"
+            params = (limit + 1,)
+        
+        rows = db.execute_query(query, params)
+        next_key = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_key = (rows[-1]['created_at'], rows[-1]['id'])
+        return [self._row_to_user(row) for row in rows], next_key
+    
+    def search(self, text: str, limit: int, offset: int = 0) -> Tuple[List[User], bool]:
+        """Full-text search users by name/email prefixes, ranked by bm25
+        
+        Every word of the input must prefix-match a token of the name or
+        email. Returns the page of users and whether more results follow.
+        """
+        terms = re.findall(r'\w+', text)
+        if not terms:
+            return [], False
+        
+        match = ' '.join(f'"{term}"*' for term in terms)
+        query = """
+            SELECT users.* FROM users_fts
+            JOIN users ON users.id = users_fts.rowid
+            WHERE users_fts MATCH ?
+            ORDER BY bm25(users_fts, 2.0, 1.0), users.id
+            LIMIT ? OFFSET ?
+        """
+        rows = db.execute_query(query, (match, limit + 1, offset))
+        return [self._row_to_user(row) for row in rows[:limit]], len(rows) > limit
+    
     def get_by_id(self, user_id: int) -> Optional[User]:
         """Get user by ID from database"""
         query = "SELECT * FROM users WHERE id = ?"
@@ -23,16 +112,50 @@ class UserRepositoryDB:
             return self._row_to_user(rows[0])
         return None
     
+    def get_by_ids(self, user_ids: List[int]) -> Dict[int, User]:
+        """Get many users by ID in one query, keyed by ID"""
+        if not user_ids:
+            return {}
+        
+        query = "SELECT * FROM users WHERE id IN (SELECT value FROM json_each(?))"
+        rows = db.execute_query(query, (json.dumps(list(user_ids)),))
+        return {row['id']: self._row_to_user(row) for row in rows}
+    
     def create(self, name: str, email: str) -> User:
-        """Create new user in database"""
-        query = "INSERT INTO users (name, email) VALUES (?, ?)"
-        user_id = db.execute_insert(query, (name, email))
+        """Create new user in database with a single INSERT ... RETURNING
         
-        # Return the created user
-        return self.get_by_id(user_id)
+        Raises DuplicateEmailError when the email is already taken.
+        """
+        query = f"INSERT INTO users (name, email) VALUES (?, ?) RETURNING {USER_COLUMNS}, {TABLE_VERSION}"
+        rows = self._write(query, (name, email))
+        return self._row_to_user(rows[0])
+    
+    def create_many(self, users: List[Tuple[str, str]]) -> List[User]:
+        """Create many users with one statement and return them in input order
+        
+        Users whose email is already taken are skipped and left out of the
+        result.
+        """
+        if not users:
+            return []
+        
+        query = f"""
+            INSERT INTO users (name, email)
+            SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+            WHERE true
+            ON CONFLICT DO NOTHING
+            RETURNING {USER_COLUMNS}, {TABLE_VERSION}
+        """
+        rows = self._write(query, (json.dumps([list(user) for user in users]),))
+        by_email = {row['email']: self._row_to_user(row) for row in rows}
+        return [by_email[email] for _, email in users if email in by_email]
     
     def update(self, user_id: int, name: str = None, email: str = None) -> Optional[User]:
-        """Update user in database"""
+        """Update user in database with a single UPDATE ... RETURNING
+        
+        Returns None when the user does not exist and raises
+        DuplicateEmailError when the new email belongs to another user.
+        """
         # Build dynamic update query
         updates = []
         params = []
@@ -51,18 +174,55 @@ class UserRepositoryDB:
         updates.append("updated_at = CURRENT_TIMESTAMP")
         params.append(user_id)
         
-        query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
-        affected_rows = db.execute_update(query, tuple(params))
+        query = f"UPDATE users SET {', '.join(updates)} WHERE id = ? RETURNING {USER_COLUMNS}, {TABLE_VERSION}"
+        rows = self._write(query, tuple(params))
+        return self._row_to_user(rows[0]) if rows else None
+    
+    def update_many(self, changes: List[Tuple[int, Optional[str], Optional[str]]]) -> Dict[int, User]:
+        """Apply (user_id, name, email) changes with one statement
         
-        if affected_rows > 0:
-            return self.get_by_id(user_id)
-        return None
+        A None name or email leaves that column unchanged. Returns the
+        updated users keyed by ID; users that do not exist or whose new
+        email is already taken are skipped.
+        """
+        if not changes:
+            return {}
+        
+        query = f"""
+            UPDATE OR IGNORE users
+            SET name = COALESCE(json_extract(change.value, '$[1]'), users.name),
+                email = COALESCE(json_extract(change.value, '$[2]'), users.email),
+                updated_at = CURRENT_TIMESTAMP
+            FROM json_each(?) AS change
+            WHERE users.id = json_extract(change.value, '$[0]')
+            RETURNING {USER_COLUMNS}, {TABLE_VERSION}
+        """
+        rows = self._write(query, (json.dumps([list(change) for change in changes]),))
+        return {row['id']: self._row_to_user(row) for row in rows}
     
     def delete(self, user_id: int) -> bool:
         """Delete user from database"""
-        query = "DELETE FROM users WHERE id = ?"
-        affected_rows = db.execute_update(query, (user_id,))
-        return affected_rows > 0
+        query = f"DELETE FROM users WHERE id = ? RETURNING id, {TABLE_VERSION}"
+        return bool(self._write(query, (user_id,)))
+    
+    def delete_many(self, user_ids: List[int]) -> Set[int]:
+        """Delete many users with one statement and return the IDs removed"""
+        if not user_ids:
+            return set()
+        
+        query = f"""
+            DELETE FROM users WHERE id IN (SELECT value FROM json_each(?))
+            RETURNING id, {TABLE_VERSION}
+        """
+        rows = self._write(query, (json.dumps(list(user_ids)),))
+        return {row['id'] for row in rows}
+    
+    def last_write_versions(self) -> Optional[Tuple[int, int]]:
+        """Get the users table version before and after this thread's last write
+        
+        Returns None when that write changed no rows.
+        """
+        return getattr(self._local, 'last_write', None)
     
     def count(self) -> int:
         """Get total user count from database"""
@@ -73,20 +233,131 @@ class UserRepositoryDB:
     def email_exists(self, email: str, exclude_user_id: int = None) -> bool:
         """Check if email exists in database"""
         if exclude_user_id:
-            query = "SELECT COUNT(*) as count FROM users WHERE email = ? AND id != ?"
+            query = "SELECT COUNT(*) as count FROM users WHERE email = ? COLLATE NOCASE AND id != ?"
             result = db.execute_query(query, (email, exclude_user_id))
         else:
-            query = "SELECT COUNT(*) as count FROM users WHERE email = ?"
+            query = "SELECT COUNT(*) as count FROM users WHERE email = ? COLLATE NOCASE"
             result = db.execute_query(query, (email,))
         
         return result[0]['count'] > 0 if result else False
     
+    def find_existing_ids(self, user_ids: List[int]) -> Set[int]:
+        """Return which of the given IDs exist, in one query"""
+        if not user_ids:
+            return set()
+        
+        query = "SELECT id FROM users WHERE id IN (SELECT value FROM json_each(?))"
+        rows = db.execute_query(query, (json.dumps(list(user_ids)),))
+        return {row['id'] for row in rows}
+    
+    def iter_rows_with_seq(self, batch_size: int = 1000) -> Iterator[Tuple]:
+        """Stream (seq, id, name, email, created_at) for every user
+        
+        seq is the change log position the rows reflect; one statement
+        reads both, so they come from the same database snapshot. An empty
+        table still yields one row, with the user columns NULL.
+        """
+        query = f"""
+            SELECT log.seq, users.id, users.name, users.email, users.created_at
+            FROM ({CHANGE_LOG_HEAD}) AS log
+            LEFT JOIN users ON true
+        """
+        return db.iter_rows(query, batch_size=batch_size)
+    
+    def get_changes(self, since: int, limit: int = None) -> Tuple[int, int, List[Tuple]]:
+        """Get the users changed after change log seq since, oldest change first
+        
+        Returns (pruned_through, head, rows): the seq up to which compaction
+        may have removed tombstones, the latest seq issued, and
+        (seq, user_id, changed_at, name, email,
+        created_at) rows, one per user, carrying the latest change to that
+        user and its current columns (NULL once the user is deleted).
+        Superseded log entries are skipped through the (user_id, seq) index,
+        so the cost follows the number of changes, not the table size.
+        """
+        query = f"""
+            SELECT state.pruned_through, ({CHANGE_LOG_HEAD}), log.seq, log.user_id,
+                   log.changed_at, users.name, users.email, users.created_at
+            FROM (SELECT pruned_through FROM change_log_state WHERE name = 'users') AS state
+            LEFT JOIN (
+                SELECT seq, user_id, changed_at FROM user_changes AS change
+                WHERE seq > ? AND NOT EXISTS (
+                    SELECT 1 FROM user_changes AS later
+                    WHERE later.user_id = change.user_id AND later.seq > change.seq
+                )
+                ORDER BY seq
+                LIMIT ?
+            ) AS log ON true
+            LEFT JOIN users ON users.id = log.user_id
+            ORDER BY log.seq
+        """
+        rows = list(db.iter_rows(query, (since, -1 if limit is None else limit)))
+        if not rows:
+            return 0, 0, []
+        # With no changes the single row only carries the log state
+        return rows[0][0], rows[0][1], [row[2:] for row in rows if row[2] is not None]
+    
+    def compact_changes(self, retention_days: float) -> Dict:
+        """Prune the change log
+        
+        Entries superseded by a later change to the same user are never
+        read again and always go; tombstones (delete entries) go once older
+        than retention_days, and pruned_through records the newest one
+        removed so readers holding older positions can tell they missed it.
+        """
+        with db.transaction(immediate=True):
+            superseded = db.execute_update("""
+                DELETE FROM user_changes
+                WHERE EXISTS (
+                    SELECT 1 FROM user_changes AS later
+                    WHERE later.user_id = user_changes.user_id AND later.seq > user_changes.seq
+                )
+            """)
+            rows = db.execute_returning("""
+                DELETE FROM user_changes
+                WHERE op = 'delete' AND changed_at < datetime('now', ?)
+                RETURNING seq
+            """, (f"-{retention_days} days",))
+            if rows:
+                db.execute_update(
+                    "UPDATE change_log_state SET pruned_through = MAX(pruned_through, ?) WHERE name = 'users'",
+                    (max(row['seq'] for row in rows),)
+                )
+            db.execute_update(
+                "UPDATE change_log_state SET compacted_at = CURRENT_TIMESTAMP WHERE name = 'users'"
+            )
+            state = db.execute_query("SELECT pruned_through FROM change_log_state WHERE name = 'users'")
+        
+        return {
+            'superseded': superseded,
+            'tombstones': len(rows),
+            'pruned_through': state[0]['pruned_through'] if state else 0,
+        }
+    
+    def get_table_version(self) -> int:
+        """Get the users change counter maintained by triggers"""
+        query = "SELECT version FROM table_versions WHERE name = 'users'"
+        result = db.execute_query(query)
+        return result[0]['version'] if result else 0
+    
+    def _write(self, query: str, params: tuple) -> List[Dict]:
+        """Run one write ... RETURNING statement and note the table versions it spans"""
+        self._local.last_write = None
+        try:
+            rows = db.execute_returning(query, params)
+        except sqlite3.IntegrityError as e:
+            if 'users.email' in str(e):
+                raise DuplicateEmailError("Email already exists") from e
+            raise
+        
+        if rows:
+            # The subquery sees the version before the statement's own
+            # triggers ran, and each changed row bumps it by one
+            before = rows[0]['table_version']
+            self._local.last_write = (before, before + len(rows))
+        return rows
+    
     def _row_to_user(self, row: dict) -> User:
         """Convert database row to User object"""
-        created_at = datetime.fromisoformat(row['created_at'].replace('Z', '+00:00')) if row['created_at'] else datetime.now()
-        return User(
-            id=row['id'],
-            name=row['name'],
-            email=row['email'],
-            created_at=created_at
-        )
\ No newline at end of file
+        # created_at is kept as text and only parsed if someone needs the datetime
+        return User(row['id'], row['name'], row['email'], row['created_at'])
\ No newline at end of file
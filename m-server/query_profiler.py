@@ -0,0 +1,290 @@
+"""
+Opt-in SQL query profiler
+
+Records per-statement timings aggregated by query fingerprint, writes
+statements slower than a threshold (with their EXPLAIN QUERY PLAN) to a
+slow-query log, and warns when a single request repeats the same
+statement often enough to look like an N+1 pattern.
+
+Request threads only count and time statements; EXPLAIN, the slow-query
+log and the stats file are handled by one background thread per process.
+"""
+import atexit
+import glob
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('query_profiler.slow')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(query: str) -> str:
+    """Reduce a statement to its shape: literals and IN lists become '?'"""
+    query = _STRING_LITERAL.sub('?', query)
+    query = _NUMBER_LITERAL.sub('?', query)
+    query = _WHITESPACE.sub(' ', query).strip()
+    return _PLACEHOLDER_LIST.sub('?+', query)
+
+class QueryProfiler:
+    """Aggregates statement timings by normalized SQL"""
+
+    def __init__(self, enabled: bool = False, slow_query_ms: float = 100.0,
+                 slow_log_path: str = None, top_n: int = 20, stats_dir: str = None,
+                 n_plus_one_threshold: int = 10, flush_interval: float = 5.0,
+                 slow_queue_size: int = 1000):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.top_n = top_n
+        self.stats_dir = stats_dir
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.flush_interval = flush_interval
+        self._stats = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_flush = 0.0
+        # Files are only opened once there is something to write
+        self.slow_log_path = slow_log_path
+        self._slow_queue = queue.Queue(maxsize=slow_queue_size)
+        self._worker = None
+        self._worker_pid = None
+        self.slow_dropped = 0
+
+        if enabled and stats_dir:
+            atexit.register(self.flush, force=True)
+
+    def fingerprint(self, query: str) -> str:
+        """Get the normalized form of a statement (memoized)"""
+        normalized = self._fingerprints.get(query)
+        if normalized is None:
+            normalized = normalize_sql(query)
+            if len(self._fingerprints) > 4096:
+                self._fingerprints.clear()
+            self._fingerprints[query] = normalized
+        return normalized
+
+    def record(self, query: str, params, duration: float, db_path: str = None):
+        """Record one executed statement (db_path lets slow ones be explained)"""
+        normalized = self.fingerprint(query)
+        duration_ms = duration * 1000
+
+        with self._lock:
+            entry = self._stats.get(normalized)
+            if entry is None:
+                entry = self._stats[normalized] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'slow': 0}
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            if duration_ms >= self.slow_query_ms:
+                entry['slow'] += 1
+
+        request_counts = getattr(self._local, 'counts', None)
+        if request_counts is not None:
+            request_counts[normalized] += 1
+
+        if duration_ms >= self.slow_query_ms:
+            self._ensure_worker()
+            try:
+                self._slow_queue.put_nowait((query, params, duration_ms, normalized, db_path))
+            except queue.Full:
+                self.slow_dropped += 1
+
+    def begin_request(self):
+        """Start counting statements for the current thread's request
+
+        Requests may nest (batch sub-requests run on the batch's thread);
+        the outer request's counts resume when the inner one ends.
+        """
+        outer = getattr(self._local, 'outer', None)
+        if outer is None:
+            outer = self._local.outer = []
+        outer.append(getattr(self._local, 'counts', None))
+        self._local.counts = Counter()
+
+    def end_request(self, label: str = '') -> Dict[str, int]:
+        """Finish the current request, warning about repeated statements"""
+        counts = getattr(self._local, 'counts', None) or Counter()
+        outer = getattr(self._local, 'outer', None)
+        self._local.counts = outer.pop() if outer else None
+
+        for normalized, count in counts.items():
+            if count >= self.n_plus_one_threshold:
+                logger.warning(
+                    "Possible N+1 query in %s: %d executions of %s", label, count, normalized
+                )
+        if self.stats_dir:
+            # Stats are persisted by the background thread
+            self._ensure_worker()
+        return dict(counts)
+
+    def drain(self, timeout: float = 5.0) -> bool:
+        """Wait until queued slow statements are logged (for tests and shutdown)"""
+        deadline = time.monotonic() + timeout
+        while self._slow_queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def top(self, n: int = None, by: str = 'total_ms') -> List[Dict]:
+        """Get the most expensive statements of this process"""
+        with self._lock:
+            stats = [dict(entry, query=query) for query, entry in self._stats.items()]
+        return _rank(stats, n or self.top_n, by)
+
+    def flush(self, force: bool = False):
+        """Persist this process's aggregates for `manage_db.py report`"""
+        if not self.stats_dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+
+        with self._lock:
+            stats = {query: dict(entry) for query, entry in self._stats.items()}
+        path = os.path.join(self.stats_dir, f"query_stats_{os.getpid()}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.stats_dir, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(stats, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not persist query stats to %s: %s", path, e)
+
+    def reset(self):
+        """Drop all aggregates"""
+        with self._lock:
+            self._stats = {}
+
+    def _ensure_worker(self):
+        """Start the background thread (again, after a fork)"""
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker = threading.Thread(target=self._run, name='query-profiler', daemon=True)
+            self._worker.start()
+            self._worker_pid = os.getpid()
+
+    def _run(self):
+        """Log slow statements as they come and persist stats periodically"""
+        connections = {}
+        while True:
+            try:
+                job = self._slow_queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                job = None
+            if job is not None:
+                try:
+                    self._log_slow(*job, connections)
+                except Exception as e:
+                    logger.warning("Could not log slow query: %s", e)
+                finally:
+                    self._slow_queue.task_done()
+            self.flush()
+
+    def _log_slow(self, query: str, params, duration_ms: float, normalized: str, db_path: str,
+                  connections: Dict):
+        """Write a slow statement and its query plan to the slow-query log"""
+        plan = None
+        if db_path is not None:
+            try:
+                conn = connections.get(db_path)
+                if conn is None:
+                    # The plan only needs the schema; never write from here
+                    conn = connections[db_path] = sqlite3.connect(
+                        f"file:{db_path}?mode=ro", uri=True, check_same_thread=False
+                    )
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+                plan = [row[3] for row in rows]
+            except Exception:
+                plan = None
+        if self.slow_log_path and not slow_logger.handlers:
+            self._open_slow_log()
+        slow_logger.info(json.dumps({
+            'duration_ms': round(duration_ms, 3),
+            'fingerprint': hashlib.md5(normalized.encode('utf-8')).hexdigest()[:12],
+            'query': normalized,
+            'plan': plan,
+        }))
+
+    def _open_slow_log(self):
+        """Attach the slow-query log file on first use"""
+        with self._lock:
+            if slow_logger.handlers:
+                return
+            handler = logging.FileHandler(self.slow_log_path)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            slow_logger.addHandler(handler)
+            slow_logger.setLevel(logging.INFO)
+            # Slow queries go to their own file only, not app.log as well
+            slow_logger.propagate = False
+
+def load_stats(stats_dir: str) -> List[Dict]:
+    """Merge the aggregates persisted by every process in stats_dir"""
+    merged = {}
+    for path in glob.glob(os.path.join(stats_dir, 'query_stats_*.json')):
+        try:
+            with open(path) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for query, entry in stats.items():
+            current = merged.setdefault(query, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'slow': 0})
+            current['count'] += entry['count']
+            current['total_ms'] += entry['total_ms']
+            current['max_ms'] = max(current['max_ms'], entry['max_ms'])
+            current['slow'] += entry.get('slow', 0)
+    return [dict(entry, query=query) for query, entry in merged.items()]
+
+def _rank(stats: List[Dict], n: int, by: str) -> List[Dict]:
+    """Sort statements by a metric and add their mean time"""
+    for entry in stats:
+        entry['avg_ms'] = entry['total_ms'] / entry['count'] if entry['count'] else 0.0
+    return sorted(stats, key=lambda entry: entry[by], reverse=True)[:n]
+
+def top_stats(stats_dir: str, n: int = 20, by: str = 'total_ms') -> List[Dict]:
+    """Get the most expensive statements across all processes"""
+    return _rank(load_stats(stats_dir), n, by)
+
+def init_query_profiler(app, database):
+    """Register per-request statement tracking on the Flask app"""
+    from flask import request
+
+    profiler = database.profiler
+
+    @app.before_request
+    def begin_query_profile():
+        profiler.begin_request()
+
+    @app.teardown_request
+    def end_query_profile(exc):
+        label = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+        profiler.end_request(label)
+
+def profiler_from_config(config) -> QueryProfiler:
+    """Build a profiler from a config class"""
+    return QueryProfiler(
+        enabled=config.DB_PROFILE_ENABLED,
+        slow_query_ms=config.DB_SLOW_QUERY_MS,
+        slow_log_path=config.DB_SLOW_QUERY_LOG,
+        top_n=config.DB_PROFILE_TOP_N,
+        stats_dir=config.DB_PROFILE_STATS_DIR,
+        n_plus_one_threshold=config.DB_N_PLUS_ONE_THRESHOLD
+    )
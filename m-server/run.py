@@ -4,16 +4,21 @@ Application entry point
 """
 import os
 from app import create_app
+from config import config
 from utils.logging_utils import setup_logging
 
 if __name__ == '__main__':
+    config_name = os.environ.get('FLASK_ENV', 'development')
+    
     # Setup logging
-    setup_logging()
+    setup_logging(config[config_name])
     
     # Create Flask application
-    config_name = os.environ.get('FLASK_ENV', 'development')
     app = create_app(config_name)
     
+    if not app.config['DEBUG']:
+        app.logger.warning("app.run() is the development server; use `gunicorn -c gunicorn.conf.py wsgi:app`")
+    
     # Run the application
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=app.config['DEBUG'])
@@ -1,6 +1,6 @@
 """
 Services package
 """
-from .user_service import UserService
+from .user_service import UserService, SyncTokenExpiredError
 
-__all__ = ['UserService']
\ No newline at end of file
+__all__ = ['UserService', 'SyncTokenExpiredError']
\ No newline at end of file
@@ -2,21 +2,133 @@
 Business logic services
 """
 import re
-from typing import Dict, List, Optional
-from models.user_model import User
+import json
+import base64
+import binascii
+from typing import Callable, Dict, List, Optional, Tuple, Iterator
+from models.user_model import User, iso_timestamp, user_row_json
 from models.user_repository_db import UserRepositoryDB
+from models.cached_user_repository import CachedUserRepository
+from models.snapshot_user_repository import SnapshotUserRepository
+from utils.single_flight import SingleFlight
+from config import Config
+
+class SyncTokenExpiredError(ValueError):
+    """Raised when a sync token predates changes removed by compaction"""
 
 class UserService:
     """User service for business logic"""
     
-    def __init__(self):
-        self.repository = UserRepositoryDB()
+    def __init__(self, repository=None, single_flight: SingleFlight = None):
+        if repository is None:
+            repository = UserRepositoryDB()
+            if Config.USER_SNAPSHOT_ENABLED:
+                repository = SnapshotUserRepository(
+                    repository, max_staleness=Config.USER_SNAPSHOT_MAX_STALENESS
+                )
+            elif Config.USER_CACHE_ENABLED:
+                repository = CachedUserRepository(
+                    repository,
+                    max_size=Config.USER_CACHE_SIZE,
+                    ttl=Config.USER_CACHE_TTL,
+                    negative_ttl=Config.USER_CACHE_NEGATIVE_TTL,
+                    version_check_interval=Config.USER_CACHE_VERSION_CHECK_INTERVAL
+                )
+        self.repository = repository
+        if single_flight is None and Config.COALESCE_ENABLED:
+            single_flight = SingleFlight('users', timeout=Config.COALESCE_TIMEOUT)
+        self.single_flight = single_flight
     
     def get_all_users(self) -> List[Dict]:
         """Get all users"""
         users = self.repository.get_all()
         return [user.to_dict() for user in users]
     
+    def get_all_users_encoded(self, encode: Callable[[List[Dict]], bytes], version: int = None) -> bytes:
+        """Get all users encoded as encode(list of user dicts)
+        
+        Concurrent calls with the same encoder share a single query and
+        encoding (see _coalesce).
+        """
+        return self._coalesce(('all', encode), version, lambda: encode(self.get_all_users()))
+    
+    def iter_users(self, batch_size: int = 1000) -> Iterator[Dict]:
+        """Stream all users without materializing the full list"""
+        for user in self.repository.iter_all(batch_size):
+            yield user.to_dict()
+    
+    def iter_users_json(self, batch_size: int = 1000) -> Iterator[str]:
+        """Stream all users as pre-encoded JSON objects, skipping User and dict"""
+        for row in self.repository.iter_rows(batch_size):
+            yield user_row_json(row)
+    
+    def get_users_page(self, limit: int, cursor: str = None,
+                       version: int = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of users and the opaque cursor for the next page"""
+        if limit < 1:
+            raise ValueError("Limit must be a positive integer")
+        
+        after = self._decode_cursor(cursor, str, int) if cursor else None
+        return self._coalesce(('page', limit, after), version, lambda: self._users_page(limit, after))
+    
+    def search_users(self, query: str, limit: int, cursor: str = None,
+                     version: int = None) -> Tuple[List[Dict], Optional[str]]:
+        """Search users by name or email prefix, best matches first"""
+        if not query or not query.strip():
+            raise ValueError("Search query is required")
+        if limit < 1:
+            raise ValueError("Limit must be a positive integer")
+        
+        offset = self._decode_cursor(cursor, int)[0] if cursor else 0
+        if offset < 0:
+            raise ValueError("Invalid cursor")
+        
+        return self._coalesce(('search', query, limit, offset), version,
+                              lambda: self._search(query, limit, offset))
+    
+    def get_changes(self, token: str = None, limit: int = 100) -> Tuple[List[Dict], str, bool]:
+        """Get what changed since a sync token, oldest change first
+        
+        Each user appears once, as an upsert carrying its current data or
+        as a delete. Returns the changes, the token to pass next time and
+        whether more changes are waiting. Without a token every user is
+        returned, as the starting point of a sync.
+        """
+        if limit < 1:
+            raise ValueError("Limit must be a positive integer")
+        
+        # A token holds the position to continue after and the position the
+        # client was last fully caught up at; tombstones it could have missed
+        # all come after the latter
+        since, synced = self._decode_cursor(token, int, int) if token else (0, None)
+        if since < 0 or (synced is not None and synced < 0):
+            raise ValueError("Invalid cursor")
+        
+        pruned_through, head, rows = self.repository.get_changes(since, limit + 1)
+        if synced is None:
+            # A new sync only needs the deletes that happen from now on
+            synced = head
+        elif synced < pruned_through:
+            raise SyncTokenExpiredError("Sync token expired, start a new sync without one")
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        changes = []
+        for seq, user_id, changed_at, name, email, created_at in rows:
+            change = {"op": "delete" if name is None else "upsert", "id": user_id,
+                      "changed_at": iso_timestamp(changed_at)}
+            if name is not None:
+                change["data"] = User(user_id, name, email, created_at).to_dict()
+            changes.append(change)
+        
+        if has_more:
+            next_key = (rows[-1][0], synced)
+        else:
+            # Caught up: move to the head of the log, past anything compacted
+            position = max(since, head)
+            next_key = (position, position)
+        return changes, self._encode_cursor(next_key), has_more
+    
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Get user by ID"""
         user = self.repository.get_by_id(user_id)
@@ -29,34 +141,78 @@ class UserService:
         if validation_error:
             raise ValueError(validation_error)
         
-        # Check if email already exists
-        if self._email_exists(email):
-            raise ValueError("Email already exists")
-        
+        # The unique email constraint rejects duplicates (DuplicateEmailError)
         user = self.repository.create(name.strip(), email.strip().lower())
         return user.to_dict()
     
+    def create_users(self, items: List[Dict]) -> List[Dict]:
+        """Create many users with one statement and per-item results
+        
+        Invalid items and duplicate emails (within the batch or already
+        stored) fail individually; every other item is still created.
+        """
+        results = [None] * len(items)
+        pending = []
+        seen_emails = set()
+        
+        for index, item in enumerate(items):
+            name = item.get('name') if isinstance(item, dict) else None
+            email = item.get('email') if isinstance(item, dict) else None
+            if not isinstance(name, str) or not isinstance(email, str):
+                results[index] = self._item_error(index, "Name and email are required")
+                continue
+            
+            validation_error = self._validate_user_data(name, email)
+            if validation_error:
+                results[index] = self._item_error(index, validation_error)
+                continue
+            
+            email = email.strip().lower()
+            if email in seen_emails:
+                results[index] = self._item_error(index, "Duplicate email in batch")
+                continue
+            
+            seen_emails.add(email)
+            pending.append((index, name.strip(), email))
+        
+        if pending:
+            # Emails already taken are skipped by the insert itself
+            users = self.repository.create_many([(name, email) for _, name, email in pending])
+            created = {user.email: user for user in users}
+            
+            for index, _, email in pending:
+                user = created.get(email)
+                if user is None:
+                    results[index] = self._item_error(index, "Email already exists")
+                else:
+                    results[index] = {"index": index, "success": True, "data": user.to_dict()}
+        
+        return results
+    
     def update_user(self, user_id: int, name: str = None, email: str = None) -> Optional[Dict]:
-        """Update user with validation"""
-        # Check if user exists
-        if not self.repository.get_by_id(user_id):
-            return None
+        """Update user with validation
         
+        Returns None when the user does not exist, even if the input is invalid.
+        """
         # Validate input if provided
+        error = None
         if name is not None:
             name = name.strip()
             if not name:
-                raise ValueError("Name cannot be empty")
+                error = "Name cannot be empty"
         
-        if email is not None:
+        if email is not None and error is None:
             email = email.strip().lower()
             if not self._is_valid_email(email):
-                raise ValueError("Invalid email format")
-            
-            # Check if email already exists for another user
-            if self._email_exists(email, exclude_user_id=user_id):
-                raise ValueError("Email already exists")
+                error = "Invalid email format"
+        
+        if error:
+            # Not found takes precedence; only invalid input pays for the lookup
+            if not self.repository.get_by_id(user_id):
+                return None
+            raise ValueError(error)
         
+        # A missing user comes back as None; a taken email as DuplicateEmailError
         user = self.repository.update(user_id, name, email)
         return user.to_dict() if user else None
     
@@ -64,10 +220,130 @@ class UserService:
         """Delete user"""
         return self.repository.delete(user_id)
     
+    def update_users(self, items: List[Dict]) -> List[Dict]:
+        """Update many users with one statement and per-item results"""
+        results = [None] * len(items)
+        pending = []
+        seen_ids = set()
+        seen_emails = set()
+        
+        for index, item in enumerate(items):
+            user_id = item.get('id') if isinstance(item, dict) else None
+            if not isinstance(user_id, int) or isinstance(user_id, bool):
+                results[index] = self._item_error(index, "User id is required")
+                continue
+            if user_id in seen_ids:
+                results[index] = self._item_error(index, "Duplicate id in batch", user_id)
+                continue
+            
+            name = item.get('name')
+            email = item.get('email')
+            if name is not None:
+                name = name.strip() if isinstance(name, str) else ''
+                if not name:
+                    results[index] = self._item_error(index, "Name cannot be empty", user_id)
+                    continue
+            if email is not None:
+                email = email.strip().lower() if isinstance(email, str) else ''
+                if not self._is_valid_email(email):
+                    results[index] = self._item_error(index, "Invalid email format", user_id)
+                    continue
+                if email in seen_emails:
+                    results[index] = self._item_error(index, "Duplicate email in batch", user_id)
+                    continue
+                seen_emails.add(email)
+            
+            seen_ids.add(user_id)
+            pending.append((index, user_id, name, email))
+        
+        if pending:
+            users = self.repository.update_many(
+                [(user_id, name, email) for _, user_id, name, email in pending
+                 if name is not None or email is not None]
+            )
+            # Items that changed nothing, or were skipped by the update, still need a lookup
+            missing = [user_id for _, user_id, _, _ in pending if user_id not in users]
+            users.update(self.repository.get_by_ids(missing))
+            
+            for index, user_id, _, email in pending:
+                if user_id in users and (email is None or users[user_id].email == email):
+                    results[index] = {"index": index, "id": user_id, "success": True,
+                                      "data": users[user_id].to_dict()}
+                elif user_id in users:
+                    results[index] = self._item_error(index, "Email already exists", user_id)
+                else:
+                    results[index] = self._item_error(index, "User not found", user_id)
+        
+        return results
+    
+    def delete_users(self, user_ids: List[int]) -> List[Dict]:
+        """Delete many users with one statement and report per-id outcomes"""
+        # Checked per element: membership tests compare with ==, so 2.0 or
+        # True would otherwise pass for an ID
+        valid = [isinstance(user_id, int) and not isinstance(user_id, bool) for user_id in user_ids]
+        valid_ids = [user_id for user_id, ok in zip(user_ids, valid) if ok]
+        deleted = self.repository.delete_many(list(dict.fromkeys(valid_ids)))
+        
+        results = []
+        for user_id, ok in zip(user_ids, valid):
+            if not ok:
+                results.append({"id": user_id, "success": False, "message": "Invalid user id"})
+            elif user_id in deleted:
+                results.append({"id": user_id, "success": True})
+            else:
+                results.append({"id": user_id, "success": False, "message": "User not found"})
+        return results
+    
     def get_user_count(self) -> int:
         """Get total user count"""
         return self.repository.count()
     
+    def get_users_version(self) -> int:
+        """Get the users change counter used to build ETags"""
+        return self.repository.get_table_version()
+    
+    def get_cache_stats(self) -> Optional[Dict]:
+        """Get user cache counters, or None when caching is disabled"""
+        if isinstance(self.repository, CachedUserRepository):
+            return self.repository.stats()
+        return None
+    
+    def get_snapshot_stats(self) -> Optional[Dict]:
+        """Get users snapshot counters, or None when the snapshot is disabled"""
+        if isinstance(self.repository, SnapshotUserRepository):
+            return self.repository.stats()
+        return None
+    
+    def get_coalescing_stats(self) -> Optional[Dict]:
+        """Get read coalescing counters, or None when coalescing is disabled"""
+        return self.single_flight.stats() if self.single_flight else None
+    
+    def _coalesce(self, key: Tuple, version: Optional[int], fn: Callable):
+        """Run a read, sharing it with identical concurrent reads
+        
+        The key includes the users table version (looked up unless the
+        caller already has it), so a read that starts after a write never
+        joins one that started before it. Reads inside a transaction may
+        see its uncommitted writes and are never shared.
+        """
+        if self.single_flight is None or self.repository.in_transaction():
+            return fn()
+        if version is None:
+            version = self.get_users_version()
+        return self.single_flight.do(key + (version,), fn)
+    
+    def _users_page(self, limit: int, after: Optional[Tuple]) -> Tuple[List[Dict], Optional[str]]:
+        """Read one page after a decoded cursor"""
+        users, next_key = self.repository.get_page(limit, after)
+        next_cursor = self._encode_cursor(next_key) if next_key else None
+        return [user.to_dict() for user in users], next_cursor
+    
+    def _search(self, query: str, limit: int, offset: int) -> Tuple[List[Dict], Optional[str]]:
+        """Run one search page"""
+        users, has_more = self.repository.search(query, limit, offset)
+        next_cursor = self._encode_cursor((offset + limit,)) if has_more else None
+        return [user.to_dict() for user in users], next_cursor
+    
     def _validate_user_data(self, name: str, email: str) -> Optional[str]:
         """Validate user data"""
         if not name or not name.strip():
@@ -86,6 +362,27 @@ class UserService:
         pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
         return re.match(pattern, email) is not None
     
-    def _email_exists(self, email: str, exclude_user_id: int = None) -> bool:
-        """Check if email already exists"""
-        return self.repository.email_exists(email.lower(), exclude_user_id)
+    def _item_error(self, index: int, message: str, user_id: int = None) -> Dict:
+        """Build a failed per-item result for bulk operations"""
+        result = {"index": index, "success": False, "message": message}
+        if user_id is not None:
+            result["id"] = user_id
+        return result
+    
+    def _encode_cursor(self, key: Tuple) -> str:
+        """Encode a pagination key as an opaque cursor"""
+        raw = json.dumps(list(key), separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    
+    def _decode_cursor(self, cursor: str, *types) -> Tuple:
+        """Decode an opaque cursor back into a key whose parts match types"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            key = json.loads(base64.urlsafe_b64decode(padded))
+            if not isinstance(key, list) or len(key) != len(types):
+                raise ValueError
+            if not all(isinstance(part, kind) for part, kind in zip(key, types)):
+                raise ValueError
+            return tuple(key)
+        except (ValueError, TypeError, binascii.Error):
+            raise ValueError("Invalid cursor")
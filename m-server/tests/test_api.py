@@ -3,6 +3,7 @@ Integration tests for API endpoints
 """
 import unittest
 import json
+import uuid
 from app import create_app
 
 class TestAPI(unittest.TestCase):
@@ -104,6 +105,305 @@ class TestAPI(unittest.TestCase):
         data = json.loads(response.data)
         self.assertTrue(data['success'])
         self.assertEqual(data['data']['name'], "Updated Name")
+    
+    def test_update_user_duplicate_email(self):
+        """Test that the unique email constraint surfaces as a 400"""
+        response = self.client.put(
+            '/api/users/1',
+            data=json.dumps({"email": "JANE@example.com"}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['message'], "Email already exists")
+    
+    def test_update_user_not_found(self):
+        """Test updating a user that does not exist"""
+        response = self.client.put(
+            '/api/users/999999',
+            data=json.dumps({"name": "Ghost"}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+    
+    def test_update_user_not_found_with_invalid_data(self):
+        """Test that a missing user is reported before invalid input"""
+        response = self.client.put(
+            '/api/users/999999',
+            data=json.dumps({"email": "not-an-email"}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.client.put(
+            '/api/users/1',
+            data=json.dumps({"email": "not-an-email"}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.data)['message'], "Invalid email format")
+    
+    def test_get_users_paginated(self):
+        """Test keyset pagination of users"""
+        response = self.client.get('/api/users?limit=1')
+        self.assertEqual(response.status_code, 200)
+        
+        data = json.loads(response.data)
+        self.assertEqual(len(data['data']), 1)
+        self.assertTrue(data['pagination']['has_more'])
+        
+        cursor = data['pagination']['next_cursor']
+        response = self.client.get(f'/api/users?limit=1&cursor={cursor}')
+        self.assertEqual(response.status_code, 200)
+        
+        next_page = json.loads(response.data)
+        self.assertNotEqual(next_page['data'][0]['id'], data['data'][0]['id'])
+    
+    def test_get_users_invalid_cursor(self):
+        """Test pagination with a malformed cursor"""
+        response = self.client.get('/api/users?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.client.get('/api/users?limit=0')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_export_users_ndjson(self):
+        """Test streaming users as NDJSON"""
+        response = self.client.get('/api/users/export?format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        
+        lines = response.get_data(as_text=True).splitlines()
+        users = [json.loads(line) for line in lines]
+        self.assertGreater(len(users), 0)
+        self.assertIn('email', users[0])
+    
+    def test_export_users_json(self):
+        """Test streaming users as a JSON array"""
+        response = self.client.get('/api/users/export?format=json')
+        self.assertEqual(response.status_code, 200)
+        
+        users = json.loads(response.data)
+        self.assertIsInstance(users, list)
+        self.assertEqual(len(users), len(set(user['id'] for user in users)))
+        
+        response = self.client.get('/api/users/export?format=xml')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_create_users_bulk(self):
+        """Test bulk creation with partial failures"""
+        tag = uuid.uuid4().hex[:8]
+        payload = {"users": [
+            {"name": "Bulk One", "email": f"bulk1-{tag}@example.com"},
+            {"name": "Bulk Two", "email": f"BULK1-{tag}@example.com"},
+            {"name": "", "email": f"bulk3-{tag}@example.com"},
+            {"name": "Existing", "email": "jane@example.com"},
+            {"name": "Bulk Five", "email": f"bulk5-{tag}@example.com"}
+        ]}
+        response = self.client.post(
+            '/api/users/bulk',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 207)
+        
+        results = json.loads(response.data)['data']
+        self.assertEqual([r['success'] for r in results], [True, False, False, False, True])
+        self.assertEqual(results[1]['message'], "Duplicate email in batch")
+        self.assertEqual(results[3]['message'], "Email already exists")
+        self.assertEqual(results[4]['data']['email'], f"bulk5-{tag}@example.com")
+    
+    def test_create_users_bulk_limits(self):
+        """Test bulk creation request validation"""
+        response = self.client.post(
+            '/api/users/bulk',
+            data=json.dumps({"users": []}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        
+        self.app.config['BULK_MAX_ITEMS'] = 1
+        payload = {"users": [{"name": "A", "email": "a@example.com"}] * 2}
+        response = self.client.post(
+            '/api/users/bulk',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+    
+    def test_update_and_delete_users_bulk(self):
+        """Test bulk update and bulk delete with per-id outcomes"""
+        tag = uuid.uuid4().hex[:8]
+        payload = {"users": [
+            {"name": "Patch A", "email": f"patch-a-{tag}@example.com"},
+            {"name": "Patch B", "email": f"patch-b-{tag}@example.com"}
+        ]}
+        response = self.client.post(
+            '/api/users/bulk',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        ids = [r['data']['id'] for r in json.loads(response.data)['data']]
+        
+        payload = {"users": [
+            {"id": ids[0], "name": "Patched A"},
+            {"id": ids[1], "email": "jane@example.com"},
+            {"id": 999999, "name": "Ghost"}
+        ]}
+        response = self.client.patch(
+            '/api/users/bulk',
+            data=json.dumps(payload),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 207)
+        
+        results = json.loads(response.data)['data']
+        self.assertEqual(results[0]['data']['name'], "Patched A")
+        self.assertEqual(results[0]['data']['email'], f"patch-a-{tag}@example.com")
+        self.assertEqual(results[1]['message'], "Email already exists")
+        self.assertEqual(results[2]['message'], "User not found")
+        
+        # Numbers equal to an ID are not IDs
+        response = self.client.delete(
+            '/api/users/bulk',
+            data=json.dumps({"ids": [float(ids[0]), True]}),
+            content_type='application/json'
+        )
+        results = json.loads(response.data)['data']
+        self.assertEqual([r['message'] for r in results], ["Invalid user id"] * 2)
+        self.assertEqual(self.client.get(f'/api/users/{ids[0]}').status_code, 200)
+        
+        response = self.client.delete(
+            '/api/users/bulk',
+            data=json.dumps({"ids": ids + [999999]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 207)
+        
+        results = json.loads(response.data)['data']
+        self.assertEqual([r['success'] for r in results], [True, True, False])
+        self.assertEqual(self.client.get(f'/api/users/{ids[0]}').status_code, 404)
+    
+    def test_get_users_conditional(self):
+        """Test ETag revalidation of the user list"""
+        response = self.client.get('/api/users')
+        etag = response.headers['ETag']
+        self.assertTrue(etag)
+        
+        response = self.client.get('/api/users', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        
+        response = self.client.get('/api/users?limit=1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+    
+    def test_get_user_conditional_after_update(self):
+        """Test that a write invalidates a single-user ETag"""
+        response = self.client.get('/api/users/2')
+        etag = response.headers['ETag']
+        
+        response = self.client.get('/api/users/2', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        
+        self.client.put(
+            '/api/users/2',
+            data=json.dumps({"name": "Jane Smith"}),
+            content_type='application/json'
+        )
+        response = self.client.get('/api/users/2', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+    
+    def test_search_users(self):
+        """Test prefix search and pagination of search results"""
+        tag = uuid.uuid4().hex[:8]
+        payload = {"users": [
+            {"name": f"Zed {tag} Alpha", "email": f"zed-a-{tag}@example.com"},
+            {"name": f"Zed {tag} Beta", "email": f"zed-b-{tag}@example.com"}
+        ]}
+        self.client.post('/api/users/bulk', data=json.dumps(payload), content_type='application/json')
+        
+        response = self.client.get(f'/api/users/search?q={tag[:6]}&limit=1')
+        self.assertEqual(response.status_code, 200)
+        
+        data = json.loads(response.data)
+        self.assertEqual(len(data['data']), 1)
+        cursor = data['pagination']['next_cursor']
+        
+        response = self.client.get(f'/api/users/search?q={tag[:6]}&limit=1&cursor={cursor}')
+        next_page = json.loads(response.data)
+        self.assertEqual(len(next_page['data']), 1)
+        self.assertFalse(next_page['pagination']['has_more'])
+        self.assertNotEqual(next_page['data'][0]['id'], data['data'][0]['id'])
+        
+        response = self.client.get(f'/api/users/search?q=beta%20{tag}')
+        data = json.loads(response.data)
+        self.assertEqual([user['email'] for user in data['data']], [f"zed-b-{tag}@example.com"])
+        
+        response = self.client.get('/api/users/search?q=')
+        self.assertEqual(response.status_code, 400)
+    
+    def _sync_token(self):
+        """Page through a full sync and return the token it ends with"""
+        token = ''
+        while True:
+            data = json.loads(self.client.get(f'/api/users/changes?limit=500&since={token}').data)
+            token = data['pagination']['sync_token']
+            if not data['pagination']['has_more']:
+                return token
+    
+    def test_user_changes_feed(self):
+        """Test that the change feed returns upserts and tombstones after a token"""
+        token = self._sync_token()
+        tag = uuid.uuid4().hex[:8]
+        created = [
+            json.loads(self.client.post('/api/users', data=json.dumps(
+                {"name": f"Sync {n}", "email": f"sync{n}-{tag}@example.com"}
+            ), content_type='application/json').data)['data']
+            for n in range(2)
+        ]
+        self.client.put(f"/api/users/{created[0]['id']}", data=json.dumps({"name": "Synced"}),
+                        content_type='application/json')
+        self.client.delete(f"/api/users/{created[1]['id']}")
+        
+        response = self.client.get(f'/api/users/changes?since={token}&limit=1')
+        self.assertEqual(response.status_code, 200)
+        first = json.loads(response.data)
+        self.assertTrue(first['pagination']['has_more'])
+        token = first['pagination']['sync_token']
+        
+        second = json.loads(self.client.get(f'/api/users/changes?since={token}&limit=1').data)
+        self.assertFalse(second['pagination']['has_more'])
+        changes = {change['id']: change for change in first['data'] + second['data']}
+        self.assertEqual(changes[created[0]['id']]['op'], 'upsert')
+        self.assertEqual(changes[created[0]['id']]['data']['name'], 'Synced')
+        self.assertEqual(changes[created[1]['id']]['op'], 'delete')
+        self.assertNotIn('data', changes[created[1]['id']])
+        
+        token = second['pagination']['sync_token']
+        data = json.loads(self.client.get(f'/api/users/changes?since={token}').data)
+        self.assertEqual(data['data'], [])
+        self.assertEqual(data['pagination']['sync_token'], token)
+    
+    def test_user_changes_expired_token(self):
+        """Test that tokens older than compacted tombstones must start over"""
+        from database import db
+        from models.user_repository_db import UserRepositoryDB
+        
+        token = self._sync_token()
+        tag = uuid.uuid4().hex[:8]
+        user = json.loads(self.client.post('/api/users', data=json.dumps(
+            {"name": "Gone", "email": f"gone-{tag}@example.com"}
+        ), content_type='application/json').data)['data']
+        self.client.delete(f"/api/users/{user['id']}")
+        db.execute_update(
+            "UPDATE user_changes SET changed_at = '2000-01-01 00:00:00' WHERE user_id = ?", (user['id'],)
+        )
+        result = UserRepositoryDB().compact_changes(30)
+        self.assertGreaterEqual(result['tombstones'], 1)
+        
+        response = self.client.get(f'/api/users/changes?since={token}')
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(self.client.get('/api/users/changes').status_code, 200)
+        self.assertEqual(self.client.get('/api/users/changes?since=bogus').status_code, 400)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
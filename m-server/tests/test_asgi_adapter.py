@@ -0,0 +1,117 @@
+"""
+Tests for the ASGI adapter
+"""
+import asyncio
+import json
+import threading
+import unittest
+import uuid
+from app import create_app
+from utils.asgi_adapter import AsgiAdapter
+
+def call(adapter, method, path, body=b'', query=b''):
+    """Run one request through the adapter and collect the response messages"""
+    async def run():
+        incoming = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            if incoming:
+                return incoming.pop(0)
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http', 'method': method, 'path': path, 'query_string': query,
+            'headers': [(b'content-type', b'application/json'), (b'host', b'testserver')],
+        }
+        await adapter(scope, receive, send)
+        return sent
+
+    sent = asyncio.run(run())
+    status = sent[0]['status']
+    headers = dict(sent[0]['headers'])
+    data = b''.join(message.get('body', b'') for message in sent[1:])
+    return status, headers, data, sent
+
+class TestAsgiAdapter(unittest.TestCase):
+    """Test cases for serving the Flask app over ASGI"""
+
+    def setUp(self):
+        """Set up the app behind the adapter"""
+        self.adapter = AsgiAdapter(create_app('testing'), max_workers=2, max_queue=2)
+
+    def tearDown(self):
+        """Stop the executor"""
+        self.adapter.executor.shutdown()
+
+    def test_crud_round_trip(self):
+        """Test that requests and bodies reach the app unchanged"""
+        email = f"asgi-{uuid.uuid4().hex[:8]}@example.com"
+        status, _, data, _ = call(self.adapter, 'POST', '/api/users',
+                                  json.dumps({"name": "Asgi User", "email": email}).encode())
+        self.assertEqual(status, 201)
+        user_id = json.loads(data)['data']['id']
+
+        status, headers, data, _ = call(self.adapter, 'GET', f"/api/users/{user_id}")
+        self.assertEqual(status, 200)
+        self.assertIn(b'etag', headers)
+        self.assertEqual(json.loads(data)['data']['email'], email)
+
+        status, _, _, _ = call(self.adapter, 'DELETE', f"/api/users/{user_id}")
+        self.assertEqual(status, 200)
+        self.adapter.executor.shutdown()
+        self.assertEqual(self.adapter.stats()['pending'], 0)
+
+    def test_streamed_response(self):
+        """Test that streamed bodies are relayed chunk by chunk"""
+        status, headers, data, sent = call(self.adapter, 'GET', '/api/users/export')
+        self.assertEqual(status, 200)
+        self.assertNotIn(b'content-length', headers)
+        self.assertTrue(sent[1]['more_body'])
+        self.assertFalse(sent[-1].get('more_body', False))
+        lines = data.decode().splitlines()
+        self.assertEqual(len(lines), len(json.loads(call(self.adapter, 'GET', '/api/users')[2])['data']))
+
+    def test_rejects_when_queue_full(self):
+        """Test 503 with Retry-After once every thread and queue slot is taken"""
+        release = threading.Event()
+
+        def slow_app(environ, start_response):
+            release.wait(5)
+            start_response('200 OK', [('Content-Length', '2')])
+            return [b'ok']
+
+        adapter = AsgiAdapter(slow_app, max_workers=1, max_queue=1, retry_after=3)
+
+        async def run():
+            async def request():
+                sent = []
+                messages = [{'type': 'http.request', 'body': b''}]
+
+                async def receive():
+                    return messages.pop() if messages else await asyncio.Event().wait()
+
+                async def send(message):
+                    sent.append(message)
+
+                await adapter({'type': 'http', 'method': 'GET', 'path': '/', 'headers': []}, receive, send)
+                return sent
+
+            held = [asyncio.ensure_future(request()) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            rejected = await request()
+            release.set()
+            return rejected, await asyncio.gather(*held)
+
+        rejected, held = asyncio.run(run())
+        adapter.executor.shutdown()
+        self.assertEqual(rejected[0]['status'], 503)
+        self.assertEqual(dict(rejected[0]['headers'])[b'retry-after'], b'3')
+        self.assertEqual([sent[0]['status'] for sent in held], [200, 200])
+        self.assertEqual(adapter.stats()['rejected'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""
+Integration tests for the batch endpoint
+"""
+import threading
+import unittest
+import uuid
+from app import create_app
+from utils.metrics import metrics
+from utils.rate_limit import init_admission_control
+from utils.response_utils import format_response
+
+class TestBatch(unittest.TestCase):
+    """Test cases for POST /api/batch"""
+
+    def setUp(self):
+        """Set up test fixtures"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.tag = uuid.uuid4().hex[:8]
+
+    def batch(self, requests, **options):
+        """Post a batch and return the response and its JSON"""
+        response = self.client.post('/api/batch', json={'requests': requests, **options})
+        return response, response.get_json()
+
+    def test_mixed_batch(self):
+        """Test that results come back in order with their own statuses"""
+        response, data = self.batch([
+            {'path': '/health', 'id': 'health'},
+            {'path': '/api/users?limit=1'},
+            {'path': '/api/users/999999999'},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in data['data']], [200, 200, 404])
+        self.assertEqual(data['data'][0]['id'], 'health')
+        self.assertEqual(data['data'][0]['body']['data']['status'], 'healthy')
+        self.assertIn('ETag', data['data'][1]['headers'])
+        self.assertEqual(data['message'], "2 of 3 requests succeeded")
+
+    def test_consecutive_reads_run_concurrently(self):
+        """Test that reads run side by side on the batch pool"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def meet():
+            barrier.wait()
+            return format_response(success=True, data=threading.current_thread().name)
+
+        self.app.add_url_rule('/meet', 'meet', meet)
+        response, data = self.batch([{'path': '/meet'}] * 3)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(result['body']['data'].startswith('batch') for result in data['data']))
+
+    def test_reads_after_a_write_see_it(self):
+        """Test that a write completes before the reads that follow it"""
+        email = f"batch-{self.tag}@example.com"
+        response, data = self.batch([
+            {'method': 'POST', 'path': '/api/users', 'body': {'name': 'Batch User', 'email': email}},
+            {'path': f'/api/users/search?q=batch-{self.tag}'},
+            {'path': f'/api/users/search?q=batch-{self.tag}'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        user_id = data['data'][0]['body']['data']['id']
+        self.assertEqual([result['body']['count'] for result in data['data'][1:]], [1, 1])
+        self.client.delete(f'/api/users/{user_id}')
+
+    def test_transaction_rolls_back_on_failure(self):
+        """Test that a failed sub-request undoes the writes before it"""
+        email = f"batch-tx-{self.tag}@example.com"
+        response, data = self.batch([
+            {'method': 'POST', 'path': '/api/users', 'body': {'name': 'First', 'email': email}},
+            {'method': 'POST', 'path': '/api/users', 'body': {'name': 'Duplicate', 'email': email}},
+            {'method': 'DELETE', 'path': '/api/users/999999999'},
+        ], transaction=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(data['success'])
+        self.assertEqual([result['status'] for result in data['data']], [201, 400])
+
+        user_id = data['data'][0]['body']['data']['id']
+        self.assertEqual(self.client.get(f'/api/users/{user_id}').status_code, 404)
+
+    def test_batch_request_recorded_in_metrics(self):
+        """Test that sub-requests do not clobber the batch request's own metrics"""
+        total = ('http_requests_total', (('method', 'POST'), ('route', '/api/batch'), ('status', '200')))
+        in_flight = ('http_requests_in_flight', (('method', 'POST'), ('route', '/api/batch')))
+        before = metrics.snapshot()
+        # Sub-requests of a transaction run on the batch request's own thread
+        response, _ = self.batch([{'path': '/health'}, {'path': '/api/users?limit=1'}], transaction=True)
+        self.assertEqual(response.status_code, 200)
+
+        after = metrics.snapshot()
+        self.assertEqual(after.get(total, 0) - before.get(total, 0), 1)
+        self.assertEqual(after.get(in_flight, 0), before.get(in_flight, 0))
+
+    def test_sub_requests_charged_to_client_buckets(self):
+        """Test that sub-requests over the client's rate get their own 429"""
+        self.app.config.update(
+            RATE_LIMIT_ENABLED=True,
+            RATE_LIMIT_READ_RATE=0.01, RATE_LIMIT_READ_BURST=2,
+            RATE_LIMIT_WRITE_RATE=0.01, RATE_LIMIT_WRITE_BURST=2,
+            RATE_LIMIT_CLIENT_HEADER='X-API-Key',
+        )
+        init_admission_control(self.app)
+        # The batch itself takes one write, leaving one for its sub-requests
+        response = self.client.post('/api/batch', headers={'X-API-Key': 'batch'}, json={'requests': [
+            {'path': '/api/users?limit=1'},
+            {'path': '/api/users?limit=1'},
+            {'path': '/api/users?limit=1'},
+            {'path': '/health'},
+            {'method': 'DELETE', 'path': '/api/users/999999999'},
+            {'method': 'DELETE', 'path': '/api/users/999999999'},
+        ]})
+        self.assertEqual(response.status_code, 207)
+        results = response.get_json()['data']
+        self.assertEqual(sorted(result['status'] for result in results[:3]), [200, 200, 429])
+        self.assertEqual([result['status'] for result in results[3:]], [200, 404, 429])
+        self.assertGreaterEqual(int(results[5]['headers']['Retry-After']), 1)
+        self.assertEqual(results[5]['body'], {'success': False, 'message': "Rate limit exceeded"})
+        self.assertEqual(self.app.extensions['admission_control'].stats()['rate_limited'], 2)
+
+        # Other clients have their own buckets
+        response = self.client.post('/api/batch', headers={'X-API-Key': 'other'},
+                                    json={'requests': [{'method': 'DELETE', 'path': '/api/users/999999999'}]})
+        self.assertEqual(response.get_json()['data'][0]['status'], 404)
+
+    def test_sub_request_accept_encoding_ignored(self):
+        """Test that sub-responses are embedded uncompressed"""
+        self.app.add_url_rule('/large', 'large', lambda: format_response(success=True, data='x' * 4096))
+        response, data = self.batch([{'path': '/large', 'headers': {'accept-encoding': 'gzip'}}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['data'][0]['body']['data'], 'x' * 4096)
+
+    def test_invalid_batches_rejected(self):
+        """Test the request cap and sub-request validation"""
+        self.app.config['BATCH_MAX_REQUESTS'] = 2
+        self.assertEqual(self.batch([{'path': '/health'}] * 3)[0].status_code, 400)
+        self.assertEqual(self.batch([])[0].status_code, 400)
+        self.assertEqual(self.batch([{'path': 'health'}])[0].status_code, 400)
+        self.assertEqual(self.batch([{'method': 'TRACE', 'path': '/health'}])[0].status_code, 400)
+        self.assertEqual(self.batch([{'path': '/api/batch'}])[0].status_code, 400)
+        # Any spelling that routes back to the batch endpoint is refused up front
+        for path in ('/api/batch', '/api/%62atch?x=1'):
+            response, data = self.batch([{'method': 'POST', 'path': path}])
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(data['message'], "Request 0: batches cannot be nested")
+
+if __name__ == '__main__':
+    unittest.main()
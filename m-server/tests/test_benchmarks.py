@@ -0,0 +1,74 @@
+"""
+Unit tests for the benchmark helpers
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from benchmarks.compare import compare_results
+from benchmarks.dataset import generate, parse_size
+from benchmarks.results import metric_direction, percentile, summarize
+
+class TestBenchmarkResults(unittest.TestCase):
+    """Test cases for result summaries and comparisons"""
+
+    def test_summarize(self):
+        """Test throughput and percentiles of per-call durations"""
+        summary = summarize([i / 1000 for i in range(1, 101)], 2.0)
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['ops_per_sec'], 50.0)
+        self.assertEqual(summary['p50_ms'], 51.0)
+        self.assertEqual(summary['p99_ms'], 100.0)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_metric_direction(self):
+        """Test that rates are better higher and times better lower"""
+        self.assertEqual(metric_direction('rps'), 1)
+        self.assertEqual(metric_direction('p99_us'), -1)
+        self.assertIsNone(metric_direction('count'))
+
+    def test_compare_flags_regressions(self):
+        """Test that only changes for the worse beyond the threshold are flagged"""
+        baseline = {'results': {'get': {'rps': 100.0, 'p99_ms': 10.0, 'count': 5}}}
+        current = {'results': {'get': {'rps': 95.0, 'p99_ms': 12.0, 'count': 9}, 'new': {'rps': 1.0}}}
+        rows = {row['metric']: row for row in compare_results(baseline, current, threshold=10)}
+
+        self.assertEqual(set(rows), {'rps', 'p99_ms'})
+        self.assertEqual(rows['rps']['change_pct'], -5.0)
+        self.assertFalse(rows['rps']['regression'])
+        self.assertEqual(rows['p99_ms']['change_pct'], -20.0)
+        self.assertTrue(rows['p99_ms']['regression'])
+
+class TestDataset(unittest.TestCase):
+    """Test cases for the synthetic dataset generator"""
+
+    def test_parse_size(self):
+        """Test size labels and plain counts"""
+        self.assertEqual(parse_size('1m'), 1_000_000)
+        self.assertEqual(parse_size('2_500'), 2500)
+
+    def test_generate_tops_up(self):
+        """Test that generated users are logged and searchable like API-created ones"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'users.db')
+            self.assertEqual(generate(path, 50, batch_size=20), 50)
+            self.assertEqual(generate(path, 80, batch_size=20), 80)
+
+            conn = sqlite3.connect(path)
+            try:
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM users").fetchone()[0], 80)
+                self.assertEqual(conn.execute("SELECT COUNT(DISTINCT user_id) FROM user_changes").fetchone()[0], 80)
+                name = conn.execute("SELECT name FROM users WHERE id = 1").fetchone()[0]
+                matches = conn.execute(
+                    "SELECT COUNT(*) FROM users_fts WHERE users_fts MATCH ?", (f'"{name}"',)
+                ).fetchone()[0]
+                self.assertGreaterEqual(matches, 1)
+                triggers = conn.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'users'"
+                ).fetchone()[0]
+                self.assertGreater(triggers, 0)
+            finally:
+                conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Unit tests for CachedUserRepository
+"""
+import unittest
+import uuid
+from database import db
+from models.user_repository_db import UserRepositoryDB, DuplicateEmailError
+from models.cached_user_repository import CachedUserRepository
+
+class RacingRepository(UserRepositoryDB):
+    """Repository that runs a hook between reading a user and returning it"""
+
+    after_read = None
+
+    def get_by_id(self, user_id):
+        user = super().get_by_id(user_id)
+        if self.after_read:
+            self.after_read()
+        return user
+
+class TestCachedUserRepository(unittest.TestCase):
+    """Test cases for the read-through user cache"""
+
+    def setUp(self):
+        """Set up a cache that checks the table version on every lookup"""
+        self.repository = CachedUserRepository(
+            UserRepositoryDB(), max_size=2, ttl=60, negative_ttl=60, version_check_interval=0
+        )
+        tag = uuid.uuid4().hex[:8]
+        self.user = self.repository.create("Cached User", f"cached-{tag}@example.com")
+
+    def tearDown(self):
+        """Remove the test user"""
+        self.repository.delete(self.user.id)
+
+    def test_repeated_lookup_hits_cache(self):
+        """Test that the second lookup is served from cache"""
+        first = self.repository.get_by_id(self.user.id)
+        second = self.repository.get_by_id(self.user.id)
+        self.assertIs(first, second)
+        self.assertEqual(self.repository.stats()['hits'], 1)
+
+    def test_missing_user_cached_negatively(self):
+        """Test that lookups of missing IDs are cached"""
+        self.assertIsNone(self.repository.get_by_id(999999))
+        self.assertIsNone(self.repository.get_by_id(999999))
+        self.assertEqual(self.repository.stats()['negative_hits'], 1)
+
+    def test_update_invalidates_entry(self):
+        """Test that local writes invalidate exactly the changed user"""
+        self.repository.get_by_id(self.user.id)
+        self.repository.update(self.user.id, name="Renamed")
+        self.assertEqual(self.repository.get_by_id(self.user.id).name, "Renamed")
+        stats = self.repository.stats()
+        self.assertEqual(stats['invalidations'], 1)
+        self.assertEqual(stats['flushes'], 0)
+
+    def test_write_is_single_statement(self):
+        """Test that a write and its cache bookkeeping cost one statement"""
+        self.repository.get_by_id(self.user.id)
+        db.reset_query_count()
+        self.repository.update(self.user.id, email=f"renamed-{self.user.id}@example.com")
+        self.assertEqual(db.get_query_count(), 1)
+        self.assertEqual(self.repository.stats()['invalidations'], 1)
+
+    def test_duplicate_email_rejected_by_constraint(self):
+        """Test that emails differing only in case violate the unique index"""
+        with self.assertRaises(DuplicateEmailError):
+            self.repository.create("Other User", self.user.email.upper())
+
+    def test_external_write_flushes_cache(self):
+        """Test that writes bypassing the cache are detected by the table version"""
+        self.repository.get_by_id(self.user.id)
+        db.execute_update("UPDATE users SET name = ? WHERE id = ?", ("Elsewhere", self.user.id))
+        self.assertEqual(self.repository.get_by_id(self.user.id).name, "Elsewhere")
+        self.assertEqual(self.repository.stats()['flushes'], 1)
+
+    def test_transaction_reads_bypass_cache(self):
+        """Test that uncommitted writes are read back but never cached"""
+        # Without version polling only local commits invalidate entries
+        repository = CachedUserRepository(UserRepositoryDB(), version_check_interval=3600)
+        repository.get_by_id(self.user.id)
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                repository.update(self.user.id, name="Uncommitted")
+                self.assertEqual(repository.get_by_id(self.user.id).name, "Uncommitted")
+                raise RuntimeError("roll back")
+        self.assertEqual(repository.get_by_id(self.user.id).name, "Cached User")
+
+    def test_transaction_version_not_synced(self):
+        """Test that an uncommitted table version is never adopted by the cache"""
+        repository = CachedUserRepository(UserRepositoryDB(), version_check_interval=3600)
+        version = repository.get_table_version()
+        with self.assertRaises(RuntimeError):
+            with db.transaction():
+                repository.update(self.user.id, name="Uncommitted")
+                self.assertGreater(repository.get_table_version(), version)
+                raise RuntimeError("roll back")
+        self.assertEqual(repository.stats()['table_version'], version)
+        self.assertEqual(repository.get_table_version(), version)
+
+    def test_out_of_order_commits_keep_newest_version(self):
+        """Test that a late commit callback does not move the version back"""
+        repository = CachedUserRepository(UserRepositoryDB(), version_check_interval=3600)
+        version = repository.get_table_version()
+        repository._invalidate({self.user.id}, version + 1, version + 2)
+        repository._invalidate({self.user.id}, version, version + 1)
+        self.assertEqual(repository.stats()['table_version'], version + 2)
+
+        # The next local write follows on from the newest version
+        repository._invalidate({self.user.id}, version + 2, version + 3)
+        self.assertEqual(repository.stats()['flushes'], 1)
+        self.assertEqual(repository.stats()['table_version'], version + 3)
+
+    def test_flush_during_lookup_not_refilled(self):
+        """Test that a row read before an external write is not cached after it"""
+        repository = CachedUserRepository(RacingRepository(), version_check_interval=0)
+
+        def external_write():
+            db.execute_update("UPDATE users SET name = ? WHERE id = ?", ("Elsewhere", self.user.id))
+            repository._sync_version()
+
+        repository.repository.after_read = external_write
+        self.assertEqual(repository.get_by_id(self.user.id).name, "Cached User")
+        repository.repository.after_read = None
+        self.assertEqual(repository.get_by_id(self.user.id).name, "Elsewhere")
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted"""
+        self.repository.get_by_id(self.user.id)
+        self.repository.get_by_id(999998)
+        self.repository.get_by_id(999999)
+        self.assertEqual(self.repository.stats()['evictions'], 1)
+        self.assertEqual(self.repository.stats()['size'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Unit tests for response compression
+"""
+import gzip
+import json
+import unittest
+from app import create_app
+from utils.compression import brotli, choose_encoding
+from utils.response_utils import format_response, make_etag
+from werkzeug.http import parse_accept_header
+
+class TestCompression(unittest.TestCase):
+    """Test cases for Accept-Encoding negotiation and compression"""
+
+    def setUp(self):
+        """Set up a client with a large and a small JSON route"""
+        self.app = create_app('testing')
+        self.app.add_url_rule('/test/big', 'big', lambda: format_response(
+            data=[{"id": i, "name": f"User {i}"} for i in range(200)], etag=make_etag('big')
+        ))
+        self.app.add_url_rule('/test/small', 'small', lambda: format_response(data={"ok": True}))
+        self.client = self.app.test_client()
+
+    def test_large_body_gzipped(self):
+        """Test that a large JSON body is gzipped and round-trips"""
+        response = self.client.get('/test/big', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(int(response.headers['Content-Length']), len(response.data))
+        payload = json.loads(gzip.decompress(response.data))
+        self.assertEqual(payload['count'], 200)
+
+    def test_small_body_untouched(self):
+        """Test that bodies under the minimum size are sent as-is"""
+        response = self.client.get('/test/small', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertTrue(json.loads(response.data)['success'])
+
+    def test_health_never_compressed(self):
+        """Test that /health skips compression entirely"""
+        response = self.client.get('/health', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('compression', json.loads(response.data)['data'])
+
+    def test_identity_when_not_accepted(self):
+        """Test that clients without Accept-Encoding get the raw body"""
+        response = self.client.get('/test/big')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(json.loads(response.data)['count'], 200)
+
+    def test_streamed_export_compressed(self):
+        """Test that streamed NDJSON is compressed chunk by chunk"""
+        response = self.client.get('/api/users/export', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        lines = gzip.decompress(response.data).decode('utf-8').splitlines()
+        self.assertTrue(all('email' in json.loads(line) for line in lines))
+
+    def test_etag_weakened_and_revalidates(self):
+        """Test that compressed responses carry a weak ETag that still yields 304"""
+        response = self.client.get('/api/users', headers={'Accept-Encoding': 'gzip'})
+        etag = response.headers['ETag']
+        if response.headers.get('Content-Encoding'):
+            self.assertTrue(etag.startswith('W/'))
+        response = self.client.get(
+            '/api/users', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_choose_encoding(self):
+        """Test q-value negotiation between brotli and gzip"""
+        self.assertEqual(choose_encoding(parse_accept_header('gzip;q=0, deflate')), None)
+        self.assertEqual(choose_encoding(parse_accept_header('gzip, br'), brotli_enabled=False), 'gzip')
+        expected = 'br' if brotli is not None else 'gzip'
+        self.assertEqual(choose_encoding(parse_accept_header('gzip;q=0.5, br')), expected)
+
+if __name__ == '__main__':
+    unittest.main()
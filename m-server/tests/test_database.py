@@ -0,0 +1,237 @@
+"""
+Unit tests for Database and ConnectionPool
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+from database import Database, PoolTimeoutError
+
+class TestConnectionPool(unittest.TestCase):
+    """Test cases for pooled SQLite connections"""
+
+    def setUp(self):
+        """Set up a throwaway database"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp_dir, 'test.db'), pool_size=2)
+
+    def tearDown(self):
+        """Remove the throwaway database"""
+        self.db.pool.close_all()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_connections_are_reused(self):
+        """Test that repeated queries reuse one connection"""
+        for _ in range(10):
+            self.db.execute_query("SELECT * FROM users WHERE id = ?", (1,))
+        stats = self.db.pool_stats()
+        self.assertEqual(stats['created'], 1)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertGreaterEqual(stats['checkouts'], 10)
+
+    def test_pragmas_applied(self):
+        """Test that tuned PRAGMAs are applied to pooled connections"""
+        with self.db.connection() as conn:
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)
+            self.assertGreater(conn.execute('PRAGMA busy_timeout').fetchone()[0], 0)
+
+    def test_nested_use_shares_connection(self):
+        """Test that nested use on one thread does not check out twice"""
+        with self.db.connection() as outer:
+            with self.db.connection() as inner:
+                self.assertIs(outer, inner)
+            self.assertEqual(self.db.pool_stats()['in_use'], 1)
+
+    def test_unhealthy_connection_replaced(self):
+        """Test that a broken idle connection is replaced on checkout"""
+        with self.db.connection() as conn:
+            conn.close()
+        rows = self.db.execute_query("SELECT COUNT(*) AS count FROM users")
+        self.assertEqual(rows[0]['count'], 2)
+        self.assertEqual(self.db.pool_stats()['discarded'], 1)
+
+    def test_checkout_timeout(self):
+        """Test that an exhausted pool times out and records waiting"""
+        self.db.pool.timeout = 0.05
+        held = [self.db.pool.acquire(), self.db.pool.acquire()]
+        with self.assertRaises(PoolTimeoutError):
+            self.db.pool.acquire()
+
+        released = threading.Timer(0.01, self.db.pool.release, args=(held.pop(),))
+        self.db.pool.timeout = 1.0
+        released.start()
+        conn = self.db.pool.acquire()
+        released.join()
+        stats = self.db.pool_stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_time_max_ms'], 0)
+
+        self.db.pool.release(conn)
+        self.db.pool.release(held.pop())
+        self.assertEqual(self.db.pool_stats()['in_use'], 0)
+
+    def test_iter_query_streams_and_releases(self):
+        """Test that iter_query yields every row and returns its connection"""
+        rows = list(self.db.iter_query("SELECT * FROM users ORDER BY id", batch_size=1))
+        self.assertEqual([row['id'] for row in rows], [1, 2])
+        self.assertEqual(self.db.pool_stats()['in_use'], 0)
+
+        stream = self.db.iter_query("SELECT * FROM users ORDER BY id")
+        next(stream)
+        self.assertEqual(self.db.pool_stats()['in_use'], 1)
+        stream.close()
+        self.assertEqual(self.db.pool_stats()['in_use'], 0)
+
+    def test_transaction_commits_once(self):
+        """Test that statements inside a transaction commit together"""
+        with self.db.transaction():
+            self.db.execute_many(
+                "INSERT INTO users (name, email) VALUES (?, ?)",
+                [("A", "a@example.com"), ("B", "b@example.com")]
+            )
+        rows = self.db.execute_query("SELECT COUNT(*) AS count FROM users")
+        self.assertEqual(rows[0]['count'], 4)
+
+    def test_transaction_rolls_back(self):
+        """Test that a failing transaction leaves no partial writes"""
+        with self.assertRaises(Exception):
+            with self.db.transaction():
+                self.db.execute_insert("INSERT INTO users (name, email) VALUES (?, ?)", ("A", "a@example.com"))
+                self.db.execute_insert("INSERT INTO users (name, email) VALUES (?, ?)", ("B", "a@example.com"))
+        rows = self.db.execute_query("SELECT COUNT(*) AS count FROM users")
+        self.assertEqual(rows[0]['count'], 2)
+
+class TestLazyInitialization(unittest.TestCase):
+    """Test cases for lazy, idempotent, fork-safe initialization"""
+
+    def setUp(self):
+        """Set up an unopened throwaway database"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'test.db')
+        self.db = Database(self.path)
+
+    def tearDown(self):
+        """Remove the throwaway database"""
+        self.db.pool.close_all()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_construction_does_not_touch_disk(self):
+        """Test that creating a Database opens no files"""
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(self.db.pool_stats()['created'], 0)
+
+    def test_first_use_initializes_once(self):
+        """Test that the schema is created on first use and only once"""
+        rows = self.db.execute_query("SELECT COUNT(*) AS count FROM users")
+        self.assertEqual(rows[0]['count'], 2)
+        self.db.init_database()
+        rows = self.db.execute_query("SELECT COUNT(*) AS count FROM users")
+        self.assertEqual(rows[0]['count'], 2)
+
+    def test_concurrent_first_use(self):
+        """Test that threads racing on first use all see a migrated schema"""
+        errors = []
+
+        def worker():
+            try:
+                self.db.execute_query("SELECT COUNT(*) FROM users")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_after_fork_resets_pool(self):
+        """Test that a child starts with an empty pool but keeps the schema"""
+        self.db.execute_query("SELECT 1")
+        self.db.after_fork()
+        self.assertEqual(self.db.pool_stats()['idle'], 0)
+        self.assertEqual(self.db.pool_stats()['created'], 0)
+        self.db.execute_query("SELECT COUNT(*) FROM users")
+        self.assertEqual(self.db.pool_stats()['created'], 1)
+
+class TestGroupCommit(unittest.TestCase):
+    """Test cases for the group-commit write path"""
+
+    def setUp(self):
+        """Set up a throwaway database with write batching on"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp_dir, 'test.db'), write_batching=True)
+
+    def tearDown(self):
+        """Stop the writer and remove the throwaway database"""
+        self.db.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_concurrent_writes_share_transactions(self):
+        """Test that writes from many threads all commit, in fewer transactions"""
+        barrier = threading.Barrier(8)
+        writer = self.db._get_writer()
+
+        def worker(n):
+            barrier.wait()
+            # Queue all 25 writes before waiting, so they overlap on purpose
+            futures = [
+                writer.submit('insert', "INSERT INTO users (name, email) VALUES (?, ?)",
+                              ("Batch", f"batch-{n}-{i}@example.com"))
+                for i in range(25)
+            ]
+            for future in futures:
+                future.result()
+
+        self.db.init_database()
+        before = self.db.writer_stats() or {'writes': 0, 'batches': 0}
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        rows = self.db.execute_query("SELECT COUNT(*) AS count FROM users WHERE name = 'Batch'")
+        self.assertEqual(rows[0]['count'], 200)
+        stats = self.db.writer_stats()
+        self.assertEqual(stats['writes'] - before['writes'], 200)
+        self.assertLess(stats['batches'] - before['batches'], 20)
+
+    def test_failed_write_isolated(self):
+        """Test that a failing write reaches its caller and nobody else's"""
+        user_id = self.db.execute_insert("INSERT INTO users (name, email) VALUES (?, ?)", ("A", "a@example.com"))
+        self.assertGreater(user_id, 0)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.execute_insert("INSERT INTO users (name, email) VALUES (?, ?)", ("B", "a@example.com"))
+        rows = self.db.execute_returning(
+            "UPDATE users SET name = ? WHERE id = ? RETURNING name", ("A2", user_id)
+        )
+        self.assertEqual(rows, [{'name': 'A2'}])
+        self.assertEqual(self.db.writer_stats()['failed'], 1)
+
+    def test_transaction_bypasses_writer(self):
+        """Test that writes inside transaction() stay on the caller's connection"""
+        self.db.init_database()
+        before = self.db.writer_stats()
+        with self.db.transaction():
+            self.db.execute_insert("INSERT INTO users (name, email) VALUES (?, ?)", ("T", "t@example.com"))
+        self.assertEqual(self.db.writer_stats(), before)
+
+    def test_write_with_held_connection_runs_inline(self):
+        """Test that a thread holding the only connection does not wait on the writer"""
+        self.db.close()
+        self.db = Database(os.path.join(self.tmp_dir, 'test.db'), pool_size=1, write_batching=True)
+        self.db.pool.timeout = 0.5
+        self.db.init_database()
+        before = self.db.writer_stats()
+        with self.db.connection():
+            self.db.execute_insert("INSERT INTO users (name, email) VALUES (?, ?)", ("H", "h@example.com"))
+        self.assertEqual(self.db.writer_stats(), before)
+        rows = self.db.execute_query("SELECT COUNT(*) AS count FROM users WHERE name = 'H'")
+        self.assertEqual(rows[0]['count'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Unit tests for the pluggable JSON provider
+"""
+import json
+import unittest
+import uuid
+from datetime import datetime
+from flask import Flask
+from app import create_app
+from controllers.user_controller import user_service
+from models.user_model import User
+from utils.json_provider import FastJSONProvider, init_json_provider, orjson
+from utils.response_utils import format_response
+
+PAYLOAD = {
+    "success": True,
+    "data": [User(1, "Zoë", "zoe@example.com", "2024-05-06 07:08:09"),
+             User(2, "Ann", "ann@example.com", datetime(2024, 5, 6, 7, 8, 9, 123456))],
+    "generated_at": datetime(2024, 5, 6, 7, 8, 9),
+    "count": 2,
+}
+
+class TestJSONProvider(unittest.TestCase):
+    """Test cases for FastJSONProvider"""
+    
+    def setUp(self):
+        """Set up a bare app to attach providers to"""
+        self.app = Flask(__name__)
+    
+    def test_users_and_datetimes_serialized_natively(self):
+        """Test that User and datetime need no to_dict()/isoformat() by the caller"""
+        provider = FastJSONProvider(self.app, encoder='stdlib')
+        data = json.loads(provider.dumps(PAYLOAD))
+        self.assertEqual(data['data'][0], PAYLOAD['data'][0].to_dict())
+        self.assertEqual(data['data'][1]['created_at'], "2024-05-06T07:08:09.123456")
+        self.assertEqual(data['generated_at'], "2024-05-06T07:08:09")
+    
+    def test_compact_and_indented_output(self):
+        """Test both output layouts of the stdlib backend"""
+        compact = FastJSONProvider(self.app, encoder='stdlib', compact=True)
+        indented = FastJSONProvider(self.app, encoder='stdlib', compact=False)
+        self.assertEqual(compact.dumps({"a": [1, "é"]}), '{"a":[1,"é"]}')
+        self.assertEqual(indented.dumps({"a": 1}), '{\n  "a": 1\n}')
+    
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_backends_produce_identical_output(self):
+        """Test that the stdlib fallback matches orjson byte for byte"""
+        for compact in (True, False):
+            fast = FastJSONProvider(self.app, encoder='orjson', compact=compact)
+            fallback = FastJSONProvider(self.app, encoder='stdlib', compact=compact)
+            self.assertEqual(fast.dumps_bytes(PAYLOAD), fallback.dumps_bytes(PAYLOAD))
+    
+    def test_unknown_encoder_rejected(self):
+        """Test that a misconfigured encoder fails fast"""
+        with self.assertRaises(ValueError):
+            FastJSONProvider(self.app, encoder='simplejson')
+    
+    def test_registered_in_create_app(self):
+        """Test that API responses go through the configured provider"""
+        app = create_app('testing')
+        self.assertIsInstance(app.json, FastJSONProvider)
+        response = app.test_client().get('/api/users/1')
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertNotIn(b'": ', response.data)
+
+    def test_user_list_encoded_like_other_endpoints(self):
+        """Test that the shared full-list body follows the provider settings"""
+        app = create_app('testing')
+        app.config['JSON_COMPACT'] = False
+        init_json_provider(app)
+        client = app.test_client()
+        email = f"zoe-{uuid.uuid4().hex[:8]}@example.com"
+        created = client.post('/api/users', json={"name": "Zoë List", "email": email})
+        user_id = created.get_json()['data']['id']
+        self.addCleanup(client.delete, f'/api/users/{user_id}')
+
+        response = client.get('/api/users')
+        self.assertIn('"name": "Zoë List"'.encode('utf-8'), response.data)
+        with app.app_context():
+            expected = format_response(success=True, data=user_service.get_all_users())[0]
+        self.assertEqual(response.data, expected.data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Unit tests for the logging pipeline
+"""
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import unittest
+from config import TestingConfig
+from utils.logging_utils import (
+    DroppingQueueHandler, JsonFormatter, setup_logging, shutdown_logging, get_logging_stats
+)
+
+class TestLoggingUtils(unittest.TestCase):
+    """Test cases for async, structured logging"""
+
+    def _record(self, message='hello', **extra):
+        """Build a log record with optional request fields"""
+        record = logging.LogRecord('test', logging.INFO, __file__, 1, message, None, None)
+        record.__dict__.update(extra)
+        return record
+
+    def test_json_formatter_includes_request_fields(self):
+        """Test that request id and duration end up in the JSON record"""
+        line = JsonFormatter().format(self._record(request_id='abc', duration_ms=1.5))
+        payload = json.loads(line)
+        self.assertEqual(payload['message'], 'hello')
+        self.assertEqual(payload['request_id'], 'abc')
+        self.assertEqual(payload['duration_ms'], 1.5)
+        self.assertNotIn('status', payload)
+
+    def test_drop_newest_when_full(self):
+        """Test that a full queue drops incoming records without blocking"""
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+        handler.handle(self._record('first'))
+        handler.handle(self._record('second'))
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(handler.queue.get_nowait().msg, 'first')
+
+    def test_drop_oldest_when_full(self):
+        """Test that drop_oldest keeps the most recent record"""
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1), drop_policy='drop_oldest')
+        handler.handle(self._record('first'))
+        handler.handle(self._record('second'))
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(handler.queue.get_nowait().msg, 'second')
+
+    def test_counters_exact_under_concurrency(self):
+        """Test that every record is counted once with many logging threads"""
+        handler = DroppingQueueHandler(queue.Queue(maxsize=100))
+        record = self._record()
+
+        def log_many():
+            for _ in range(2000):
+                handler.enqueue(record)
+
+        threads = [threading.Thread(target=log_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((handler.enqueued, handler.dropped), (100, 15900))
+
+    def test_async_pipeline_writes_file(self):
+        """Test that queued records reach the log file once flushed"""
+        tmp_dir = tempfile.mkdtemp()
+
+        class LogConfig(TestingConfig):
+            LOG_FILE = os.path.join(tmp_dir, 'test.log')
+            LOG_FORMAT = 'json'
+            LOG_ASYNC = True
+
+        root = logging.getLogger()
+        saved_handlers, saved_level = list(root.handlers), root.level
+        try:
+            setup_logging(LogConfig)
+            logging.getLogger('test').info("queued %s", "message", extra={'request_id': 'r1'})
+            self.assertEqual(get_logging_stats()['dropped'], 0)
+            shutdown_logging()
+
+            with open(LogConfig.LOG_FILE) as log_file:
+                payload = json.loads(log_file.readline())
+            self.assertEqual(payload['message'], 'queued message')
+            self.assertEqual(payload['request_id'], 'r1')
+            self.assertIsNone(get_logging_stats())
+        finally:
+            shutdown_logging()
+            root.handlers[:] = saved_handlers
+            root.setLevel(saved_level)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_external_rotation_reopens_file(self):
+        """Test that a log file moved away by another process is recreated"""
+        tmp_dir = tempfile.mkdtemp()
+
+        class LogConfig(TestingConfig):
+            LOG_FILE = os.path.join(tmp_dir, 'test.log')
+            LOG_ROTATION = 'external'
+            LOG_ASYNC = False
+
+        root = logging.getLogger()
+        saved_handlers, saved_level = list(root.handlers), root.level
+        try:
+            setup_logging(LogConfig)
+            logging.getLogger('test').info("before rotation")
+            os.rename(LogConfig.LOG_FILE, LogConfig.LOG_FILE + '.1')
+            logging.getLogger('test').info("after rotation")
+
+            with open(LogConfig.LOG_FILE) as log_file:
+                self.assertIn("after rotation", log_file.read())
+            with open(LogConfig.LOG_FILE + '.1') as log_file:
+                self.assertNotIn("after rotation", log_file.read())
+        finally:
+            for handler in root.handlers:
+                handler.close()
+            root.handlers[:] = saved_handlers
+            root.setLevel(saved_level)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Unit tests for request metrics
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from app import create_app
+from utils.metrics import MetricsRegistry, mark_process_dead
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test cases for the sharded metrics registry"""
+
+    def setUp(self):
+        """Set up an empty registry"""
+        self.registry = MetricsRegistry()
+        self.registry.counter('jobs_total', 'Jobs')
+        self.registry.histogram('job_seconds', 'Job latency', buckets=(0.1, 1.0))
+
+    def test_shards_merge_across_threads(self):
+        """Test that increments from many threads are all counted"""
+        def work():
+            for _ in range(1000):
+                self.registry.inc('jobs_total', (('kind', 'a'),))
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.registry.snapshot()[('jobs_total', (('kind', 'a'),))], 4000)
+
+    def test_exited_thread_shards_retired(self):
+        """Test that short-lived threads do not leave shards behind"""
+        def work():
+            self.registry.inc('jobs_total')
+            self.registry.observe('job_seconds', 0.5)
+
+        for _ in range(1000):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+        self.assertLess(len(self.registry._shards), 100)
+
+        snapshot = self.registry.snapshot()
+        self.assertEqual(len(self.registry._shards), 0)
+        self.assertEqual(snapshot[('jobs_total', ())], 1000)
+        self.assertEqual(snapshot[('job_seconds', ())], [0, 1000, 0, 500.0])
+        # Snapshots do not fold retired values twice
+        self.assertEqual(self.registry.snapshot()[('jobs_total', ())], 1000)
+
+    def test_histogram_rendering(self):
+        """Test cumulative buckets, sum and count in text format"""
+        for value in (0.05, 0.5, 5.0):
+            self.registry.observe('job_seconds', value)
+        text = self.registry.render()
+        self.assertIn('# TYPE job_seconds histogram', text)
+        self.assertIn('job_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('job_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn('job_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('job_seconds_count 3', text)
+
+    def test_multiprocess_aggregation(self):
+        """Test that snapshots written by other workers are summed"""
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            self.registry.multiproc_dir = tmp_dir
+            other = os.path.join(tmp_dir, f"metrics_{os.getppid()}.json")
+            with open(other, 'w') as f:
+                json.dump([['jobs_total', [], 5, 'counter']], f)
+            self.registry.inc('jobs_total', (), 2)
+            self.assertIn('jobs_total 7', self.registry.render())
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_dead_worker_files_folded(self):
+        """Test that exited workers' counters are kept in one file, without their gauges"""
+        self.registry.gauge('jobs_running', 'Jobs running')
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            self.registry.multiproc_dir = tmp_dir
+            for pid in (2 ** 22 + 1, 2 ** 22 + 2):
+                with open(os.path.join(tmp_dir, f"metrics_{pid}.json"), 'w') as f:
+                    json.dump([
+                        ['jobs_total', [], 5, 'counter'],
+                        ['job_seconds', [], [1, 0, 0, 0.05], 'histogram'],
+                        ['jobs_running', [], 1, 'gauge'],
+                    ], f)
+                mark_process_dead(pid, tmp_dir)
+            mark_process_dead(2 ** 22 + 1, tmp_dir)
+
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ['metrics_dead.json'])
+            self.registry.inc('jobs_total', (), 2)
+            values = self.registry.collect()
+            self.assertEqual(values[('jobs_total', ())], 12)
+            self.assertEqual(values[('job_seconds', ())], [2, 0, 0, 0.1])
+            self.assertNotIn(('jobs_running', ()), values)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+class TestMetricsEndpoint(unittest.TestCase):
+    """Test cases for the /metrics endpoint"""
+
+    def setUp(self):
+        """Set up test client"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+
+    def test_route_metrics_recorded(self):
+        """Test that per-route counts, latency and DB queries are exposed"""
+        self.client.get('/api/users/1')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+
+        text = response.get_data(as_text=True)
+        self.assertIn('http_requests_total{method="GET",route="/api/users/<int:user_id>",status="200"}', text)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/api/users/<int:user_id>"', text)
+        self.assertIn('db_queries_total{route="/api/users/<int:user_id>"}', text)
+        self.assertIn('http_requests_in_flight{method="GET",route="/metrics"} 1', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Unit tests for schema migrations
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from database import Database
+from migrations import MigrationRunner
+
+class TestMigrations(unittest.TestCase):
+    """Test cases for the migration runner and the indexes it creates"""
+
+    def setUp(self):
+        """Set up a freshly migrated throwaway database"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp_dir, 'test.db'))
+        self.runner = MigrationRunner(self.db)
+
+    def tearDown(self):
+        """Remove the throwaway database"""
+        self.db.pool.close_all()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _plan(self, query, params=()):
+        """Get the EXPLAIN QUERY PLAN details for a query"""
+        rows = self.db.execute_query(f"EXPLAIN QUERY PLAN {query}", params)
+        return ' '.join(row['detail'] for row in rows)
+
+    def test_all_migrations_applied(self):
+        """Test that a new database is migrated to the latest version"""
+        status = self.runner.status()
+        self.assertTrue(all(entry['applied'] for entry in status))
+        self.assertEqual(self.runner.current_version(), status[-1]['version'])
+
+    def test_rollback_and_migrate(self):
+        """Test reverting one step and re-applying it"""
+        latest = self.runner.current_version()
+        reverted = self.runner.rollback()
+        self.assertEqual([m.version for m in reverted], [latest])
+        self.assertLess(self.runner.current_version(), latest)
+
+        applied = self.runner.migrate()
+        self.assertEqual([m.version for m in applied], [latest])
+        self.assertEqual(self.runner.current_version(), latest)
+
+    def test_rollback_to_zero(self):
+        """Test reverting every migration drops the schema"""
+        self.runner.rollback(0)
+        self.assertEqual(self.runner.current_version(), 0)
+        tables = self.db.execute_query("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'users'")
+        self.assertEqual(tables, [])
+
+    def test_ordered_listing_uses_index(self):
+        """Test that newest-first listing and keyset pages avoid a sort"""
+        plan = self._plan("SELECT * FROM users ORDER BY created_at DESC, id DESC LIMIT 10")
+        self.assertIn('idx_users_created_at_id', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+        plan = self._plan(
+            "SELECT * FROM users WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT 10",
+            ('2024-01-01 00:00:00', 10)
+        )
+        self.assertIn('SEARCH users USING INDEX idx_users_created_at_id', plan)
+
+    def test_email_lookup_uses_nocase_index(self):
+        """Test that case-insensitive email lookups are index searches"""
+        plan = self._plan("SELECT COUNT(*) FROM users WHERE email = ? COLLATE NOCASE", ('a@example.com',))
+        self.assertIn('idx_users_email_nocase', plan)
+
+class TestUserChangesBackfill(unittest.TestCase):
+    """Test cases for upgrading a database that already has users"""
+
+    def setUp(self):
+        """Set up a database migrated to just before the change log"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp_dir, 'test.db'), auto_init=False)
+        self.runner = MigrationRunner(self.db)
+        self.runner.migrate(6)
+
+    def tearDown(self):
+        """Remove the throwaway database"""
+        self.db.pool.close_all()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_existing_users_in_change_log(self):
+        """Test that users created before 0007 are part of the first sync"""
+        for n in range(3):
+            self.db.execute_insert("INSERT INTO users (name, email) VALUES (?, ?)",
+                                   (f"Old {n}", f"old-{n}@example.com"))
+        self.runner.migrate()
+
+        rows = self.db.execute_query("SELECT user_id, op FROM user_changes ORDER BY seq")
+        self.assertEqual([(row['user_id'], row['op']) for row in rows], [(1, 'insert'), (2, 'insert'), (3, 'insert')])
+
+if __name__ == '__main__':
+    unittest.main()
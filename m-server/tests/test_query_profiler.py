@@ -0,0 +1,99 @@
+"""
+Unit tests for the query profiler
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from database import Database
+from query_profiler import QueryProfiler, normalize_sql, top_stats
+
+class TestQueryProfiler(unittest.TestCase):
+    """Test cases for statement fingerprinting, aggregation and slow logging"""
+
+    def setUp(self):
+        """Set up a throwaway database with profiling on"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.tmp_dir, 'test.db'))
+        self.db.init_database()
+        self.db.profiler = QueryProfiler(
+            enabled=True, slow_query_ms=1000, stats_dir=os.path.join(self.tmp_dir, 'stats'),
+            n_plus_one_threshold=3
+        )
+
+    def tearDown(self):
+        """Remove the throwaway database"""
+        self.db.profiler.stats_dir = None
+        self.db.pool.close_all()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_normalize_sql(self):
+        """Test that literals, IN lists and whitespace are normalized"""
+        self.assertEqual(
+            normalize_sql("SELECT *  FROM users\n WHERE id IN (?, ?, ?) AND name = 'x' AND age > 3"),
+            "SELECT * FROM users WHERE id IN (?+) AND name = ? AND age > ?"
+        )
+
+    def test_aggregates_by_fingerprint(self):
+        """Test that executions of one statement shape are aggregated"""
+        for user_id in (1, 2, 3):
+            self.db.execute_query("SELECT * FROM users WHERE id = ?", (user_id,))
+        top = self.db.profiler.top()
+        entry = next(e for e in top if e['query'] == "SELECT * FROM users WHERE id = ?")
+        self.assertEqual(entry['count'], 3)
+        self.assertGreaterEqual(entry['max_ms'], entry['avg_ms'])
+
+    def test_slow_query_logged_with_plan(self):
+        """Test that slow statements are logged with EXPLAIN QUERY PLAN"""
+        self.db.profiler.slow_query_ms = 0
+        with self.assertLogs('query_profiler.slow', level='INFO') as logs:
+            self.db.execute_query("SELECT * FROM users WHERE id = ?", (1,))
+            self.assertTrue(self.db.profiler.drain())
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['query'], "SELECT * FROM users WHERE id = ?")
+        self.assertTrue(any('INTEGER PRIMARY KEY' in step for step in record['plan']))
+
+    def test_slow_log_file_only(self):
+        """Test that slow statements go to their own file, not the root logger"""
+        slow_logger = logging.getLogger('query_profiler.slow')
+        self.addCleanup(setattr, slow_logger, 'propagate', True)
+        self.addCleanup(slow_logger.handlers.clear)
+        self.db.profiler.slow_query_ms = 0
+        self.db.profiler.slow_log_path = os.path.join(self.tmp_dir, 'slow.log')
+        self.db.execute_query("SELECT COUNT(*) FROM users")
+        self.assertTrue(self.db.profiler.drain())
+        self.assertFalse(slow_logger.propagate)
+        with open(self.db.profiler.slow_log_path) as f:
+            self.assertEqual(json.loads(f.readline())['query'], "SELECT COUNT(*) FROM users")
+
+    def test_n_plus_one_warning(self):
+        """Test that repeating a statement within a request is flagged"""
+        self.db.profiler.begin_request()
+        for user_id in (1, 2, 3):
+            self.db.execute_query("SELECT * FROM users WHERE id = ?", (user_id,))
+        with self.assertLogs('query_profiler', level=logging.WARNING) as logs:
+            counts = self.db.profiler.end_request('GET /test')
+        self.assertEqual(counts["SELECT * FROM users WHERE id = ?"], 3)
+        self.assertIn('Possible N+1 query in GET /test', logs.output[0])
+
+    def test_nested_requests_keep_outer_counts(self):
+        """Test that a request run inside another does not reset its counts"""
+        self.db.profiler.begin_request()
+        self.db.execute_query("SELECT COUNT(*) FROM users")
+        self.db.profiler.begin_request()
+        self.db.execute_query("SELECT * FROM users WHERE id = ?", (1,))
+        self.assertEqual(list(self.db.profiler.end_request('GET /inner')), ["SELECT * FROM users WHERE id = ?"])
+        self.db.execute_query("SELECT COUNT(*) FROM users")
+        self.assertEqual(self.db.profiler.end_request('POST /outer'), {"SELECT COUNT(*) FROM users": 2})
+
+    def test_report_reads_persisted_stats(self):
+        """Test that flushed aggregates are readable by the report"""
+        self.db.execute_query("SELECT COUNT(*) FROM users")
+        self.db.profiler.flush(force=True)
+        stats = top_stats(self.db.profiler.stats_dir)
+        self.assertIn("SELECT COUNT(*) FROM users", [entry['query'] for entry in stats])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Unit tests for admission control
+"""
+import os
+import tempfile
+import unittest
+from app import create_app
+from utils.rate_limit import AdmissionMiddleware, MemoryRateLimitStore, SQLiteRateLimitStore, init_admission_control
+
+class TestRateLimitStores(unittest.TestCase):
+    """Test cases for the GCRA bucket stores"""
+
+    def check_bucket(self, store):
+        """Two requests per second with a burst of 3"""
+        interval, tolerance = 0.5, 1.5
+        self.assertEqual([store.acquire('a', interval, tolerance, 100.0) for _ in range(3)], [0.0] * 3)
+        self.assertAlmostEqual(store.acquire('a', interval, tolerance, 100.0), 0.5)
+        # Other clients have their own bucket
+        self.assertEqual(store.acquire('b', interval, tolerance, 100.0), 0.0)
+        # Half a second refills one request
+        self.assertEqual(store.acquire('a', interval, tolerance, 100.5), 0.0)
+        self.assertGreater(store.acquire('a', interval, tolerance, 100.5), 0)
+
+    def test_memory_store(self):
+        """Test bursts, refill and per-key isolation in memory"""
+        self.check_bucket(MemoryRateLimitStore())
+
+    def test_sqlite_store_is_shared(self):
+        """Test that stores on the same file (one per worker) share buckets"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'limits.db')
+            self.check_bucket(SQLiteRateLimitStore(path))
+            other_worker = SQLiteRateLimitStore(path)
+            self.assertGreater(other_worker.acquire('a', 0.5, 1.5, 100.5), 0)
+
+class TestAdmissionMiddleware(unittest.TestCase):
+    """Test cases for shedding requests before they reach the app"""
+
+    def setUp(self):
+        """Set up an app allowing two reads and one write per client"""
+        self.app = create_app('testing')
+        self.app.config.update(
+            RATE_LIMIT_ENABLED=True,
+            RATE_LIMIT_READ_RATE=0.01, RATE_LIMIT_READ_BURST=2,
+            RATE_LIMIT_WRITE_RATE=0.01, RATE_LIMIT_WRITE_BURST=1,
+            RATE_LIMIT_CLIENT_HEADER='X-API-Key',
+        )
+        init_admission_control(self.app)
+        self.client = self.app.test_client()
+
+    def test_reads_and_writes_limited_separately(self):
+        """Test 429 with Retry-After once a client's bucket is empty"""
+        headers = {'X-API-Key': 'script'}
+        self.assertEqual(self.client.get('/api/users?limit=1', headers=headers).status_code, 200)
+        self.assertEqual(self.client.get('/api/users?limit=1', headers=headers).status_code, 200)
+        response = self.client.get('/api/users?limit=1', headers=headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertFalse(response.get_json()['success'])
+
+        # Writes have their own bucket, other clients their own buckets
+        self.assertEqual(self.client.delete('/api/users/999999999', headers=headers).status_code, 404)
+        self.assertEqual(self.client.delete('/api/users/999999999', headers=headers).status_code, 429)
+        self.assertEqual(self.client.get('/api/users?limit=1', headers={'X-API-Key': 'other'}).status_code, 200)
+        # Health checks are never limited
+        self.assertEqual(self.client.get('/health', headers=headers).status_code, 200)
+
+        stats = self.app.extensions['admission_control'].stats()
+        self.assertEqual(stats['rate_limited'], 2)
+        self.assertEqual(stats['read_limit'], {'rate': 0.01, 'burst': 2})
+
+    def test_in_flight_cap(self):
+        """Test 503 while the cap is reached, until a response is closed"""
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+
+        middleware = AdmissionMiddleware(app, MemoryRateLimitStore(), read_rate=0, write_rate=0,
+                                         max_in_flight=1, retry_after=2)
+        statuses = []
+
+        def start_response(status, headers):
+            statuses.append((status, dict(headers)))
+
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/users', 'REMOTE_ADDR': '10.0.0.1'}
+        first = middleware(environ, start_response)
+        middleware(environ, start_response)
+        first.close()
+        middleware(environ, start_response).close()
+
+        self.assertEqual([status for status, _ in statuses], ['200 OK', '503 Service Unavailable', '200 OK'])
+        self.assertEqual(statuses[1][1]['Retry-After'], '2')
+        self.assertEqual(middleware.stats()['overloaded'], 1)
+
+    def test_shed_requests_keep_their_rate(self):
+        """Test that a request rejected with 503 does not use up a token"""
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+
+        middleware = AdmissionMiddleware(app, MemoryRateLimitStore(), read_rate=0.01, read_burst=2,
+                                         max_in_flight=1)
+        statuses = []
+
+        def start_response(status, headers):
+            statuses.append(status)
+
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/users', 'REMOTE_ADDR': '10.0.0.1'}
+        first = middleware(environ, start_response)
+        middleware(environ, start_response)
+        first.close()
+        middleware(environ, start_response).close()
+        middleware(environ, start_response)
+
+        self.assertEqual(statuses, ['200 OK', '503 Service Unavailable', '200 OK', '429 Too Many Requests'])
+        self.assertEqual(middleware.in_flight, 0)
+
+    def test_forwarded_client_entries_not_trusted(self):
+        """Test that only the entry added by the trusted proxy identifies the client"""
+        def app(environ, start_response):
+            start_response('200 OK', [])
+            return [b'ok']
+
+        middleware = AdmissionMiddleware(app, MemoryRateLimitStore(), read_rate=0.01, read_burst=1,
+                                         client_header='X-Forwarded-For')
+        statuses = []
+        for forwarded in ('1.1.1.1, 10.0.0.1', '2.2.2.2, 10.0.0.1', '10.0.0.2'):
+            environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/users', 'HTTP_X_FORWARDED_FOR': forwarded}
+            middleware(environ, lambda status, headers: statuses.append(status))
+        self.assertEqual(statuses, ['200 OK', '429 Too Many Requests', '200 OK'])
+
+    def test_rate_limits_opt_in(self):
+        """Test that production caps requests in flight but only limits rates when enabled"""
+        stats = create_app('production').extensions['admission_control'].stats()
+        self.assertEqual(stats['max_in_flight'], 64)
+        self.assertIsNone(stats['read_limit'])
+        self.assertIsNone(stats['write_limit'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+Unit tests for single-flight request coalescing
+"""
+import json
+import threading
+import time
+import unittest
+from models.user_repository_db import UserRepositoryDB
+from services.user_service import UserService
+from utils.single_flight import SingleFlight, SingleFlightTimeout
+
+def run_concurrently(count, fn):
+    """Call fn from count threads at once; return results (or exceptions) in order"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = fn()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for sharing one execution among concurrent callers"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Test that callers arriving while a call runs get its result"""
+        flight = SingleFlight('test')
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return ['result']
+
+        results = run_concurrently(8, lambda: flight.do('key', compute))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        stats = flight.stats()
+        self.assertEqual((stats['leaders'], stats['shared'], stats['in_flight']), (1, 7, 0))
+
+        # Nothing is kept once the call is over
+        flight.do('key', compute)
+        self.assertEqual(len(calls), 2)
+
+    def test_error_reaches_every_caller(self):
+        """Test that the leader's exception is raised to all waiters"""
+        flight = SingleFlight('test')
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError("boom")
+
+        results = run_concurrently(4, lambda: flight.do('key', fail))
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.stats()['errors'], 1)
+
+    def test_waiter_timeout(self):
+        """Test that a waiter gives up while the leader carries on"""
+        flight = SingleFlight('test', timeout=0.05)
+        release = threading.Event()
+        leader = threading.Thread(target=flight.do, args=('key', lambda: release.wait(5)))
+        leader.start()
+        while not flight.stats()['in_flight']:
+            time.sleep(0.001)
+
+        with self.assertRaises(SingleFlightTimeout):
+            flight.do('key', lambda: None)
+        self.assertEqual(flight.do('other', lambda: 'own'), 'own')
+        release.set()
+        leader.join()
+        self.assertEqual(flight.stats()['timeouts'], 1)
+
+def encode(users):
+    """Encode a user list for the coalescing tests"""
+    return json.dumps(users).encode('utf-8')
+
+class SlowCountingRepository(UserRepositoryDB):
+    """Repository that counts and slows down full reads"""
+
+    def __init__(self):
+        super().__init__()
+        self.get_all_calls = 0
+
+    def get_all(self):
+        self.get_all_calls += 1
+        time.sleep(0.2)
+        return super().get_all()
+
+class TestUserServiceCoalescing(unittest.TestCase):
+    """Test cases for coalesced user reads"""
+
+    def setUp(self):
+        """Set up a service over a counting repository"""
+        self.repository = SlowCountingRepository()
+        self.service = UserService(self.repository, single_flight=SingleFlight('users-test'))
+
+    def test_concurrent_list_reads_query_once(self):
+        """Test that simultaneous full lists run a single query"""
+        results = run_concurrently(6, lambda: self.service.get_all_users_encoded(encode))
+        self.assertEqual(self.repository.get_all_calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(len(json.loads(results[0])), len(self.service.get_all_users()))
+
+    def test_reads_after_a_write_are_not_shared(self):
+        """Test that a new table version starts a new read"""
+        version = self.service.get_users_version()
+        release = threading.Event()
+        leader = threading.Thread(
+            target=self.service.single_flight.do, args=(('all', encode, version), lambda: release.wait(5))
+        )
+        leader.start()
+        while not self.service.single_flight.stats()['in_flight']:
+            time.sleep(0.001)
+
+        # A caller at a newer version does not join the older read
+        self.service.get_all_users_encoded(encode, version + 1)
+        release.set()
+        leader.join()
+        self.assertEqual(self.repository.get_all_calls, 1)
+        self.assertEqual(self.service.single_flight.stats()['shared'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
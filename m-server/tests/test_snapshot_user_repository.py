@@ -0,0 +1,102 @@
+"""
+Unit tests for SnapshotUserRepository
+"""
+import unittest
+import uuid
+from database import db
+from models.user_repository_db import UserRepositoryDB
+from models.snapshot_user_repository import SnapshotUserRepository
+
+class TestSnapshotUserRepository(unittest.TestCase):
+    """Test cases for the in-memory users snapshot"""
+
+    def setUp(self):
+        """Set up a snapshot that only refreshes on demand or after local writes"""
+        self.repository = SnapshotUserRepository(UserRepositoryDB(), max_staleness=3600)
+        tag = uuid.uuid4().hex[:8]
+        self.user = self.repository.create("Snapshot User", f"snapshot-{tag}@example.com")
+
+    def tearDown(self):
+        """Remove the test user"""
+        self.repository.delete(self.user.id)
+
+    def test_reads_skip_database(self):
+        """Test that fresh reads are served without statements"""
+        self.repository.refresh()
+        db.reset_query_count()
+        self.assertEqual(self.repository.get_by_id(self.user.id).email, self.user.email)
+        self.assertTrue(self.repository.email_exists(self.user.email.upper()))
+        self.assertFalse(self.repository.email_exists(self.user.email, exclude_user_id=self.user.id))
+        self.assertGreaterEqual(self.repository.count(), 1)
+        self.assertEqual(db.get_query_count(), 0)
+
+    def test_local_writes_visible(self):
+        """Test that writes through the wrapper are read back at once"""
+        self.repository.update(self.user.id, name="Renamed")
+        self.assertEqual(self.repository.get_by_id(self.user.id).name, "Renamed")
+
+        other = self.repository.create("Other", f"other-{self.user.id}@example.com")
+        self.assertTrue(self.repository.email_exists(other.email))
+        self.repository.delete(other.id)
+        self.assertIsNone(self.repository.get_by_id(other.id))
+        self.assertFalse(self.repository.email_exists(other.email))
+
+    def test_external_write_applied_on_refresh(self):
+        """Test that writes bypassing the wrapper arrive through the change log"""
+        self.repository.get_by_id(self.user.id)
+        db.execute_update("UPDATE users SET name = ? WHERE id = ?", ("Elsewhere", self.user.id))
+        # Within the staleness bound the old row may still be served
+        self.assertEqual(self.repository.get_by_id(self.user.id).name, "Snapshot User")
+
+        self.repository.refresh()
+        self.assertEqual(self.repository.get_by_id(self.user.id).name, "Elsewhere")
+        self.assertEqual(self.repository.stats()['loads'], 1)
+
+    def test_version_never_ahead_of_snapshot(self):
+        """Test that reporting a newer table version refreshes the snapshot first"""
+        self.repository.get_by_id(self.user.id)
+        self.repository.get_table_version()
+        db.execute_update("UPDATE users SET name = ? WHERE id = ?", ("Elsewhere", self.user.id))
+
+        refreshes = self.repository.stats()['refreshes']
+        self.assertEqual(self.repository.get_table_version(), UserRepositoryDB().get_table_version())
+        self.assertEqual(self.repository.get_by_id(self.user.id).name, "Elsewhere")
+        # An unchanged version costs no refresh
+        self.repository.get_table_version()
+        self.assertEqual(self.repository.stats()['refreshes'], refreshes + 1)
+
+    def test_get_all_matches_database_order(self):
+        """Test that the presorted list stays newest first across changes"""
+        self.repository.update(self.user.id, name="Reordered?")
+        expected = [row['id'] for row in db.execute_query(
+            "SELECT id FROM users ORDER BY created_at DESC, id DESC"
+        )]
+        self.assertEqual([user.id for user in self.repository.get_all()], expected)
+        self.assertEqual(self.repository.count(), len(expected))
+
+    def test_transaction_reads_database(self):
+        """Test that reads inside a transaction see its uncommitted writes"""
+        self.repository.refresh()
+        with self.assertRaises(RuntimeError):
+            with self.repository.transaction():
+                self.repository.update(self.user.id, name="Uncommitted")
+                self.assertEqual(self.repository.get_by_id(self.user.id).name, "Uncommitted")
+                raise RuntimeError("roll back")
+        self.assertEqual(self.repository.get_by_id(self.user.id).name, "Snapshot User")
+
+    def test_reload_after_compaction(self):
+        """Test that a snapshot behind compacted tombstones reloads itself"""
+        self.repository.refresh()
+        other = UserRepositoryDB().create("Compacted", f"compacted-{self.user.id}@example.com")
+        UserRepositoryDB().delete(other.id)
+        db.execute_update(
+            "UPDATE user_changes SET changed_at = '2000-01-01 00:00:00' WHERE user_id = ?", (other.id,)
+        )
+        UserRepositoryDB().compact_changes(30)
+
+        self.repository.refresh()
+        self.assertEqual(self.repository.stats()['loads'], 2)
+        self.assertIsNone(self.repository.get_by_id(other.id))
+
+if __name__ == '__main__':
+    unittest.main()
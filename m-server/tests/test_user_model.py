@@ -0,0 +1,36 @@
+"""
+Unit tests for the User model and its JSON fast path
+"""
+import json
+import unittest
+from datetime import datetime
+from models.user_model import User, iso_timestamp, user_row_json
+
+class TestUserModel(unittest.TestCase):
+    """Test cases for User and row serialization"""
+    
+    def test_slots(self):
+        """Test that users carry no per-instance __dict__"""
+        user = User(1, "Slot", "slot@example.com")
+        self.assertFalse(hasattr(user, '__dict__'))
+    
+    def test_timestamp_text_parsed_lazily(self):
+        """Test that stored timestamp text is formatted without parsing"""
+        user = User(1, "Lazy", "lazy@example.com", "2024-05-06 07:08:09")
+        self.assertEqual(user.to_dict()['created_at'], "2024-05-06T07:08:09")
+        self.assertEqual(user.created_at, datetime(2024, 5, 6, 7, 8, 9))
+    
+    def test_iso_timestamp_matches_isoformat(self):
+        """Test the fast conversion against datetime.isoformat"""
+        for text in ("2024-05-06 07:08:09", "2024-05-06 07:08:09.123", "2024-05-06T07:08:09Z"):
+            expected = datetime.fromisoformat(text.replace('Z', '+00:00')).isoformat()
+            self.assertEqual(iso_timestamp(text), expected)
+    
+    def test_row_json_matches_to_dict(self):
+        """Test that the row fast path encodes exactly like to_dict"""
+        row = (7, 'Zoë "Q" \\ Müller', "zoe@example.com", "2024-05-06 07:08:09")
+        expected = json.dumps(User(*row).to_dict(), separators=(',', ':'))
+        self.assertEqual(user_row_json(row), expected)
+
+if __name__ == '__main__':
+    unittest.main()
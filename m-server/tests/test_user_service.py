@@ -17,6 +17,19 @@ class TestUserService(unittest.TestCase):
         self.assertIsInstance(users, list)
         self.assertGreater(len(users), 0)
     
+    def test_get_users_page(self):
+        """Test walking all users page by page"""
+        seen = []
+        cursor = None
+        while True:
+            users, cursor = self.user_service.get_users_page(1, cursor)
+            seen.extend(user['id'] for user in users)
+            if cursor is None:
+                break
+        all_ids = [user['id'] for user in self.user_service.get_all_users()]
+        self.assertEqual(sorted(seen), sorted(all_ids))
+        self.assertEqual(len(seen), len(set(seen)))
+    
     def test_create_user_valid(self):
         """Test creating a valid user"""
         user = self.user_service.create_user("Test User", "test@example.com")
@@ -2,7 +2,7 @@
 Utils package
 """
 from .decorators import validate_json, log_request
-from .response_utils import format_response
+from .response_utils import format_response, format_stream_response
 from .logging_utils import setup_logging
 
-__all__ = ['validate_json', 'log_request', 'format_response', 'setup_logging']
\ No newline at end of file
+__all__ = ['validate_json', 'log_request', 'format_response', 'format_stream_response', 'setup_logging']
\ No newline at end of file
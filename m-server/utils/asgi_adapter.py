@@ -0,0 +1,262 @@
+"""
+ASGI front end for the Flask app with a bounded executor
+
+The event loop owns every connection: request bodies are read and
+responses written asynchronously, so an idle or slow client costs a
+coroutine rather than a thread. Only the Flask app itself, and with it
+every blocking SQLite call of the services and repositories, runs on a
+fixed pool of executor threads sized like the connection pool. When all
+threads are busy and max_queue more requests are already waiting, new
+requests are shed with 503 and Retry-After instead of queueing without
+bound.
+"""
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.metrics import metrics
+
+metrics.counter('asgi_requests_rejected_total', 'Requests shed with 503 because the executor queue was full')
+metrics.gauge('asgi_executor_pending', 'Requests running on or waiting for an executor thread')
+
+BUSY_BODY = b'{"success":false,"message":"Server is busy, please retry shortly"}'
+# Streamed chunks buffered between the executor thread and a slow client
+STREAM_BUFFER_CHUNKS = 8
+
+class _ResponseChannel:
+    """Hands response parts from an executor thread to the event loop
+
+    put() blocks the thread while STREAM_BUFFER_CHUNKS parts are waiting,
+    so a slow reader throttles the producer instead of growing a buffer.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue(STREAM_BUFFER_CHUNKS)
+        self.closed = threading.Event()
+
+    def put(self, item: Tuple):
+        """Queue a part from the executor thread; dropped once closed"""
+        if not self.closed.is_set():
+            asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+    async def get(self) -> Tuple:
+        return await self.queue.get()
+
+    def close(self, item: Tuple = None):
+        """Stop the producer and release it if it is waiting for room"""
+        self.closed.set()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if item is not None:
+            self.queue.put_nowait(item)
+
+class AsgiAdapter:
+    """Serves a WSGI app to an ASGI server through a bounded thread pool"""
+
+    def __init__(self, wsgi_app, max_workers: int = 5, max_queue: int = 64, retry_after: int = 1):
+        self.wsgi_app = wsgi_app
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        # Threads are started lazily, so none exist yet if a server forks after import
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='asgi-worker')
+        self.pending = 0
+        self.rejected = 0
+        self._pending_lock = threading.Lock()
+        extensions = getattr(wsgi_app, 'extensions', None)
+        if extensions is not None:
+            extensions['asgi_adapter'] = self
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable):
+        if scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        # Websockets are not served; returning makes the server reject them
+
+    def stats(self) -> Dict:
+        """Get executor counters"""
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'pending': self.pending,
+            'rejected': self.rejected,
+        }
+
+    async def _lifespan(self, receive: Callable, send: Callable):
+        """Acknowledge startup; on shutdown let in-flight requests finish"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope: Dict, receive: Callable, send: Callable):
+        """Run one request on the executor and relay its response"""
+        body = await self._read_body(receive)
+        if body is None:
+            # Client disconnected before sending the whole request
+            return
+        if self.pending >= self.max_workers + self.max_queue:
+            await self._reject(send)
+            return
+
+        channel = _ResponseChannel(asyncio.get_running_loop())
+        with self._pending_lock:
+            self.pending += 1
+        metrics.inc('asgi_executor_pending')
+        self.executor.submit(self._run, self._environ(scope, body), channel)
+        try:
+            item = await channel.get()
+            if item[0] == 'error':
+                raise item[1]
+            _, status, headers, body, more_body = item
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+            if more_body:
+                await self._stream(receive, send, channel)
+        finally:
+            channel.close()
+
+    async def _stream(self, receive: Callable, send: Callable, channel: _ResponseChannel):
+        """Relay a streamed body chunk by chunk until it ends or the client leaves"""
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            channel.close(('disconnect',))
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            while True:
+                item = await channel.get()
+                if item[0] == 'body':
+                    await send({'type': 'http.response.body', 'body': item[1], 'more_body': True})
+                elif item[0] == 'end':
+                    await send({'type': 'http.response.body', 'body': b''})
+                    return
+                elif item[0] == 'error':
+                    # Headers are gone already; the server aborts the connection
+                    raise item[1]
+                else:
+                    return
+        finally:
+            watcher.cancel()
+
+    def _run(self, environ: Dict, channel: _ResponseChannel):
+        """Call the WSGI app on an executor thread
+
+        Buffered responses (with a Content-Length) are sent as one part.
+        Streamed ones are iterated on this same thread to the end, since
+        their generators may hold this thread's database connection.
+        """
+        try:
+            response = []
+
+            def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+                if exc_info and response:
+                    raise exc_info[1].with_traceback(exc_info[2])
+                response[:] = [
+                    int(status.split(' ', 1)[0]),
+                    [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+                ]
+                return self._write
+
+            iterable = self.wsgi_app(environ, start_response)
+            try:
+                status, headers = response
+                if any(name == b'content-length' for name, _ in headers):
+                    channel.put(('start', status, headers, b''.join(iterable), False))
+                else:
+                    channel.put(('start', status, headers, b'', True))
+                    for chunk in iterable:
+                        if channel.closed.is_set():
+                            break
+                        if chunk:
+                            channel.put(('body', chunk))
+                    channel.put(('end',))
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+        except Exception as e:
+            channel.put(('error', e))
+        finally:
+            with self._pending_lock:
+                self.pending -= 1
+            metrics.dec('asgi_executor_pending')
+
+    async def _reject(self, send: Callable):
+        """Shed a request with 503 without touching the executor"""
+        self.rejected += 1
+        metrics.inc('asgi_requests_rejected_total')
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(BUSY_BODY)).encode()),
+                (b'retry-after', str(self.retry_after).encode()),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': BUSY_BODY})
+
+    @staticmethod
+    def _write(data: bytes):
+        raise NotImplementedError("The WSGI write() callable is not supported; return an iterable")
+
+    @staticmethod
+    async def _read_body(receive: Callable) -> Optional[bytes]:
+        """Read the whole request body, or None if the client disconnects"""
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    @staticmethod
+    def _environ(scope: Dict, body: bytes) -> Dict:
+        """Translate an ASGI HTTP scope into a WSGI environ (PEP 3333)"""
+        root_path = scope.get('root_path', '')
+        path = scope['path']
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+            'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1] or 80),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for raw_name, raw_value in scope.get('headers', ()):
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+                key = name
+            else:
+                key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        if body or 'CONTENT_LENGTH' in environ:
+            # The body is already buffered, chunked uploads included
+            environ['CONTENT_LENGTH'] = str(len(body))
+        return environ
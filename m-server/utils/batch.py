@@ -0,0 +1,199 @@
+"""
+Batch dispatch: run many API calls from one HTTP request
+
+BatchDispatcher feeds each sub-request straight into the Flask app with its
+own app and request context, so it goes through the same routing,
+validation and error handlers as a real request but without a socket, HTTP
+parsing or middleware. Sub-requests run in order, except that consecutive reads (GET,
+HEAD) run concurrently on a bounded thread pool; a write waits for the reads
+before it and the reads after it see its result.
+
+With transaction=True every sub-request runs on the calling thread inside
+one database transaction, which is rolled back as soon as a sub-request
+fails (status 400 or higher).
+
+Each sub-request is charged to the batch client's read or write bucket when
+admission control is enabled, and answered 429 without running once the
+bucket is empty.
+"""
+import json
+import logging
+import threading
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from werkzeug.test import EnvironBuilder
+from utils.metrics import metrics
+from utils.response_utils import format_response
+
+logger = logging.getLogger(__name__)
+
+metrics.counter('batch_subrequests_total', 'Sub-requests run by the batch endpoint, by method')
+
+READ_METHODS = frozenset(('GET', 'HEAD'))
+METHODS = READ_METHODS | frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+# Sub-response headers that describe the HTTP body rather than the result
+SKIPPED_HEADERS = frozenset(('content-length', 'content-type', 'content-encoding', 'vary'))
+
+# Sub-request headers not forwarded: sub-responses are embedded decoded in
+# the batch body, which is compressed as a whole
+DROPPED_HEADERS = frozenset(('accept-encoding',))
+
+class _RollBack(Exception):
+    """Abort the shared transaction after a failed sub-request"""
+
+class BatchDispatcher:
+    """Dispatches batch sub-requests through a Flask app"""
+
+    def __init__(self, app, database, max_workers: int = 4):
+        self.app = app
+        self.database = database
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def run(self, items: List[Dict], transaction: bool = False, base_url: str = None,
+            environ: Dict = None) -> Tuple[List[Dict], Optional[int]]:
+        """Run validated sub-requests and return their results in order
+
+        Sub-requests appear to come to base_url from the client of the
+        batch request, whose WSGI environ is given. Also returns the index
+        of the sub-request that rolled back the shared transaction (its
+        result is the last one), or None.
+        """
+        environ = environ or {}
+        origin = {
+            'client': environ,
+            'base_url': base_url,
+            'environ_base': {'REMOTE_ADDR': environ.get('REMOTE_ADDR', '')},
+        }
+        if transaction:
+            return self._run_transaction(items, origin)
+
+        results = []
+        reads = []
+        for index, item in enumerate(items):
+            if item['method'] in READ_METHODS:
+                reads.append((index, item))
+                continue
+            results.extend(self._run_reads(reads, origin))
+            reads = []
+            results.append(self._dispatch(index, item, origin))
+        results.extend(self._run_reads(reads, origin))
+        return results, None
+
+    def _run_transaction(self, items: List[Dict], origin: Dict) -> Tuple[List[Dict], Optional[int]]:
+        """Run every sub-request in one transaction, stopping at the first failure"""
+        results = []
+        try:
+            with self.database.transaction(immediate=True):
+                for index, item in enumerate(items):
+                    results.append(self._dispatch(index, item, origin))
+                    if results[-1]['status'] >= 400:
+                        raise _RollBack()
+        except _RollBack:
+            return results, len(results) - 1
+        return results, None
+
+    def _run_reads(self, reads: List[Tuple[int, Dict]], origin: Dict) -> List[Dict]:
+        """Run a run of consecutive reads, concurrently when there are several"""
+        if len(reads) < 2:
+            return [self._dispatch(index, item, origin) for index, item in reads]
+        executor = self._get_executor()
+        futures = [executor.submit(self._dispatch, index, item, origin) for index, item in reads]
+        return [future.result() for future in futures]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the read pool on first use (after any worker fork)"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='batch')
+        return self._executor
+
+    def _dispatch(self, index: int, item: Dict, origin: Dict) -> Dict:
+        """Run one sub-request through the app and describe its response"""
+        metrics.inc('batch_subrequests_total', (('method', item['method']),))
+        admission = self.app.extensions.get('admission_control')
+        if admission is not None:
+            wait = admission.charge(origin['client'], item['method'], item['path'].split('?', 1)[0])
+            if wait > 0:
+                return self._rate_limited(index, item, wait)
+
+        builder = EnvironBuilder(
+            path=item['path'],
+            method=item['method'],
+            headers={
+                name: value for name, value in item.get('headers', {}).items()
+                if name.lower() not in DROPPED_HEADERS
+            },
+            data=json.dumps(item['body']) if 'body' in item else None,
+            content_type='application/json' if 'body' in item else None,
+            base_url=origin['base_url'],
+            environ_base=origin['environ_base']
+        )
+        try:
+            environ = builder.get_environ()
+        finally:
+            builder.close()
+
+        # A fresh app context gives the sub-request its own flask.g, so its
+        # hooks cannot clobber the batch request's state
+        queries = self.database.get_query_count()
+        try:
+            with self.app.app_context(), self.app.request_context(environ):
+                try:
+                    response = self.app.full_dispatch_request()
+                except Exception as e:
+                    # Only reached when the app propagates exceptions (testing)
+                    logger.error(f"Error in batch sub-request {item['method']} {item['path']}: {e}")
+                    response = self.app.make_response(
+                        format_response(success=False, message="Internal server error", status_code=500)
+                    )
+                try:
+                    return self._describe(index, item, response)
+                finally:
+                    response.close()
+        finally:
+            # Sub-requests run on the batch's thread reset its statement count
+            self.database.reset_query_count(queries)
+
+    @staticmethod
+    def _rate_limited(index: int, item: Dict, wait: float) -> Dict:
+        """Build the batch entry for a sub-request over its client's rate"""
+        result = {
+            'index': index,
+            'status': 429,
+            'headers': {'Retry-After': str(max(1, math.ceil(wait)))},
+            'body': {'success': False, 'message': "Rate limit exceeded"},
+        }
+        if 'id' in item:
+            result['id'] = item['id']
+        return result
+
+    @staticmethod
+    def _describe(index: int, item: Dict, response) -> Dict:
+        """Build the batch entry for one sub-response"""
+        if response.is_json:
+            body = response.get_json(silent=True)
+        else:
+            body = response.get_data(as_text=True) or None
+        result = {
+            'index': index,
+            'status': response.status_code,
+            'headers': {
+                name: value for name, value in response.headers.items()
+                if name.lower() not in SKIPPED_HEADERS
+            },
+            'body': body,
+        }
+        if 'id' in item:
+            result['id'] = item['id']
+        return result
+
+def init_batch(app, database):
+    """Create the app's batch dispatcher"""
+    dispatcher = BatchDispatcher(app, database, max_workers=app.config.get('BATCH_MAX_WORKERS', 4))
+    app.extensions['batch_dispatcher'] = dispatcher
+    return dispatcher
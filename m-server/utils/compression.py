@@ -0,0 +1,175 @@
+"""
+Response compression with Accept-Encoding negotiation
+
+Compresses eligible responses with brotli (when the brotli package is
+installed) or gzip. Buffered bodies below a minimum size are sent as-is
+without being touched; streamed bodies are compressed chunk by chunk and
+flushed after every chunk so clients still receive data incrementally.
+Bytes in/out and compression CPU time are recorded in the metrics registry.
+"""
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, Optional
+from flask import request
+from utils.metrics import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+COMPRESSIBLE_MIMETYPES = (
+    'application/json', 'application/x-ndjson', 'text/plain', 'text/html', 'text/csv'
+)
+
+metrics.counter('http_compression_responses_total', 'Responses compressed, by encoding')
+metrics.counter('http_compression_bytes_in_total', 'Uncompressed bytes fed to the compressor')
+metrics.counter('http_compression_bytes_out_total', 'Compressed bytes sent')
+metrics.counter('http_compression_cpu_seconds_total', 'CPU time spent compressing responses')
+metrics.counter('http_compression_skipped_total', 'Eligible responses sent uncompressed, by reason')
+
+class _Compressor:
+    """Incremental compressor for one response"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._impl = brotli.Compressor(quality=level)
+        else:
+            # wbits=31 selects the gzip container
+            self._impl = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so it can be sent right away"""
+        if self.encoding == 'br':
+            return self._impl.process(data) + self._impl.flush()
+        return self._impl.compress(data) + self._impl.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """Emit the end of the compressed stream"""
+        if self.encoding == 'br':
+            return self._impl.finish()
+        return self._impl.flush(zlib.Z_FINISH)
+
+def choose_encoding(accept_encoding, brotli_enabled: bool = True) -> Optional[str]:
+    """Pick the best supported encoding the client accepts, or None"""
+    candidates = ['br', 'gzip'] if brotli is not None and brotli_enabled else ['gzip']
+    best, best_quality = None, 0
+    for encoding in candidates:
+        quality = accept_encoding.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def init_compression(app):
+    """Register response compression on the Flask app"""
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+    levels = {
+        'gzip': app.config.get('COMPRESSION_GZIP_LEVEL', 6),
+        'br': app.config.get('COMPRESSION_BROTLI_QUALITY', 4),
+    }
+    brotli_enabled = app.config.get('COMPRESSION_BROTLI_ENABLED', True)
+    excluded_paths = set(app.config.get('COMPRESSION_EXCLUDE_PATHS', ()))
+
+    @app.after_request
+    def compress_response(response):
+        if not _is_eligible(response) or request.path in excluded_paths:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if not response.is_streamed:
+            size = response.calculate_content_length()
+            if size is not None and size < min_size:
+                # Small bodies are not worth the CPU
+                metrics.inc('http_compression_skipped_total', (('reason', 'small'),))
+                return response
+
+        encoding = choose_encoding(request.accept_encodings, brotli_enabled)
+        if encoding is None:
+            metrics.inc('http_compression_skipped_total', (('reason', 'not_accepted'),))
+            return response
+
+        compressor = _Compressor(encoding, levels[encoding])
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, compressor)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            start = time.thread_time()
+            compressed = compressor.compress(data) + compressor.finish()
+            _record(encoding, len(data), len(compressed), time.thread_time() - start)
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The representation changed, so the validator can only be weak
+            response.set_etag(etag, weak=True)
+        return response
+
+def _is_eligible(response) -> bool:
+    """Check whether a response may be compressed at all"""
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        return False
+    return response.mimetype in COMPRESSIBLE_MIMETYPES
+
+def _compress_stream(chunks: Iterable, compressor: _Compressor) -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk"""
+    bytes_in = bytes_out = 0
+    cpu = 0.0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            start = time.thread_time()
+            out = compressor.compress(chunk)
+            cpu += time.thread_time() - start
+            bytes_in += len(chunk)
+            bytes_out += len(out)
+            if out:
+                yield out
+        tail = compressor.finish()
+        bytes_out += len(tail)
+        yield tail
+        _record(compressor.encoding, bytes_in, bytes_out, cpu)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+def _record(encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+    """Account one compressed response"""
+    labels = (('encoding', encoding),)
+    metrics.inc('http_compression_responses_total', labels)
+    metrics.inc('http_compression_bytes_in_total', labels, bytes_in)
+    metrics.inc('http_compression_bytes_out_total', labels, bytes_out)
+    metrics.inc('http_compression_cpu_seconds_total', labels, cpu_seconds)
+
+def get_compression_stats() -> Dict:
+    """Summarize compression counters of this process"""
+    snapshot = metrics.snapshot()
+    stats = {}
+    for (name, labels), value in snapshot.items():
+        if not name.startswith('http_compression_'):
+            continue
+        key = name[len('http_compression_'):-len('_total')]
+        stats[key] = stats.get(key, 0) + value
+    bytes_in = stats.get('bytes_in', 0)
+    bytes_out = stats.get('bytes_out', 0)
+    return {
+        'brotli_available': brotli is not None,
+        'responses': stats.get('responses', 0),
+        'skipped': stats.get('skipped', 0),
+        'bytes_in': bytes_in,
+        'bytes_out': bytes_out,
+        'bytes_saved': bytes_in - bytes_out,
+        'ratio': round(bytes_out / bytes_in, 4) if bytes_in else None,
+        'cpu_seconds': round(stats.get('cpu_seconds', 0.0), 6),
+    }
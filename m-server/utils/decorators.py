@@ -2,23 +2,54 @@
 Utility decorators for the application
 """
 import logging
+import time
+import uuid
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, g
+
+logger = logging.getLogger(__name__)
 
 def log_request(f):
-    """Decorator to log API requests"""
+    """Decorator to log API requests with request id, status and duration"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        logger = logging.getLogger(__name__)
-        logger.info(f"API Request: {request.method} {request.path}")
-        return f(*args, **kwargs)
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        start = time.perf_counter()
+        status = 500
+        try:
+            rv = f(*args, **kwargs)
+            status = _status_code(rv)
+            return rv
+        finally:
+            # Skip all formatting work when INFO is disabled
+            if logger.isEnabledFor(logging.INFO):
+                duration_ms = round((time.perf_counter() - start) * 1000, 3)
+                logger.info(
+                    "API Request: %s %s -> %s (%.3f ms)",
+                    request.method, request.path, status, duration_ms,
+                    extra={
+                        'request_id': g.request_id,
+                        'method': request.method,
+                        'path': request.path,
+                        'status': status,
+                        'duration_ms': duration_ms
+                    }
+                )
     return decorated_function
 
+def _status_code(rv) -> int:
+    """Get the status code from a view return value"""
+    if isinstance(rv, tuple):
+        if len(rv) > 1 and isinstance(rv[1], int):
+            return rv[1]
+        rv = rv[0]
+    return getattr(rv, 'status_code', 200)
+
 def validate_json(f):
     """Decorator to validate JSON input"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if request.method in ['POST', 'PUT']:
+        if request.method in ['POST', 'PUT', 'PATCH', 'DELETE']:
             if not request.is_json:
                 return jsonify({
                     "success": False,
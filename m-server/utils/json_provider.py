@@ -0,0 +1,84 @@
+"""
+Pluggable JSON encoding for API responses
+
+FastJSONProvider replaces Flask's default provider. It encodes with orjson
+when installed and falls back to the stdlib json module otherwise; both
+backends produce the same text: UTF-8 (no \\u escapes), keys in insertion
+order, and either compact or 2-space indented output. User objects and
+datetimes are serialized natively, so callers can hand them over as-is.
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+from flask.json.provider import JSONProvider
+from models.user_model import User
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+ENCODERS = ('auto', 'orjson', 'stdlib')
+
+def _default(obj: Any) -> Any:
+    """Serialize types the encoders do not handle themselves"""
+    if isinstance(obj, User):
+        return obj.to_dict()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class FastJSONProvider(JSONProvider):
+    """JSON provider backed by orjson when available, stdlib json otherwise"""
+
+    def __init__(self, app, encoder: str = 'auto', compact: bool = True):
+        super().__init__(app)
+        if encoder not in ENCODERS:
+            raise ValueError(f"JSON encoder must be one of: {', '.join(ENCODERS)}")
+        if encoder == 'orjson' and orjson is None:
+            raise ValueError("JSON encoder 'orjson' requested but orjson is not installed")
+        self.backend = 'orjson' if encoder != 'stdlib' and orjson is not None else 'stdlib'
+        self.compact = compact
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize obj to a JSON string"""
+        if kwargs:
+            # Callers asking for specific json.dumps options get exactly those
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Serialize obj straight to UTF-8 bytes"""
+        if self.backend == 'orjson':
+            option = orjson.OPT_NON_STR_KEYS
+            if not self.compact:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=_default, option=option)
+        if self.compact:
+            text = json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'))
+        else:
+            text = json.dumps(obj, default=_default, ensure_ascii=False, indent=2)
+        return text.encode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        """Deserialize JSON text or bytes"""
+        if self.backend == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """Build a JSON response (what jsonify() calls)"""
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype='application/json')
+
+def init_json_provider(app):
+    """Install FastJSONProvider on the app according to its config"""
+    app.json = FastJSONProvider(
+        app,
+        encoder=app.config.get('JSON_ENCODER', 'auto'),
+        compact=app.config.get('JSON_COMPACT', True)
+    )
+    return app.json
@@ -1,20 +1,170 @@
 """
 Logging utility functions
 """
+import atexit
+import json
 import logging
+import queue
+import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+from typing import Dict, Optional
+from config import Config
 
-def setup_logging():
-    """Setup application logging"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('app.log'),
-            logging.StreamHandler()
-        ]
-    )
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Request context attached to records by the log_request decorator
+REQUEST_FIELDS = ('request_id', 'method', 'path', 'status', 'duration_ms')
+
+_queue_handler = None
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'timestamp': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in REQUEST_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks the caller when the queue is full
+
+    With drop_policy 'drop_newest' the incoming record is discarded; with
+    'drop_oldest' the oldest queued record makes room for it.
+    """
+
+    def __init__(self, log_queue: queue.Queue, drop_policy: str = 'drop_newest'):
+        super().__init__(log_queue)
+        self.drop_policy = drop_policy
+        self.enqueued = 0
+        self.dropped = 0
+        self._count_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in-process, so formatting is left to its thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            self._count(enqueued=1)
+            return
+        except queue.Full:
+            pass
+
+        enqueued = 0
+        if self.drop_policy == 'drop_oldest':
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+                enqueued = 1
+            except (queue.Empty, queue.Full):
+                pass
+        self._count(enqueued=enqueued, dropped=1)
+
+    def _count(self, enqueued: int = 0, dropped: int = 0):
+        """Update the counters; enqueue runs on many request threads at once"""
+        with self._count_lock:
+            self.enqueued += enqueued
+            self.dropped += dropped
+
+def setup_logging(config=Config):
+    """Setup application logging
+
+    In async mode records are handed to a bounded queue on the calling thread
+    and written to rotating file and console handlers by a background
+    listener thread, so request threads never wait on disk I/O.
+
+    With LOG_ROTATION 'size' the file is rotated by this process, which is
+    only safe while a single process writes it. With 'external' every
+    process appends to the file and reopens it once a tool such as
+    logrotate has moved it away.
+    """
+    global _queue_handler, _listener
+    shutdown_logging()
+
+    formatter = JsonFormatter() if config.LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
+    if config.LOG_ROTATION == 'external':
+        file_handler = WatchedFileHandler(config.LOG_FILE)
+    elif config.LOG_ROTATION == 'size':
+        file_handler = RotatingFileHandler(
+            config.LOG_FILE,
+            maxBytes=config.LOG_MAX_BYTES,
+            backupCount=config.LOG_BACKUP_COUNT
+        )
+    else:
+        raise ValueError("LOG_ROTATION must be 'size' or 'external'")
+    handlers = [file_handler, logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(config.LOG_LEVEL)
+
+    if config.LOG_ASYNC:
+        _queue_handler = DroppingQueueHandler(
+            queue.Queue(maxsize=config.LOG_QUEUE_SIZE),
+            drop_policy=config.LOG_DROP_POLICY
+        )
+        _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        root.addHandler(_queue_handler)
+    else:
+        for handler in handlers:
+            root.addHandler(handler)
+
+def shutdown_logging():
+    """Flush queued records and stop the background listener"""
+    global _queue_handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        logging.getLogger().removeHandler(_queue_handler)
+    _queue_handler = None
+    _listener = None
+
+def reinit_logging_after_fork(config=Config):
+    """Restart logging in a forked child process
+
+    The parent's listener thread does not survive fork, and its queue's
+    lock may have been held at the moment of forking, so the inherited
+    pipeline is abandoned rather than stopped.
+    """
+    global _queue_handler, _listener
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+    _queue_handler = None
+    _listener = None
+    setup_logging(config)
+
+def get_logging_stats() -> Optional[Dict]:
+    """Get async logging queue counters, or None in synchronous mode"""
+    if _queue_handler is None:
+        return None
+    return {
+        'queued': _queue_handler.queue.qsize(),
+        'capacity': _queue_handler.queue.maxsize,
+        'enqueued': _queue_handler.enqueued,
+        'dropped': _queue_handler.dropped,
+        'drop_policy': _queue_handler.drop_policy,
+    }
 
 def get_timestamp():
     """Get current timestamp in ISO format"""
-    return datetime.now().isoformat()
\ No newline at end of file
+    return datetime.now().isoformat()
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,313 @@
+"""
+Prometheus-style request metrics
+
+Each thread records into its own shard, so the request path never takes a
+lock; shards are merged when metrics are scraped, and the shards of threads
+that have exited are folded into one retired total. In multiprocess mode
+(METRICS_MULTIPROC_DIR set, e.g. under gunicorn) every worker periodically
+writes its merged snapshot to a per-pid file and /metrics sums all files;
+when a worker exits, mark_process_dead folds its counters into one shared
+file for dead workers and removes its own.
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Set, Tuple
+from flask import g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+SWEEP_MIN_SHARDS = 64
+DEAD_FILE = 'metrics_dead.json'
+
+class MetricsRegistry:
+    """Registry of counters, gauges and histograms with per-thread shards"""
+
+    def __init__(self):
+        self._meta = {}
+        self._shards = []  # (owning thread, shard) pairs
+        self._retired = {}
+        self._sweep_at = SWEEP_MIN_SHARDS
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+        self.multiproc_dir = None
+        self.flush_interval = 1.0
+        self._last_flush = 0.0
+
+    def counter(self, name: str, documentation: str):
+        """Declare a monotonically increasing counter"""
+        self._meta[name] = ('counter', documentation, None)
+
+    def gauge(self, name: str, documentation: str):
+        """Declare a gauge that can go up and down"""
+        self._meta[name] = ('gauge', documentation, None)
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple = DEFAULT_BUCKETS):
+        """Declare a histogram with the given upper bucket bounds"""
+        self._meta[name] = ('histogram', documentation, tuple(buckets))
+
+    def inc(self, name: str, labels: Tuple = (), amount: float = 1):
+        """Increment a counter or gauge"""
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def dec(self, name: str, labels: Tuple = (), amount: float = 1):
+        """Decrement a gauge"""
+        self.inc(name, labels, -amount)
+
+    def observe(self, name: str, value: float, labels: Tuple = ()):
+        """Record one histogram observation"""
+        buckets = self._meta[name][2]
+        shard = self._shard()
+        key = (name, labels)
+        series = shard.get(key)
+        if series is None:
+            # Per-bucket counts, then +Inf count, then sum
+            series = shard[key] = [0] * (len(buckets) + 1) + [0.0]
+        series[bisect.bisect_left(buckets, value)] += 1
+        series[-1] += value
+
+    def snapshot(self) -> Dict:
+        """Merge all thread shards of this process"""
+        with self._shards_lock:
+            self._sweep()
+            shards = [shard for _, shard in self._shards]
+            merged = {}
+            for key, value in self._retired.items():
+                _merge_value(merged, key, value)
+        for shard in shards:
+            for key, value in dict(shard).items():
+                _merge_value(merged, key, value)
+        return merged
+
+    def collect(self) -> Dict:
+        """Get merged values for this process, or for all workers in multiprocess mode"""
+        if not self.multiproc_dir:
+            return self.snapshot()
+
+        self.flush(force=True)
+        dead_pids, merged = _read_dead(self.multiproc_dir)
+        for filename in os.listdir(self.multiproc_dir):
+            if filename == DEAD_FILE or not filename.startswith('metrics_') or not filename.endswith('.json'):
+                continue
+            pid = int(filename[len('metrics_'):-len('.json')])
+            if pid in dead_pids:
+                # Already folded into the dead workers' totals
+                continue
+            entries = _read_entries(os.path.join(self.multiproc_dir, filename))
+            alive = _pid_alive(pid)
+            for name, labels, value, kind in entries:
+                if not alive and kind == 'gauge':
+                    # Gauges of dead workers no longer describe anything live
+                    continue
+                _merge_value(merged, (name, tuple(tuple(pair) for pair in labels)), value)
+        return merged
+
+    def flush(self, force: bool = False):
+        """Write this worker's snapshot for other workers to aggregate"""
+        if not self.multiproc_dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+
+        entries = [
+            [name, list(labels), value, self._meta.get(name, ('counter',))[0]]
+            for (name, labels), value in self.snapshot().items()
+        ]
+        _write_json(os.path.join(self.multiproc_dir, f"metrics_{os.getpid()}.json"), entries)
+
+    def render(self) -> str:
+        """Render all series in the Prometheus text exposition format"""
+        values = self.collect()
+        by_name = {}
+        for (name, labels), value in values.items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, (kind, documentation, buckets) in sorted(self._meta.items()):
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name.get(name, [])):
+                if kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(list(buckets) + ['+Inf'], value[:-1]):
+                        cumulative += count
+                        le = bound if bound == '+Inf' else repr(float(bound))
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {value[-1]}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Drop all recorded values (used after fork and in tests)"""
+        with self._shards_lock:
+            self._shards = []
+            self._retired = {}
+            self._sweep_at = SWEEP_MIN_SHARDS
+        self._local = threading.local()
+
+    def _shard(self) -> Dict:
+        """Get the calling thread's private shard"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), shard))
+                # Servers start threads all the time; sweeping whenever the
+                # list doubles keeps registration amortized O(1)
+                if len(self._shards) >= self._sweep_at:
+                    self._sweep()
+                    self._sweep_at = max(SWEEP_MIN_SHARDS, 2 * len(self._shards))
+        return shard
+
+    def _sweep(self):
+        """Fold the shards of exited threads into the retired totals (lock held)"""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                # The thread is gone, so nothing writes to its shard any more
+                for key, value in shard.items():
+                    _merge_value(self._retired, key, value)
+        self._shards = live
+
+def mark_process_dead(pid: int, multiproc_dir: str):
+    """Fold an exited worker's counters into the dead workers' file
+
+    Called from gunicorn's child_exit hook, so workers recycled by
+    max_requests do not leave files behind for every scrape to read. Its
+    gauges are dropped. The worker's pid is listed in the dead file before
+    its own file is removed, so scrapes in between do not count it twice.
+    """
+    path = os.path.join(multiproc_dir, f"metrics_{pid}.json")
+    if not os.path.exists(path):
+        return
+    dead_pids, merged = _read_dead(multiproc_dir)
+    for name, labels, value, kind in _read_entries(path):
+        if kind != 'gauge':
+            _merge_value(merged, (name, tuple(tuple(pair) for pair in labels)), value)
+
+    # Pids whose files are gone need no longer be skipped
+    pids = [other for other in dead_pids
+            if os.path.exists(os.path.join(multiproc_dir, f"metrics_{other}.json"))]
+    entries = [
+        [name, list(labels), value, 'histogram' if isinstance(value, list) else 'counter']
+        for (name, labels), value in merged.items()
+    ]
+    _write_json(os.path.join(multiproc_dir, DEAD_FILE), {'pids': pids + [pid], 'entries': entries})
+    os.remove(path)
+
+def _read_dead(multiproc_dir: str) -> Tuple[Set[int], Dict]:
+    """Read the pids and merged values already folded into the dead file"""
+    try:
+        with open(os.path.join(multiproc_dir, DEAD_FILE)) as f:
+            dead = json.load(f)
+    except (OSError, ValueError):
+        return set(), {}
+    merged = {}
+    for name, labels, value, _ in dead['entries']:
+        _merge_value(merged, (name, tuple(tuple(pair) for pair in labels)), value)
+    return set(dead['pids']), merged
+
+def _read_entries(path: str) -> List:
+    """Read one worker's snapshot file, empty if it is missing or partial"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def _write_json(path: str, data):
+    """Replace a file atomically, so readers never see it half written"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def _merge_value(merged: Dict, key: Tuple, value):
+    """Add a counter/gauge value or histogram series into merged"""
+    current = merged.get(key)
+    if current is None:
+        merged[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(value, list):
+        for i, part in enumerate(value):
+            current[i] += part
+    else:
+        merged[key] = current + value
+
+def _format_labels(labels: Tuple) -> str:
+    """Format label pairs as {k="v",...}"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+def _escape(value) -> str:
+    """Escape a label value for the text exposition format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _pid_alive(pid: int) -> bool:
+    """Check whether a worker process still exists"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+# Global metrics registry
+metrics = MetricsRegistry()
+metrics.counter('http_requests_total', 'Total HTTP requests by method, route and status')
+metrics.histogram('http_request_duration_seconds', 'HTTP request latency in seconds')
+metrics.gauge('http_requests_in_flight', 'HTTP requests currently being handled')
+metrics.counter('db_queries_total', 'Total database statements issued by route')
+metrics.histogram('db_queries_per_request', 'Database statements issued per request', QUERY_BUCKETS)
+
+def init_metrics(app, database):
+    """Register request instrumentation hooks on the Flask app"""
+    metrics.multiproc_dir = app.config.get('METRICS_MULTIPROC_DIR') or None
+    metrics.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+    if metrics.multiproc_dir:
+        os.makedirs(metrics.multiproc_dir, exist_ok=True)
+        atexit.register(metrics.flush, force=True)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_start = time.perf_counter()
+        g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.inc('http_requests_in_flight', (('method', request.method), ('route', g.metrics_route)))
+        database.reset_query_count()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        route = g.metrics_route
+        duration = time.perf_counter() - start
+        labels = (('method', request.method), ('route', route), ('status', str(response.status_code)))
+        metrics.inc('http_requests_total', labels)
+        metrics.observe('http_request_duration_seconds', duration, labels)
+
+        queries = database.get_query_count()
+        metrics.inc('db_queries_total', (('route', route),), queries)
+        metrics.observe('db_queries_per_request', queries, (('route', route),))
+        metrics.flush()
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            metrics.dec('http_requests_in_flight', (('method', request.method), ('route', route)))
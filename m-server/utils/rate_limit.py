@@ -0,0 +1,311 @@
+"""
+Admission control: per-client rate limits and an in-flight request cap
+
+AdmissionMiddleware wraps the app's WSGI callable, so requests it sheds
+never reach Flask. Every client (its address, or a configured header such
+as an API key or a proxy's X-Forwarded-For) has two token buckets, one for
+reads (GET, HEAD, OPTIONS) and one for writes; a client over its rate gets
+429, and when the process already runs max_in_flight requests everyone gets
+503. Both carry Retry-After. The in-flight cap is checked first, so a
+request shed with 503 does not use up its client's rate.
+
+Buckets are kept as GCRA state (the theoretical arrival time of the next
+request, one float per bucket) in a store:
+
+- MemoryRateLimitStore: a plain dict in this process
+- SQLiteRateLimitStore: a table in a separate SQLite file, shared by all
+  gunicorn workers on the host
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.counter('http_requests_shed_total', 'Requests rejected by admission control, by reason')
+metrics.counter('rate_limit_store_errors_total', 'Rate limit checks that failed open because the store failed')
+
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+class MemoryRateLimitStore:
+    """Per-process bucket state in a dict, without locks
+
+    Each dict read and write is atomic under the GIL; two requests of the
+    same client racing between them can at worst both be admitted on the
+    last token, which is close enough for load shedding and keeps the
+    check to a few hundred nanoseconds.
+    """
+
+    def __init__(self, max_keys: int = 100000, prune_interval: float = 1.0):
+        self.max_keys = max_keys
+        self.prune_interval = prune_interval
+        self._tat = {}
+        self._pruned_at = 0.0
+
+    def acquire(self, key: str, interval: float, tolerance: float, now: float) -> float:
+        """Take one request from a bucket; 0.0 if admitted, else seconds to wait"""
+        tat = max(self._tat.get(key, now), now) + interval
+        wait = tat - now - tolerance
+        if wait > 0:
+            return wait
+        if len(self._tat) >= self.max_keys and now - self._pruned_at >= self.prune_interval:
+            self._prune(now)
+        self._tat[key] = tat
+        return 0.0
+
+    def _prune(self, now: float):
+        """Forget buckets that have refilled completely (same as never seen)"""
+        self._pruned_at = now
+        for key, tat in list(self._tat.items()):
+            if tat <= now:
+                self._tat.pop(key, None)
+
+class SQLiteRateLimitStore:
+    """Bucket state in a SQLite table shared across worker processes
+
+    Each check is one upsert on its own database file, kept apart from the
+    application database so limiting never queues behind real writes. The
+    state is disposable, so it is written without fsync.
+    """
+
+    def __init__(self, path: str, timeout: float = 1.0, prune_interval: float = 60.0):
+        self.path = path
+        self.timeout = timeout
+        self.prune_interval = prune_interval
+        self._local = threading.local()
+        self._pruned_at = 0.0
+
+    def acquire(self, key: str, interval: float, tolerance: float, now: float) -> float:
+        """Take one request from a bucket; 0.0 if admitted, else seconds to wait"""
+        conn = self._connection()
+        if now - self._pruned_at >= self.prune_interval:
+            self._pruned_at = now
+            conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+        # The update only happens (and returns a row) if the request fits
+        row = conn.execute(
+            "INSERT INTO rate_limits (key, tat) VALUES (?1, ?2 + ?3) "
+            "ON CONFLICT (key) DO UPDATE SET tat = max(tat, ?2) + ?3 "
+            "WHERE max(tat, ?2) + ?3 - ?2 <= ?4 "
+            "RETURNING tat",
+            (key, now, interval, tolerance)
+        ).fetchone()
+        if row is not None:
+            return 0.0
+        tat = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()[0]
+        return max(tat, now) + interval - now - tolerance
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening a new one after fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+class _ReleasingIterable:
+    """Response body that frees its in-flight slot once sent or closed"""
+
+    __slots__ = ('_iterable', '_release')
+
+    def __init__(self, iterable: Iterable[bytes], release):
+        self._iterable = iterable
+        self._release = release
+
+    def __iter__(self):
+        yield from self._iterable
+        self._done()
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, 'close'):
+                self._iterable.close()
+        finally:
+            self._done()
+
+    def _done(self):
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+class AdmissionMiddleware:
+    """WSGI middleware applying rate limits and the in-flight cap"""
+
+    def __init__(self, app, store, read_rate: float = 50.0, read_burst: int = 100,
+                 write_rate: float = 10.0, write_burst: int = 20, max_in_flight: int = 0,
+                 client_header: str = None, trusted_proxies: int = 1, exempt_paths: Iterable[str] = (),
+                 retry_after: int = 1):
+        self.app = app
+        self.store = store
+        self.max_in_flight = max_in_flight
+        self.trusted_proxies = max(1, trusted_proxies)
+        self.exempt_paths = frozenset(exempt_paths)
+        self.retry_after = retry_after
+        self._client_key = f"HTTP_{client_header.upper().replace('-', '_')}" if client_header else None
+        # (emission interval, burst tolerance) in seconds; None means unlimited
+        self._limits = {
+            'read': (1.0 / read_rate, read_burst / read_rate) if read_rate > 0 else None,
+            'write': (1.0 / write_rate, write_burst / write_rate) if write_rate > 0 else None,
+        }
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self.rate_limited = 0
+        self.overloaded = 0
+        self.store_errors = 0
+
+    def __call__(self, environ: Dict, start_response):
+        if environ.get('PATH_INFO') in self.exempt_paths:
+            return self.app(environ, start_response)
+
+        kind = 'read' if environ.get('REQUEST_METHOD') in READ_METHODS else 'write'
+        if not self.max_in_flight:
+            wait = self._rate_limit(environ, kind)
+            if wait > 0:
+                return self._reject(start_response, 429, "Rate limit exceeded", wait, ('reason', 'rate_limit'), kind)
+            return self.app(environ, start_response)
+
+        with self._in_flight_lock:
+            admitted = self.in_flight < self.max_in_flight
+            if admitted:
+                self.in_flight += 1
+        if not admitted:
+            self.overloaded += 1
+            return self._reject(start_response, 503, "Server is busy, please retry shortly",
+                                self.retry_after, ('reason', 'overload'), kind)
+        try:
+            wait = self._rate_limit(environ, kind)
+            if wait > 0:
+                self._release()
+                return self._reject(start_response, 429, "Rate limit exceeded", wait, ('reason', 'rate_limit'), kind)
+            iterable = self.app(environ, start_response)
+        except BaseException:
+            self._release()
+            raise
+        # Streamed bodies keep their slot until the server closes them
+        return _ReleasingIterable(iterable, self._release)
+
+    def charge(self, environ: Dict, method: str, path: str) -> float:
+        """Charge a request that bypassed this middleware to its client's bucket
+
+        For requests the app runs internally, such as batch sub-requests;
+        environ is that of the HTTP request that carried them. Returns 0.0
+        if admitted, else the seconds to wait.
+        """
+        if path in self.exempt_paths:
+            return 0.0
+        kind = 'read' if method in READ_METHODS else 'write'
+        wait = self._rate_limit(environ, kind)
+        if wait > 0:
+            metrics.inc('http_requests_shed_total', (('reason', 'rate_limit'), ('kind', kind)))
+        return wait
+
+    def stats(self) -> Dict:
+        """Get admission counters for this process"""
+        return {
+            'store': type(self.store).__name__,
+            'read_limit': self._describe(self._limits['read']),
+            'write_limit': self._describe(self._limits['write']),
+            'max_in_flight': self.max_in_flight or None,
+            'in_flight': self.in_flight,
+            'rate_limited': self.rate_limited,
+            'overloaded': self.overloaded,
+            'store_errors': self.store_errors,
+        }
+
+    def _release(self):
+        """Free the in-flight slot of a finished request"""
+        with self._in_flight_lock:
+            self.in_flight -= 1
+
+    def _client(self, environ: Dict) -> str:
+        """Identify the client: the configured header if sent, else its address"""
+        if self._client_key:
+            value = environ.get(self._client_key)
+            if value:
+                # Each proxy appends the address it saw to X-Forwarded-For
+                # style lists; entries left of those our trusted proxies
+                # added come from the client and can be forged
+                entries = value.split(',')
+                return entries[max(0, len(entries) - self.trusted_proxies)].strip()
+        return environ.get('REMOTE_ADDR', '')
+
+    def _rate_limit(self, environ: Dict, kind: str) -> float:
+        """Take one request from the client's read or write bucket"""
+        limit = self._limits[kind]
+        if limit is None:
+            return 0.0
+        wait = self._acquire(f"{kind}:{self._client(environ)}", limit)
+        if wait > 0:
+            self.rate_limited += 1
+        return wait
+
+    def _acquire(self, key: str, limit: Tuple[float, float]) -> float:
+        """Check a bucket, admitting the request if the store fails"""
+        try:
+            return self.store.acquire(key, limit[0], limit[1], time.time())
+        except sqlite3.Error as e:
+            self.store_errors += 1
+            metrics.inc('rate_limit_store_errors_total')
+            logger.warning(f"Rate limit store unavailable, admitting request: {e}")
+            return 0.0
+
+    def _reject(self, start_response, status: int, message: str, wait: float,
+                reason: Tuple[str, str], kind: str) -> Iterable[bytes]:
+        """Answer without calling the app"""
+        metrics.inc('http_requests_shed_total', (reason, ('kind', kind)))
+        body = f'{{"success":false,"message":"{message}"}}'.encode()
+        start_response('429 Too Many Requests' if status == 429 else '503 Service Unavailable', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', str(max(1, math.ceil(wait)))),
+        ])
+        return [body]
+
+    @staticmethod
+    def _describe(limit: Optional[Tuple[float, float]]) -> Optional[Dict]:
+        if limit is None:
+            return None
+        interval, tolerance = limit
+        return {'rate': round(1.0 / interval, 3), 'burst': round(tolerance / interval)}
+
+def init_admission_control(app):
+    """Wrap the Flask app's WSGI callable with admission control
+
+    Rate limits only apply with RATE_LIMIT_ENABLED; otherwise just the
+    in-flight cap does.
+    """
+    rate_limited = app.config.get('RATE_LIMIT_ENABLED', False)
+    store_type = app.config.get('RATE_LIMIT_STORE', 'memory')
+    if store_type == 'sqlite':
+        store = SQLiteRateLimitStore(app.config['RATE_LIMIT_STORE_PATH'])
+    elif store_type == 'memory':
+        store = MemoryRateLimitStore()
+    else:
+        raise ValueError("RATE_LIMIT_STORE must be 'memory' or 'sqlite'")
+
+    middleware = AdmissionMiddleware(
+        app.wsgi_app,
+        store,
+        read_rate=app.config.get('RATE_LIMIT_READ_RATE', 50.0) if rate_limited else 0,
+        read_burst=app.config.get('RATE_LIMIT_READ_BURST', 100),
+        write_rate=app.config.get('RATE_LIMIT_WRITE_RATE', 10.0) if rate_limited else 0,
+        write_burst=app.config.get('RATE_LIMIT_WRITE_BURST', 20),
+        max_in_flight=app.config.get('ADMISSION_MAX_IN_FLIGHT', 0),
+        client_header=app.config.get('RATE_LIMIT_CLIENT_HEADER'),
+        trusted_proxies=app.config.get('RATE_LIMIT_TRUSTED_PROXIES', 1),
+        exempt_paths=app.config.get('RATE_LIMIT_EXEMPT_PATHS', ()),
+        retry_after=app.config.get('ADMISSION_RETRY_AFTER', 1),
+    )
+    app.wsgi_app = middleware
+    app.extensions['admission_control'] = middleware
+    return middleware
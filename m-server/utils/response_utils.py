@@ -1,9 +1,18 @@
 """
 Response utility functions
 """
-from flask import jsonify
+import json
+import hashlib
+from typing import Callable, Dict, Iterable, Iterator, List
+from flask import current_app, jsonify, request, Response, stream_with_context
 
-def format_response(success=True, data=None, message=None, status_code=200):
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+def format_response(success=True, data=None, message=None, status_code=200, pagination=None,
+                    etag=None):
     """Format API response"""
     response = {"success": success}
     
@@ -12,7 +21,100 @@ def format_response(success=True, data=None, message=None, status_code=200):
         if isinstance(data, list):
             response["count"] = len(data)
     
+    if pagination is not None:
+        response["pagination"] = pagination
+    
     if message:
         response["message"] = message
     
-    return jsonify(response), status_code
\ No newline at end of file
+    response = jsonify(response)
+    if etag:
+        _set_validators(response, etag)
+    return response, status_code
+
+def encode_list_response(data: List) -> bytes:
+    """Encode the body format_response(data=data) would send, once
+    
+    Uses the app's JSON provider, so the bytes match every other endpoint.
+    """
+    return current_app.json.dumps_bytes({"success": True, "data": data, "count": len(data)}) + b'\n'
+
+def format_encoded_response(body: bytes, status_code=200, etag=None):
+    """Send a body from encode_list_response, e.g. one shared by coalesced requests"""
+    response = Response(body, mimetype='application/json')
+    if etag:
+        _set_validators(response, etag)
+    return response, status_code
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag value from the parts that determine a response"""
+    raw = '|'.join(str(part) for part in parts).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()[:32]
+
+def is_not_modified(etag: str) -> bool:
+    """Check whether the client's If-None-Match already covers this ETag"""
+    return request.if_none_match.contains_weak(etag)
+
+def not_modified_response(etag: str):
+    """Build an empty 304 response carrying the current ETag"""
+    response = Response(status=304)
+    _set_validators(response, etag)
+    return response
+
+def _set_validators(response: Response, etag: str):
+    """Attach the ETag and ask clients to revalidate before reuse"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+
+def format_stream_response(items: Iterable, fmt: str = 'ndjson', chunk_rows: int = 500,
+                           filename: str = None, encoded: bool = False):
+    """Stream items as NDJSON or a JSON array without building the full body
+    
+    With encoded=True the items are already JSON text and are framed as-is.
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    
+    encode = _identity if encoded else _encode
+    if fmt == 'ndjson':
+        chunks = _iter_ndjson(items, chunk_rows, encode)
+    else:
+        chunks = _iter_json_array(items, chunk_rows, encode)
+    response = Response(stream_with_context(chunks), mimetype=STREAM_FORMATS[fmt])
+    if filename:
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+def _encode(item: Dict) -> str:
+    """Encode a single item as compact JSON"""
+    return json.dumps(item, separators=(',', ':'))
+
+def _identity(item: str) -> str:
+    """Pass pre-encoded JSON through unchanged"""
+    return item
+
+def _iter_ndjson(items: Iterable, chunk_rows: int, encode: Callable = _encode) -> Iterator[str]:
+    """Yield newline-delimited JSON in chunks of up to chunk_rows items"""
+    buffer = []
+    for item in items:
+        buffer.append(encode(item))
+        if len(buffer) >= chunk_rows:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+def _iter_json_array(items: Iterable, chunk_rows: int, encode: Callable = _encode) -> Iterator[str]:
+    """Yield a JSON array in chunks of up to chunk_rows items"""
+    yield '['
+    buffer = []
+    first = True
+    for item in items:
+        buffer.append(encode(item))
+        if len(buffer) >= chunk_rows:
+            yield ('' if first else ',') + ','.join(buffer)
+            first = False
+            buffer = []
+    if buffer:
+        yield ('' if first else ',') + ','.join(buffer)
+    yield ']'
@@ -0,0 +1,101 @@
+"""
+Single-flight request coalescing
+
+SingleFlight.do(key, fn) runs fn once for all callers that ask for the same
+key while it is running: the first caller (the leader) computes, the others
+wait for its result or its exception. Nothing is kept once the call
+finishes, so this bounds concurrent work without serving stale data the
+way a cache could; keys should carry whatever versions the result depends
+on.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable
+from utils.metrics import metrics
+
+metrics.counter('singleflight_calls_total', 'Coalesced calls, by whether they computed (leader) or waited (shared)')
+metrics.counter('singleflight_errors_total', 'Coalesced computations that raised, by name')
+metrics.counter('singleflight_timeouts_total', 'Callers that gave up waiting for a shared result')
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised when a caller waits longer than the timeout for a shared result"""
+
+class _Call:
+    """One in-flight computation and the callers waiting for it"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Collapses concurrent calls with equal keys into one execution"""
+
+    def __init__(self, name: str, timeout: float = 10.0):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.max_waiters = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: float = None) -> Any:
+        """Return fn(), sharing one execution among concurrent callers of key
+
+        Waiting callers get the leader's result object itself, so results
+        must be treated as read-only. They raise SingleFlightTimeout after
+        `timeout` seconds (default: the instance timeout); the leader's
+        computation keeps running for the callers still waiting.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+                self.max_waiters = max(self.max_waiters, call.waiters)
+
+        if leader:
+            metrics.inc('singleflight_calls_total', (('name', self.name), ('role', 'leader')))
+            try:
+                call.result = fn()
+                return call.result
+            except BaseException as e:
+                call.error = e
+                self.errors += 1
+                metrics.inc('singleflight_errors_total', (('name', self.name),))
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        metrics.inc('singleflight_calls_total', (('name', self.name), ('role', 'shared')))
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            self.timeouts += 1
+            metrics.inc('singleflight_timeouts_total', (('name', self.name),))
+            raise SingleFlightTimeout(f"Timed out waiting for a shared {self.name} result")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> Dict:
+        """Get coalescing counters"""
+        calls = self.leaders + self.shared
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'shared': self.shared,
+            'collapsed_ratio': round(self.shared / calls, 4) if calls else 0.0,
+            'max_waiters': self.max_waiters,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+        }
@@ -0,0 +1,17 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+from app import create_app
+from config import config
+from utils.logging_utils import setup_logging
+
+config_name = os.environ.get('FLASK_ENV', 'production')
+
+# Setup logging
+setup_logging(config[config_name])
+
+# Create Flask application
+app = create_app(config_name)